@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Микро-бенчмарк разбора ячеек таблицы расписания
+Сравнивает скорость parse_timetable.parse_cell (скомпилированные регулярные
+выражения) с прежней реализацией на некомпилированных re.search/re.sub
+и проверяет, что результаты совпадают
+
+Использование:
+    python3 benchmark_cells.py                  # ячейки из timetable.json
+    python3 benchmark_cells.py timetable.json 20000
+"""
+
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from parse_timetable import parse_cell
+from timetable_format import iter_timetable
+
+# ---------------------------------------------------------------------------
+# Прежняя реализация (до перехода на скомпилированные выражения) - эталон
+# ---------------------------------------------------------------------------
+
+def legacy_extract_room(text: str) -> Optional[str]:
+    room_patterns = [
+        r'([АУA]\d+[А-ЯA-Z]?)',
+        r'([АУA]\d+)',
+        r'(ЭОиДОТ)',
+        r'([СC](?=\s|,|$))'
+    ]
+    for pattern in room_patterns:
+        match = re.search(pattern, text)
+        if match:
+            room = match.group(1)
+            if room and len(room) > 1:
+                return room
+            elif room == 'С' or room == 'C':
+                return 'С'
+    return None
+
+def legacy_clean_subject_name(subject: str) -> str:
+    if not subject:
+        return ""
+    subject = re.sub(r'\s+', ' ', subject)
+    subject = subject.strip()
+    subject = re.sub(r'^,\s*', '', subject)
+    subject = re.sub(r',\s*$', '', subject)
+    subject = re.sub(r',\s*,', ',', subject)
+    return subject
+
+def legacy_parse_part(part: str, even_week: bool, odd_week: bool) -> List[Dict]:
+    room = legacy_extract_room(part)
+    subject = part
+    if room:
+        subject = part.replace(room, '').strip()
+    subject = re.sub(r'\(?лекция?\s+\d+\s*ч\)?', '', subject, flags=re.IGNORECASE)
+    subject = re.sub(r'\(?лек\s+\d+\s*ч\)?', '', subject, flags=re.IGNORECASE)
+    subject = re.sub(r'[,\s]+$', '', subject)
+    subject = legacy_clean_subject_name(subject)
+    if subject:
+        return [{'subject': subject, 'room': room, 'even_week': even_week, 'odd_week': odd_week}]
+    return []
+
+def legacy_parse_subject_and_room(text: str) -> List[Dict]:
+    if not text or text.strip() == '':
+        return []
+    text = text.strip()
+    if '//' in text:
+        parts = text.split('//')
+        even_part = parts[0].strip() if len(parts) > 0 else ''
+        odd_part = parts[1].strip() if len(parts) > 1 else ''
+        results = []
+        if even_part:
+            results += legacy_parse_part(even_part, True, False)
+        if odd_part:
+            results += legacy_parse_part(odd_part, False, True)
+        return results
+    return legacy_parse_part(text, True, True)
+
+def legacy_parse_cell(text: str) -> Tuple[List[Dict], Optional[str], Optional[int]]:
+    parsed_items = legacy_parse_subject_and_room(text)
+    lesson_type = None
+    if '(лек' in text.lower() or 'лекция' in text.lower():
+        lesson_type = 'lecture'
+    elif '(пр' in text.lower() or 'практическое' in text.lower():
+        lesson_type = 'practice'
+    elif 'п/г' in text.lower() or 'п/г' in text:
+        lesson_type = 'subgroup'
+    if not lesson_type:
+        if re.search(r'\(лек', text, re.IGNORECASE):
+            lesson_type = 'lecture'
+        elif re.search(r'\(пр', text, re.IGNORECASE):
+            lesson_type = 'practice'
+    match = re.search(r'п/г\s*(\d+)', text, re.IGNORECASE)
+    subgroup_number = int(match.group(1)) if match else None
+    return parsed_items, lesson_type, subgroup_number
+
+# ---------------------------------------------------------------------------
+
+def build_cells(json_file: str, count: int) -> List[str]:
+    """
+    Восстанавливает тексты ячеек из распарсенного расписания:
+    дисциплина + аудитория, часть ячеек - пары четная // нечетная неделя
+    """
+    base = []
+    for entry in iter_timetable(json_file):
+        discipline = entry.discipline or ''
+        room = entry.room
+        base.append(f"{discipline} {room}" if room else discipline)
+    base = sorted(set(base))
+    
+    cells = []
+    i = 0
+    while len(cells) < count:
+        cell = base[i % len(base)]
+        if i % 3 == 0:
+            cell = f"{cell} // {base[(i * 7 + 1) % len(base)]}"
+        cells.append(cell)
+        i += 1
+    return cells
+
+def measure(func, cells: List[str]) -> float:
+    """Возвращает скорость разбора в ячейках в секунду"""
+    start = time.perf_counter()
+    for cell in cells:
+        func(cell)
+    elapsed = time.perf_counter() - start
+    return len(cells) / elapsed if elapsed > 0 else float('inf')
+
+def main():
+    json_file = sys.argv[1] if len(sys.argv) > 1 else 'timetable.json'
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    
+    cells = build_cells(json_file, count)
+    print(f"Ячеек для разбора: {len(cells)} (уникальных: {len(set(cells))})")
+    
+    # Проверяем, что новая реализация дает тот же результат
+    mismatches = [cell for cell in set(cells) if parse_cell(cell) != legacy_parse_cell(cell)]
+    if mismatches:
+        print(f"✗ Результаты отличаются для {len(mismatches)} ячеек, например: {mismatches[0]!r}")
+        sys.exit(1)
+    print("✓ Результаты совпадают с прежней реализацией")
+    
+    before = measure(legacy_parse_cell, cells)
+    after = measure(parse_cell, cells)
+    
+    print(f"\nДо:    {before:,.0f} ячеек/с")
+    print(f"После: {after:,.0f} ячеек/с")
+    print(f"Ускорение: {after / before:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк скачивания расписаний на локальной копии сайта (mock_schedule_site.py)
+Запускает сайт с сотнями синтетических PDF в фоновом потоке, скачивает их тем же кодом,
+что и download_schedules.py (сессия, пул потоков, манифест, хранилище), во временную папку
+и выводит файлов в секунду и МБ в секунду. Сеть не нужна, результаты можно сохранить
+и сравнить с прошлым запуском.
+
+Сценарии:
+    cold      - первое скачивание всех файлов
+    warm      - повторный запуск: условные запросы, ответы 304
+    updated   - повторный запуск после обновления 10% файлов на сайте
+    latency   - задержка ответа 20 мс
+    throttled - скорость отдачи 256 КБ/с на ответ
+    failures  - 5% ответов 503 и 2% оборванных соединений
+
+Использование:
+    python3 benchmark_downloads.py
+    python3 benchmark_downloads.py --files 500 --workers 8
+    python3 benchmark_downloads.py --scenario cold --scenario latency
+    python3 benchmark_downloads.py --output before.json
+    python3 benchmark_downloads.py --compare before.json
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import json_codec
+from dataclasses import asdict, replace
+from typing import Dict, Optional
+
+from download_manifest import DownloadManifest, NEW, UPDATED, NOT_MODIFIED
+from download_schedules import (DOWNLOAD_WORKERS, HostRateLimiter, create_directories, iter_downloads,
+                                make_session, parse_schedule_page)
+from mock_schedule_site import MockSite, SiteOptions
+from pdf_store import PdfStore
+
+# Параметры сайта сценария (поверх общих) и сколько файлов обновить перед замеряемым запуском
+SCENARIOS = {
+    'cold': ({}, None),
+    'warm': ({}, 0),
+    'updated': ({}, 0.1),
+    'latency': ({'latency': 0.02}, None),
+    'throttled': ({'bandwidth': 256 * 1024}, None),
+    'failures': ({'fail_rate': 0.05, 'drop_rate': 0.02}, None),
+}
+
+def download_all(url: str, base_url: str, workers: int, rate: float) -> Dict:
+    """Одно скачивание в текущей папке: счетчики результатов и время"""
+    session = make_session(workers)
+    manifest = DownloadManifest()
+    store = PdfStore()
+    counts = {NEW: 0, UPDATED: 0, NOT_MODIFIED: 0, 'failed': 0}
+    started = time.perf_counter()
+    # Подробный вывод скачивания не нужен
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_directories()
+        pdf_links = parse_schedule_page(session, url, manifest, base_url)
+        for _, result, error in iter_downloads(session, pdf_links, manifest, store,
+                                               HostRateLimiter(rate), workers):
+            counts['failed' if error is not None else result['status']] += 1
+    seconds = time.perf_counter() - started
+    manifest.save()
+    session.close()
+    return {'seconds': seconds, 'links': len(pdf_links), **counts}
+
+def run_scenario(options: SiteOptions, update: Optional[float], workers: int, rate: float) -> Dict:
+    """
+    Запускает сайт и скачивает его во временную папку.
+    Для warm и updated сначала выполняется незамеряемое скачивание, затем замеряемое повторное.
+    """
+    cwd = os.getcwd()
+    with MockSite(options) as site, tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            if update is not None:
+                download_all(site.url, site.base_url, workers, rate)
+                site.update(int(options.files * update))
+                site.reset_stats()
+            run = download_all(site.url, site.base_url, workers, rate)
+        finally:
+            os.chdir(cwd)
+        stats = dict(site.stats)
+
+    seconds = run['seconds']
+    return {
+        'site': asdict(options),
+        'seconds': round(seconds, 4),
+        'links': run['links'],
+        'new': run[NEW],
+        'updated': run[UPDATED],
+        'not_modified': run[NOT_MODIFIED],
+        'failed': run['failed'],
+        'requests': stats['requests'],
+        'bytes': stats['bytes'],
+        'files_per_second': round(run['links'] / seconds, 1),
+        'mb_per_second': round(stats['bytes'] / seconds / (1024 * 1024), 2),
+    }
+
+def print_results(results: Dict[str, Dict], baseline: Optional[Dict[str, Dict]] = None):
+    """Таблица результатов; при baseline - ускорение относительно сохраненного запуска"""
+    header = (f"{'Сценарий':<11}{'Файлов':>8}{'Новых':>7}{'Обн.':>6}{'304':>6}{'Ошибок':>8}"
+              f"{'Время, с':>10}{'Файл/с':>9}{'МБ/с':>8}")
+    if baseline:
+        header += f"{'Ускорение':>11}"
+    print(header)
+    for name, result in results.items():
+        line = (f"{name:<11}{result['links']:>8}{result['new']:>7}{result['updated']:>6}"
+                f"{result['not_modified']:>6}{result['failed']:>8}{result['seconds']:>10.3f}"
+                f"{result['files_per_second']:>9.1f}{result['mb_per_second']:>8.2f}")
+        if baseline:
+            before = baseline.get(name)
+            if before and before['site'] == result['site']:
+                line += f"{before['seconds'] / result['seconds']:>10.2f}x"
+            else:
+                line += f"{'-':>11}"
+        print(line)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Бенчмарк скачивания на локальной копии сайта')
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help='сценарий (можно несколько, по умолчанию все)')
+    parser.add_argument('--files', type=int, default=SiteOptions.files, help='ссылок на PDF на странице')
+    parser.add_argument('--pages', type=int, default=SiteOptions.pages, help='страниц в каждом PDF')
+    parser.add_argument('--workers', type=int, default=DOWNLOAD_WORKERS, help='потоков скачивания')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='не более N запросов в секунду (по умолчанию без ограничения)')
+    parser.add_argument('--output', help='сохранить результаты в JSON')
+    parser.add_argument('--compare', help='JSON с результатами прошлого запуска для сравнения')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    workers = max(args.workers, 1)
+    base = SiteOptions(files=args.files, pages=args.pages)
+    names = args.scenario or list(SCENARIOS)
+    rate = f"не более {args.rate:g} запросов/с" if args.rate else "без ограничения запросов"
+    print(f"Файлов на сайте: {args.files}, потоков: {workers}, {rate}\n")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json_codec.load(f)['results']
+
+    results = {}
+    for name in names:
+        overrides, update = SCENARIOS[name]
+        print(f"Сценарий {name}...", flush=True)
+        results[name] = run_scenario(replace(base, **overrides), update, workers, args.rate)
+
+    print()
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json_codec.dump({'workers': workers, 'rate': args.rate, 'results': results}, f)
+        print(f"\nРезультаты сохранены в {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Микро-бенчмарк расшифровки сокращений в названиях дисциплин
+Сравнивает оба способа AbbreviationMatcher (буквальные сокращения - поиском слов по словарю,
+как по умолчанию; все сокращения - через выражение) с прежней реализацией - отдельный re.sub
+на каждое сокращение - для словаря abbreviations.json и словарей в 10 и 100 раз больше
+(дополнены синтетическими сокращениями, как если бы extract_abbreviations.py продолжал
+пополнять словарь), и проверяет, что результаты совпадают. Кроме названий из расписания
+проверяются названия из склеенных и соседних сокращений ("Анат.физиол.", "хир.Адап."):
+в них замена одного сокращения меняет совпадения следующих
+
+Использование:
+    python3 benchmark_normalize.py                  # дисциплины из timetable.json
+    python3 benchmark_normalize.py timetable.json 5000
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from typing import Callable, Dict, List
+
+from normalize_disciplines import ABBREVIATIONS, AbbreviationMatcher
+from timetable_format import iter_timetable
+
+SCALES = [1, 10, 100]
+
+# Сколько названий из склеенных сокращений проверяется для каждого словаря
+GLUED_NAMES = 3000
+
+# Каждая реализация работает не меньше этого времени (прежняя на больших словарях очень медленная)
+MIN_SECONDS = 2.0
+
+# ---------------------------------------------------------------------------
+# Прежняя реализация (re.sub по каждому сокращению) - эталон
+# ---------------------------------------------------------------------------
+
+def legacy_expand(name: str, abbreviations: Dict[str, str]) -> str:
+    result = name
+    for pattern, replacement in abbreviations.items():
+        result = re.sub(pattern, replacement, result)
+    return result
+
+# ---------------------------------------------------------------------------
+
+# Разделители между сокращениями в glued_names и названия, которые проверяются всегда
+GLUED_SEPARATORS = ['', '', '.', ' ', ', ', '-', ' и ', '(']
+GLUED_EXAMPLES = ['Анат.физиол.', 'хир.Адап.', 'анат.физиол. и хир.', 'Анат. физиол.']
+_LITERAL = re.compile(r'\\b(\w+)(\\\.|\\b)?')
+
+def glued_names(abbreviations: Dict[str, str], count: int, seed: int = 0) -> List[str]:
+    """
+    Названия из нескольких сокращений словаря подряд, в том числе без пробелов между ними
+    (как "Анат.физиол."): после замены одного сокращения у следующего может пропасть
+    начало слова, и результат зависит от того, в каком порядке применяются замены
+    """
+    rng = random.Random(seed)
+    forms = []
+    for pattern in abbreviations:
+        literal = _LITERAL.fullmatch(pattern)
+        if literal:
+            forms.append(literal.group(1) + ('.' if literal.group(2) == '\\.' else ''))
+    names = list(GLUED_EXAMPLES)
+    while forms and len(names) < count:
+        parts = [rng.choice(forms) for _ in range(rng.randint(2, 4))]
+        names.append(''.join(part + rng.choice(GLUED_SEPARATORS) for part in parts).strip())
+    return names
+
+def scaled_dictionary(abbreviations: Dict[str, str], scale: int, seed: int = 0) -> Dict[str, str]:
+    """
+    Словарь в scale раз больше: после настоящих сокращений (их порядок и приоритет не меняются)
+    идут синтетические того же вида - "Сокр." / "сокр." и "СОКР" / "сокр"
+    """
+    rng = random.Random(seed)
+    letters = 'абвгдежзиклмнопрстуфхцчшщэюя'
+    result = dict(abbreviations)
+    target = len(abbreviations) * scale
+    while len(result) < target:
+        stem = ''.join(rng.choice(letters) for _ in range(rng.randint(3, 6)))
+        full = stem + 'ология'
+        variants = [(f"\\b{stem.capitalize()}\\.", full.capitalize()), (f"\\b{stem}\\.", full),
+                    (f"\\b{stem.upper()}\\b", full), (f"\\b{stem}\\b", full)]
+        for pattern, replacement in variants:
+            if len(result) < target:
+                result.setdefault(pattern, replacement)
+    return result
+
+def load_names(json_file: str, count: int) -> List[str]:
+    """Названия дисциплин из расписания, повторенные до count"""
+    base = sorted({entry.discipline for entry in iter_timetable(json_file) if entry.discipline})
+    return [base[i % len(base)] for i in range(count)]
+
+def measure(func: Callable[[str], str], names: List[str]) -> float:
+    """Скорость в названиях в секунду: проходы по names повторяются, пока не пройдет MIN_SECONDS"""
+    processed = 0
+    start = time.perf_counter()
+    while True:
+        for name in names:
+            func(name)
+            processed += 1
+            if processed % 16 == 0 and time.perf_counter() - start >= MIN_SECONDS:
+                return processed / (time.perf_counter() - start)
+        if time.perf_counter() - start >= MIN_SECONDS:
+            return processed / (time.perf_counter() - start)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Бенчмарк расшифровки сокращений в названиях дисциплин')
+    parser.add_argument('json_file', nargs='?', default='timetable.json',
+                        help='расписание, из которого берутся названия (по умолчанию timetable.json)')
+    parser.add_argument('count', nargs='?', type=int, default=5000,
+                        help='названий в наборе (по умолчанию 5000)')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    names = load_names(args.json_file, args.count)
+    unique = sorted(set(names))
+    print(f"Названий: {len(names)} (уникальных: {len(unique)}), сокращений в словаре: {len(ABBREVIATIONS)}\n")
+    print(f"{'Словарь':<10}{'Сокращений':>12}{'До, назв/с':>14}{'Выражение':>14}{'По словам':>14}{'Ускорение':>11}")
+
+    for scale in SCALES:
+        abbreviations = scaled_dictionary(ABBREVIATIONS, scale)
+        matcher = AbbreviationMatcher(abbreviations)
+        regex_matcher = AbbreviationMatcher(abbreviations, literals=False)
+
+        # Проверяем, что новая реализация дает тот же результат, в том числе на склеенных сокращениях
+        compiled = [(re.compile(pattern), replacement) for pattern, replacement in abbreviations.items()]
+        for name in unique + glued_names(abbreviations, GLUED_NAMES):
+            expected = name
+            for pattern, replacement in compiled:
+                expected = pattern.sub(replacement, expected)
+            if not matcher.expand(name) == regex_matcher.expand(name) == expected:
+                print(f"✗ Результат отличается от прежней реализации (словарь {scale}x) для {name!r}: "
+                      f"{expected!r} -> {matcher.expand(name)!r}")
+                sys.exit(1)
+
+        before = measure(lambda name: legacy_expand(name, abbreviations), names)
+        regex_only = measure(regex_matcher.expand, names)
+        words = measure(matcher.expand, names)
+        print(f"{f'{scale}x':<10}{len(abbreviations):>12}{before:>14,.0f}{regex_only:>14,.0f}{words:>14,.0f}"
+              f"{words / before:>10.1f}x", flush=True)
+
+    print("\n✓ Результаты совпадают с прежней реализацией")
+
+if __name__ == '__main__':
+    main()
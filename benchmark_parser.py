@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк парсера PDF расписаний на синтетических файлах
+Генерирует PDF в формате таблиц СурГУ (см. synthetic_schedule.py), парсит их
+parse_pdf и выводит страниц в секунду, записей в секунду и пик памяти.
+Каждый прогон выполняется в отдельном процессе, чтобы пик памяти относился только к нему.
+Сеть и реальные расписания не нужны, результаты можно сохранить и сравнить с прошлым запуском.
+
+Использование:
+    python3 benchmark_parser.py                       # стандартный набор сценариев
+    python3 benchmark_parser.py --pages 200 --groups 4 --subgroups 2 --even-odd 0.5
+    python3 benchmark_parser.py --single-pass --table-template
+    python3 benchmark_parser.py --output before.json  # сохранить результаты
+    python3 benchmark_parser.py --compare before.json # сравнить с сохраненными
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import json_codec
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from typing import Dict, Optional
+
+from parse_all_schedules import reset_peak_rss, peak_rss_mb
+from parse_timetable import parse_pdf, clear_cell_cache
+from synthetic_schedule import ScheduleLayout, write_schedule_pdf
+
+# Стандартный набор: базовый документ и по одному измененному параметру
+SCENARIOS = {
+    'base': ScheduleLayout(pages=20, groups=2, subgroups=1, even_odd=0.25),
+    'subgroups': ScheduleLayout(pages=20, groups=2, subgroups=2, even_odd=0.25),
+    'even-odd': ScheduleLayout(pages=20, groups=2, subgroups=1, even_odd=1.0),
+    'groups': ScheduleLayout(pages=20, groups=8, subgroups=1, even_odd=0.25),
+    'large': ScheduleLayout(pages=100, groups=2, subgroups=1, even_odd=0.25),
+}
+
+def run_once(pdf_path: str, options: Dict) -> Dict:
+    """Один прогон parse_pdf (выполняется в отдельном процессе): время, записи и пик памяти"""
+    clear_cell_cache()
+    reset_peak_rss()
+    started = time.perf_counter()
+    entries = parse_pdf(pdf_path, **options)
+    seconds = time.perf_counter() - started
+    return {'seconds': seconds, 'entries': len(entries), 'peak_rss_mb': peak_rss_mb()}
+
+def run_scenario(pdf_path: str, layout: ScheduleLayout, expected: int, options: Dict, repeat: int) -> Dict:
+    """Лучший из repeat прогонов по времени; пик памяти - максимум по прогонам"""
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            runs.append(executor.submit(run_once, pdf_path, options).result())
+
+    best = min(runs, key=lambda run: run['seconds'])
+    if best['entries'] != expected:
+        raise RuntimeError(f"парсер нашел {best['entries']} записей вместо {expected} - "
+                           f"синтетический PDF разобран неверно")
+
+    peaks = [run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None]
+    return {
+        'layout': asdict(layout),
+        'seconds': round(best['seconds'], 4),
+        'entries': best['entries'],
+        'pages_per_second': round(layout.pages / best['seconds'], 2),
+        'entries_per_second': round(best['entries'] / best['seconds'], 1),
+        'peak_rss_mb': round(max(peaks), 1) if peaks else None,
+    }
+
+def print_results(results: Dict[str, Dict], baseline: Optional[Dict[str, Dict]] = None):
+    """Таблица результатов; при baseline - ускорение относительно сохраненного запуска"""
+    header = f"{'Сценарий':<12}{'Страниц':>8}{'Записей':>9}{'Время, с':>10}{'Стр/с':>9}{'Зап/с':>10}{'Пик, МБ':>9}"
+    if baseline:
+        header += f"{'Ускорение':>11}"
+    print(header)
+    for name, result in results.items():
+        peak = f"{result['peak_rss_mb']:.0f}" if result['peak_rss_mb'] is not None else '-'
+        line = (f"{name:<12}{result['layout']['pages']:>8}{result['entries']:>9}{result['seconds']:>10.3f}"
+                f"{result['pages_per_second']:>9.1f}{result['entries_per_second']:>10.0f}{peak:>9}")
+        if baseline:
+            before = baseline.get(name)
+            if before and before['layout'] == result['layout']:
+                line += f"{before['seconds'] / result['seconds']:>10.2f}x"
+            else:
+                line += f"{'-':>11}"
+        print(line)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Бенчмарк парсера на синтетических PDF расписаниях')
+    layout = parser.add_argument_group('документ (любой параметр заменяет стандартный набор одним сценарием)')
+    layout.add_argument('--pages', type=int, help='количество страниц')
+    layout.add_argument('--groups', type=int, help='количество групп')
+    layout.add_argument('--subgroups', type=int, choices=[1, 2], help='колонок подгрупп')
+    layout.add_argument('--even-odd', type=float, help='доля ячеек "четная // нечетная неделя" (0-1)')
+
+    modes = parser.add_argument_group('режим парсера')
+    modes.add_argument('--page-workers', type=int, default=1, help='процессов для извлечения страниц')
+    modes.add_argument('--single-pass', action='store_true', help='одна раскладка страницы')
+    modes.add_argument('--table-template', action='store_true', help='поиск таблиц по шаблону')
+    modes.add_argument('--low-memory', action='store_true', help='освобождать кэш страниц')
+
+    parser.add_argument('--repeat', type=int, default=3, help='прогонов на сценарий (берется лучший)')
+    parser.add_argument('--pdf-dir', help='папка для синтетических PDF (по умолчанию временная)')
+    parser.add_argument('--output', help='сохранить результаты в JSON')
+    parser.add_argument('--compare', help='JSON с результатами прошлого запуска для сравнения')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    custom = {name: value for name, value in (('pages', args.pages), ('groups', args.groups),
+                                              ('subgroups', args.subgroups), ('even_odd', args.even_odd))
+              if value is not None}
+    if custom:
+        layout = ScheduleLayout(**{**asdict(SCENARIOS['base']), **custom})
+        scenarios = {'custom': layout}
+    else:
+        scenarios = SCENARIOS
+
+    options = {
+        'page_workers': args.page_workers,
+        'single_pass': args.single_pass,
+        'table_template': args.table_template,
+        'low_memory': args.low_memory
+    }
+    enabled = [name for name, value in options.items() if value is True]
+    if args.page_workers > 1:
+        enabled.append(f"page_workers={args.page_workers}")
+    print(f"Режим парсера: {', '.join(enabled) if enabled else 'по умолчанию'}, прогонов: {args.repeat}\n")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json_codec.load(f)['results']
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_dir = args.pdf_dir or tmp_dir
+        os.makedirs(pdf_dir, exist_ok=True)
+        for name, layout in scenarios.items():
+            pdf_path = os.path.join(pdf_dir, f"synthetic_{name}.pdf")
+            expected = write_schedule_pdf(pdf_path, layout)
+            print(f"Сценарий {name}: {layout.pages} страниц, групп {layout.groups}, "
+                  f"подгрупп {layout.subgroups}, четная//нечетная {layout.even_odd:.0%}", flush=True)
+            try:
+                results[name] = run_scenario(pdf_path, layout, expected, options, args.repeat)
+            except RuntimeError as e:
+                print(f"✗ {e}")
+                sys.exit(1)
+
+    print()
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json_codec.dump({'options': options, 'results': results}, f)
+        print(f"\nРезультаты сохранены в {args.output}")
+
+if __name__ == '__main__':
+    main()
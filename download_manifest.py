@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Манифест скачанных расписаний
+Хранит для каждого PDF URL, имя файла, ETag, Last-Modified, размер и SHA-256
+в download_manifest.json, чтобы при следующем запуске запрашивать файлы
+условно (If-None-Match / If-Modified-Since) и скачивать только изменившиеся.
+Для страницы со ссылками хранятся те же заголовки и найденные ссылки.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+import json_codec
+from parse_cache import file_sha256
+
+# Манифест лежит рядом с папкой schedules_pdf/
+MANIFEST_FILE = 'download_manifest.json'
+
+# Результаты скачивания файла
+NEW = 'new'
+UPDATED = 'updated'
+NOT_MODIFIED = 'not_modified'
+
+def validators(headers, cached: Optional[Dict] = None) -> Dict[str, Optional[str]]:
+    """
+    ETag и Last-Modified из заголовков ответа.
+    Ответ 304 может их не содержать - тогда остаются сохраненные (cached).
+    """
+    cached = cached or {}
+    return {'etag': headers.get('ETag') or cached.get('etag'),
+            'last_modified': headers.get('Last-Modified') or cached.get('last_modified')}
+
+def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+    """Заголовки условного запроса по сохраненным ETag и Last-Modified"""
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+class DownloadManifest:
+    """
+    Манифест вида {pages: {url: {etag, last_modified, links}},
+                   files: {url: {file, etag, last_modified, size, sha256}}}.
+    Условный запрос отправляется, только если сохраненный файл на месте
+    и совпадает с записанным (размер и SHA-256), иначе файл скачивается заново.
+    """
+
+    def __init__(self, manifest_file: str = MANIFEST_FILE, reuse: bool = True):
+        self.manifest_file = manifest_file
+        self.reuse = reuse
+        self.pages: Dict[str, Dict] = {}
+        self.files: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                data = json_codec.load(f)
+        except FileNotFoundError:
+            return
+        except json_codec.JSONDecodeError as e:
+            print(f"Предупреждение: манифест {self.manifest_file} поврежден ({e}), скачиваем все файлы заново")
+            return
+        self.pages = data.get('pages', {})
+        self.files = data.get('files', {})
+
+    def page(self, url: str) -> Optional[Dict]:
+        """Сохраненные заголовки и ссылки страницы (None - запрашивать безусловно)"""
+        return self.pages.get(url) if self.reuse else None
+
+    def store_page(self, url: str, page_validators: Dict, links: List[Dict]):
+        self.pages[url] = {**page_validators, 'links': links}
+
+    def lookup(self, url: str, filepath: str) -> Optional[Dict]:
+        """
+        Запись файла, если по ней можно сделать условный запрос:
+        файл на месте, имя то же, размер и SHA-256 совпадают с сохраненными
+        """
+        if not self.reuse:
+            return None
+        entry = self.files.get(url)
+        if not entry or entry.get('file') != filepath or not os.path.exists(filepath):
+            return None
+        if os.path.getsize(filepath) != entry.get('size') or file_sha256(filepath) != entry.get('sha256'):
+            return None
+        return entry
+
+    def store(self, url: str, filepath: str, size: int, sha256: str, file_validators: Dict):
+        """Запоминает скачанный (или подтвержденный сервером) файл"""
+        self.files[url] = {'file': filepath, **file_validators, 'size': size, 'sha256': sha256}
+
+    def save(self):
+        """Атомарно сохраняет манифест"""
+        tmp_path = self.manifest_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json_codec.dump({'pages': self.pages, 'files': self.files}, f)
+        os.replace(tmp_path, self.manifest_file)
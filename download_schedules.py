@@ -3,16 +3,39 @@
 """
 Скрипт для скачивания расписаний с сайта СурГУ
 Скачивает PDF файлы и организует их по папкам
+
+Использование:
+    python3 download_schedules.py                # 4 потока, не более 4 запросов в секунду к сайту
+    python3 download_schedules.py --workers 8 --rate 10
+    python3 download_schedules.py --url http://127.0.0.1:8000/raspisanie --base-url http://127.0.0.1:8000  # другой (локальный) сайт
+
+Файлы скачиваются в нескольких потоках через одну сессию requests с keep-alive:
+соединения с сайтом переиспользуются, а частота запросов ограничивается для каждого хоста.
+Страница и файлы запрашиваются условно (If-None-Match / If-Modified-Since) по манифесту
+download_manifest.json, так что скачиваются только новые и изменившиеся расписания.
+    python3 download_schedules.py --force        # запросить все файлы без условий
+Файлы пишутся во временный <файл>.part и переименовываются только после проверки;
+прерванное скачивание большого файла продолжается с места обрыва (HTTP Range).
 """
 
 import os
 import re
+import argparse
+import hashlib
+import threading
 import requests
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterator, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse, unquote
 import time
 from pathlib import Path
 import urllib3
+import json_codec
+from pdf_store import PdfStore
+from download_manifest import (DownloadManifest, conditional_headers, validators, file_sha256,
+                               NEW, UPDATED, NOT_MODIFIED)
 
 # Отключаем предупреждения о SSL (для тестирования)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -25,6 +48,53 @@ PDFS_DIR = 'schedules_pdf'
 JSONS_DIR = 'schedules_json'
 PARSED_DIR = 'schedules_parsed'
 
+# Значения по умолчанию для параллельного скачивания
+DOWNLOAD_WORKERS = 4
+REQUESTS_PER_SECOND = 4.0  # На один хост
+
+# Недокачанные файлы меньше этого размера скачиваются заново, а не докачиваются
+RESUME_MIN_BYTES = 256 * 1024
+
+PDF_MAGIC = b'%PDF'
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+class HostRateLimiter:
+    """
+    Ограничение частоты запросов к каждому хосту (вместо паузы после каждого файла).
+    Потоки получают по очереди моменты старта с интервалом 1/rate и ждут свой момент
+    вне блокировки, поэтому запросы к разным хостам друг друга не задерживают.
+    """
+    
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_time: Dict[str, float] = {}
+        self.lock = threading.Lock()
+    
+    def wait(self, url: str):
+        """Ждет, пока к хосту url можно отправить следующий запрос"""
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time.get(host, now))
+            self.next_time[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+def make_session(pool_size: int = DOWNLOAD_WORKERS) -> requests.Session:
+    """
+    Сессия с keep-alive для всех запросов к сайту.
+    Пул соединений на хост не меньше числа потоков, чтобы потоки не ждали свободное соединение.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
 def create_directories():
     """Создает необходимые директории"""
     for directory in [PDFS_DIR, JSONS_DIR, PARSED_DIR]:
@@ -128,54 +198,201 @@ def extract_institute_name(link_text: str, url: str) -> str:
     
     return result if result else 'unknown'
 
-def download_pdf(url: str, filename: str) -> bool:
-    """Скачивает PDF файл"""
+def _part_state_path(tmp_path: str) -> str:
+    return tmp_path + '.json'
+
+def _discard_partial(tmp_path: str):
+    """Удаляет недокачанный файл и его состояние"""
+    for path in (tmp_path, _part_state_path(tmp_path)):
+        if os.path.exists(path):
+            os.remove(path)
+
+def _resumable_offset(tmp_path: str, url: str) -> Tuple[int, Optional[str]]:
+    """
+    Сколько байт недокачанного файла можно не скачивать повторно и значение для If-Range.
+    Докачка возможна, если .part достаточно большой, скачивался с того же URL
+    и сервер отдал ETag или Last-Modified (иначе нельзя убедиться, что файл не изменился).
+    """
     try:
-        print(f"  Скачивание: {filename}")
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, timeout=30, stream=True, headers=headers)
-        response.raise_for_status()
-        
-        # Проверяем, что это действительно PDF
-        content_type = response.headers.get('Content-Type', '').lower()
-        if 'pdf' not in content_type and not url.lower().endswith('.pdf'):
-            # Проверяем первые байты файла
-            first_bytes = response.content[:4]
-            if first_bytes != b'%PDF':
-                print(f"  ⚠ Предупреждение: файл может быть не PDF")
+        size = os.path.getsize(tmp_path)
+        with open(_part_state_path(tmp_path), 'r', encoding='utf-8') as f:
+            state = json_codec.load(f)
+    except (OSError, json_codec.JSONDecodeError):
+        _discard_partial(tmp_path)
+        return 0, None
+    if_range = state.get('etag') or state.get('last_modified')
+    if state.get('url') != url or not if_range or size < RESUME_MIN_BYTES:
+        _discard_partial(tmp_path)
+        return 0, None
+    return size, if_range
+
+def _content_range(response: requests.Response) -> Tuple[Optional[int], Optional[int]]:
+    """Начало и полный размер из Content-Range: bytes <начало>-<конец>/<размер>"""
+    match = re.match(r'bytes\s+(\d+)-\d+/(\d+|\*)', response.headers.get('Content-Range', ''))
+    if not match:
+        return None, None
+    total = match.group(2)
+    return int(match.group(1)), (int(total) if total != '*' else None)
+
+def _hash_file(path: str, digest) -> bytes:
+    """Добавляет содержимое файла в digest, возвращает первые байты (для проверки %PDF)"""
+    head = b''
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            if not head:
+                head = chunk[:len(PDF_MAGIC)]
+            digest.update(chunk)
+    return head
+
+def fetch_pdf(session: requests.Session, url: str, filename: str,
+              limiter: Optional[HostRateLimiter] = None, cached: Optional[Dict] = None,
+              store: Optional[PdfStore] = None) -> Dict:
+    """
+    Скачивает PDF файл в PDFS_DIR (выполняется в потоке пула).
+    С cached (запись манифеста) запрос условный: на ответ 304 файл не скачивается.
+    Ответ читается потоком в <файл>.part: сигнатура %PDF, SHA-256 и длина проверяются на лету,
+    готовый файл кладется в хранилище по содержимому (pdf_store.py), а файл с именем filename
+    атомарно становится ссылкой на него, только если содержимое изменилось
+    (сервер может не поддерживать условные запросы). Если скачивание прервалось,
+    большой .part остается и при следующем запуске докачивается запросом Range.
+    Ничего не печатает: возвращает статус (new, updated, not_modified), путь, размер, SHA-256,
+    ETag/Last-Modified и предупреждение; ошибки поднимаются.
+    """
+    store = store or PdfStore()
+    filepath = os.path.join(PDFS_DIR, filename)
+    tmp_path = filepath + '.part'
+    existed = os.path.exists(filepath)
+    offset, if_range = _resumable_offset(tmp_path, url)
+    
+    # Вторая попытка - с начала, если сервер не смог продолжить с offset (416)
+    for _ in range(2):
+        if limiter:
+            limiter.wait(url)
+        # Без сжатия: Range и Content-Length относятся к самому файлу
+        headers = {'Accept-Encoding': 'identity', **conditional_headers(cached)}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+            headers['If-Range'] = if_range
         
-        filepath = os.path.join(PDFS_DIR, filename)
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
+        with session.get(url, timeout=30, stream=True, headers=headers) as response:
+            if response.status_code == 304 and cached:
+                _discard_partial(tmp_path)
+                store.adopt(filepath, cached['sha256'])
+                return {'status': NOT_MODIFIED, 'path': filepath, 'size': cached['size'], 'sha256': cached['sha256'],
+                        'validators': validators(response.headers, cached), 'warning': None}
+            if response.status_code == 416 and offset:
+                _discard_partial(tmp_path)
+                offset = 0
+                continue
+            response.raise_for_status()
+            result = _stream_to_part(response, url, tmp_path, offset)
+        break
+    
+    sha256 = result['sha256']
+    if existed and file_sha256(filepath) == sha256:
+        _discard_partial(tmp_path)
+        store.adopt(filepath, sha256)
+        status = NOT_MODIFIED
+    else:
+        store.put(tmp_path, sha256, filepath)
+        os.remove(_part_state_path(tmp_path))
+        status = UPDATED if existed else NEW
+    
+    return {'status': status, 'path': filepath, 'size': result['size'], 'sha256': sha256,
+            'validators': result['validators'], 'warning': result['warning']}
+
+def _stream_to_part(response: requests.Response, url: str, tmp_path: str, offset: int) -> Dict:
+    """
+    Пишет тело ответа в tmp_path (дописывает, если сервер продолжил с offset - ответ 206).
+    Поднимает ValueError, если это не PDF, и IOError, если файл пришел не целиком;
+    недокачанный файл сохраняется для докачки, если это возможно.
+    """
+    start, total = _content_range(response) if response.status_code == 206 else (None, None)
+    resuming = offset > 0 and start == offset
+    if not resuming:
+        # Сервер прислал файл целиком (файл изменился или Range не поддерживается)
+        _discard_partial(tmp_path)
+        offset = 0
+        content_length = response.headers.get('Content-Length')
+        total = int(content_length) if content_length and content_length.isdigit() else None
+    file_validators = validators(response.headers)
+    content_type = response.headers.get('Content-Type', '').lower()
+    warning = None
+    if content_type and 'pdf' not in content_type and 'octet-stream' not in content_type:
+        warning = f"сервер указал тип {content_type}"
+    
+    digest = hashlib.sha256()
+    head = _hash_file(tmp_path, digest) if resuming else b''
+    if not resuming:
+        # Состояние для докачки пишется до тела ответа, чтобы пережить обрыв
+        with open(_part_state_path(tmp_path), 'w', encoding='utf-8') as f:
+            json_codec.dump({'url': url, **file_validators}, f)
+    
+    size = offset
+    try:
+        with open(tmp_path, 'ab' if resuming else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=65536):
+                if len(head) < len(PDF_MAGIC):
+                    head += chunk[:len(PDF_MAGIC) - len(head)]
+                    # Проверяем сигнатуру по первым байтам файла, не дожидаясь конца скачивания
+                    if len(head) == len(PDF_MAGIC) and head != PDF_MAGIC:
+                        raise ValueError(f"файл не PDF (начинается с {head!r})")
+                digest.update(chunk)
                 f.write(chunk)
-        
-        file_size = os.path.getsize(filepath)
-        print(f"  ✓ Скачано: {filepath} ({file_size} байт)")
+                size += len(chunk)
+        if head != PDF_MAGIC:
+            raise ValueError("файл не PDF (слишком короткий)")
+        if total is not None and size != total:
+            raise IOError(f"файл скачан не полностью: {size} из {total} байт")
+    except ValueError:
+        _discard_partial(tmp_path)
+        raise
+    except BaseException:
+        # Большой файл с ETag/Last-Modified можно будет докачать, остальное удаляем
+        if size < RESUME_MIN_BYTES or not (file_validators['etag'] or file_validators['last_modified']):
+            _discard_partial(tmp_path)
+        raise
+    
+    return {'sha256': digest.hexdigest(), 'size': size, 'validators': file_validators, 'warning': warning}
+
+def download_pdf(url: str, filename: str, session: Optional[requests.Session] = None,
+                 limiter: Optional[HostRateLimiter] = None) -> bool:
+    """Скачивает PDF файл и печатает результат"""
+    try:
+        print(f"  Скачивание: {filename}")
+        result = fetch_pdf(session or make_session(1), url, filename, limiter)
+        if result['warning']:
+            print(f"  ⚠ Предупреждение: {result['warning']}")
+        print(f"  ✓ Скачано: {result['path']} ({result['size']} байт)")
         return True
     except Exception as e:
         print(f"  ✗ Ошибка при скачивании {filename}: {e}")
         return False
 
-def parse_schedule_page():
-    """Парсит страницу с расписаниями и скачивает PDF файлы"""
-    print(f"Загрузка страницы: {SCHEDULE_URL}")
-    
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+def parse_schedule_page(session: Optional[requests.Session] = None, schedule_url: str = SCHEDULE_URL,
+                        manifest: Optional[DownloadManifest] = None, base_url: str = BASE_URL):
+    """
+    Загружает страницу с расписаниями и возвращает ссылки на PDF файлы.
+    Относительные ссылки дополняются до полных от base_url (для локальной копии сайта - ее адрес).
+    С манифестом страница запрашивается условно: если она не изменилась (304),
+    возвращаются ссылки, найденные в прошлый раз.
+    """
+    print(f"Загрузка страницы: {schedule_url}")
+    
+    session = session or make_session(1)
+    cached = manifest.page(schedule_url) if manifest else None
+    headers = conditional_headers(cached)
     
     try:
         # Пробуем с проверкой SSL
-        response = requests.get(SCHEDULE_URL, timeout=30, headers=headers, verify=True)
+        response = session.get(schedule_url, timeout=30, verify=True, headers=headers)
         response.raise_for_status()
         response.encoding = 'utf-8'
     except requests.exceptions.SSLError:
         # Если ошибка SSL, пробуем без проверки (небезопасно, но для тестирования)
         print("Предупреждение: SSL ошибка, пробуем без проверки сертификата...")
         try:
-            response = requests.get(SCHEDULE_URL, timeout=30, headers=headers, verify=False)
+            response = session.get(schedule_url, timeout=30, verify=False, headers=headers)
             response.raise_for_status()
             response.encoding = 'utf-8'
         except Exception as e:
@@ -185,6 +402,10 @@ def parse_schedule_page():
         print(f"Ошибка при загрузке страницы: {e}")
         return []
     
+    if response.status_code == 304 and cached:
+        print("Страница не изменилась с прошлого запуска, используем сохраненные ссылки")
+        return unique_links(cached['links'])
+    
     # Пробуем разные парсеры
     try:
         soup = BeautifulSoup(response.text, 'lxml')
@@ -212,7 +433,7 @@ def parse_schedule_page():
         # Проверяем, является ли это ссылкой на PDF
         href_lower = href.lower()
         if '.pdf' in href_lower or '/attachment/' in href_lower or '/download/' in href_lower:
-            full_url = urljoin(BASE_URL, href)
+            full_url = urljoin(base_url, href)
             
             # Извлекаем название института/направления из текста или URL
             institute = extract_institute_name(text, full_url)
@@ -264,17 +485,75 @@ def parse_schedule_page():
                 'text': text
             })
     
-    # Убираем дубликаты по URL
+    unique = unique_links(pdf_links)
+    if manifest:
+        manifest.store_page(schedule_url, validators(response.headers), unique)
+    return unique
+
+def unique_links(pdf_links: List[Dict]) -> List[Dict]:
+    """
+    Убирает дубликаты по URL и по имени файла: ссылки .../x.pdf и .../x.pdf?v=2 дают одно имя,
+    и их одновременное скачивание писало бы в один и тот же .part. Остается первая ссылка.
+    """
     seen_urls = set()
-    unique_links = []
+    seen_files = set()
+    unique = []
     for link in pdf_links:
-        if link['url'] not in seen_urls:
-            seen_urls.add(link['url'])
-            unique_links.append(link)
-    
-    return unique_links
+        if link['url'] in seen_urls:
+            continue
+        seen_urls.add(link['url'])
+        if link['filename'] in seen_files:
+            print(f"  Пропуск {link['url']}: файл {link['filename']} уже скачивается по другой ссылке")
+            continue
+        seen_files.add(link['filename'])
+        unique.append(link)
+    return unique
+
+def iter_downloads(session: requests.Session, pdf_links: List[Dict], manifest: DownloadManifest,
+                   store: PdfStore, limiter: Optional[HostRateLimiter] = None,
+                   workers: int = DOWNLOAD_WORKERS) -> Iterator[Tuple[Dict, Optional[Dict], Optional[Exception]]]:
+    """
+    Скачивает файлы по ссылкам в пуле потоков, каждый - условно по записи манифеста.
+    Выдает (ссылка, результат fetch_pdf, None) или (ссылка, None, ошибка) по мере завершения;
+    успешные результаты записываются в манифест (сохраняет его вызывающий код).
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for link in pdf_links:
+            cached = manifest.lookup(link['url'], os.path.join(PDFS_DIR, link['filename']))
+            future = executor.submit(fetch_pdf, session, link['url'], link['filename'], limiter, cached, store)
+            futures[future] = link
+        
+        for future in as_completed(futures):
+            link = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                yield link, None, e
+                continue
+            manifest.store(link['url'], result['path'], result['size'], result['sha256'], result['validators'])
+            yield link, result, None
+
+def parse_args():
+    """Разбирает аргументы командной строки"""
+    parser = argparse.ArgumentParser(description='Скачивание PDF расписаний с сайта СурГУ')
+    parser.add_argument('--workers', type=int, default=DOWNLOAD_WORKERS,
+                        help=f'количество потоков скачивания (по умолчанию {DOWNLOAD_WORKERS})')
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND,
+                        help=f'не более N запросов в секунду к одному хосту '
+                             f'(по умолчанию {REQUESTS_PER_SECOND:g}, 0 - без ограничения)')
+    parser.add_argument('--url', default=SCHEDULE_URL,
+                        help='страница со ссылками на расписания (например, локальный сервер для проверки)')
+    parser.add_argument('--base-url', default=BASE_URL,
+                        help=f'адрес, от которого отсчитываются относительные ссылки на PDF (по умолчанию {BASE_URL})')
+    parser.add_argument('--force', action='store_true',
+                        help='не использовать условные запросы, запросить страницу и все файлы заново')
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    workers = max(args.workers, 1)
+    
     print("=" * 60)
     print("Скачивание расписаний с сайта СурГУ")
     print("=" * 60)
@@ -282,12 +561,19 @@ def main():
     # Создаем директории
     create_directories()
     
+    # Одна сессия с keep-alive на страницу и все файлы
+    session = make_session(workers)
+    limiter = HostRateLimiter(args.rate)
+    manifest = DownloadManifest(reuse=not args.force)
+    store = PdfStore()
+    
     # Парсим страницу
     print(f"\nПарсинг страницы расписаний...")
-    pdf_links = parse_schedule_page()
+    pdf_links = parse_schedule_page(session, args.url, manifest, args.base_url)
     
     if not pdf_links:
         print("Не найдено ссылок на PDF файлы")
+        manifest.save()
         return
     
     print(f"\nНайдено ссылок на PDF: {len(pdf_links)}")
@@ -304,37 +590,55 @@ def main():
     for inst, links in by_institute.items():
         print(f"  {inst}: {len(links)} файлов")
     
-    # Скачиваем файлы
-    print(f"\nНачинаем скачивание...")
-    downloaded = 0
+    # Скачиваем файлы: каждый запрашивается условно по записи манифеста (если файл на месте)
+    print(f"\nНачинаем скачивание (потоков: {workers})...", flush=True)
+    counts = {NEW: 0, UPDATED: 0, NOT_MODIFIED: 0}
     failed = 0
-    skipped = 0
+    done = 0
+    hashes = {}
+    started = time.perf_counter()
     
-    for i, link in enumerate(pdf_links, 1):
-        filepath = os.path.join(PDFS_DIR, link['filename'])
-        
-        # Проверяем, не существует ли уже файл
-        if os.path.exists(filepath):
-            print(f"\n[{i}/{len(pdf_links)}] {link['text'][:50]}...")
-            print(f"  ⊘ Файл уже существует, пропускаем: {link['filename']}")
-            skipped += 1
-            continue
-        
-        print(f"\n[{i}/{len(pdf_links)}] {link['text'][:50]}...")
-        if download_pdf(link['url'], link['filename']):
-            downloaded += 1
-        else:
-            failed += 1
-        
-        # Небольшая задержка между запросами
-        time.sleep(0.5)
+    # Строки прогресса [i/N] печатаются по мере завершения файлов
+    try:
+        for link, result, error in iter_downloads(session, pdf_links, manifest, store, limiter, workers):
+            done += 1
+            print(f"\n[{done}/{len(pdf_links)}] {link['text'][:50]}...")
+            if error is not None:
+                print(f"  ✗ Ошибка при скачивании {link['filename']}: {error}", flush=True)
+                failed += 1
+                continue
+            
+            hashes[link['url']] = result['sha256']
+            counts[result['status']] += 1
+            if result['warning']:
+                print(f"  ⚠ Предупреждение: {result['warning']}")
+            if result['status'] == NOT_MODIFIED:
+                print(f"  ⊘ Не изменился: {result['path']}", flush=True)
+            elif result['status'] == UPDATED:
+                print(f"  ✓ Обновлен: {result['path']} ({result['size']} байт)", flush=True)
+            else:
+                print(f"  ✓ Скачано: {result['path']} ({result['size']} байт)", flush=True)
+    finally:
+        # Сохраняем манифест даже при прерывании, чтобы не скачивать уже полученные файлы
+        manifest.save()
+    
+    elapsed = time.perf_counter() - started
+    downloaded = counts[NEW] + counts[UPDATED]
+    unique = len(set(hashes.values()))
+    # Старые версии расписаний, на которые больше не ссылается ни один файл
+    pruned = store.prune()
     
     print(f"\n" + "=" * 60)
     print(f"Скачивание завершено!")
-    print(f"  Успешно скачано: {downloaded}")
-    print(f"  Пропущено (уже существуют): {skipped}")
+    print(f"  Новых файлов: {counts[NEW]}")
+    print(f"  Обновлено: {counts[UPDATED]}")
+    print(f"  Не изменилось: {counts[NOT_MODIFIED]}")
     print(f"  Ошибок: {failed}")
     print(f"  Всего обработано: {len(pdf_links)}")
+    print(f"  Уникальных PDF: {unique}")
+    if pruned:
+        print(f"  Удалено старых версий из хранилища: {pruned}")
+    print(f"  Время скачивания: {elapsed:.1f} с")
     print(f"\nФайлы сохранены в папку: {PDFS_DIR}/")
     
     if downloaded > 0:
@@ -5,12 +5,13 @@
 Анализирует все JSON файлы расписаний и находит новые сокращения
 """
 
-import json
 import re
 import glob
 import time
 from collections import defaultdict
 from typing import Dict, Set, List
+import json_codec
+from timetable_format import iter_timetable
 
 def load_existing_abbreviations(abbrev_file: str = None) -> Dict[str, str]:
     """
@@ -29,7 +30,7 @@ def load_existing_abbreviations(abbrev_file: str = None) -> Dict[str, str]:
         try:
             file_abbrev = {}
             with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+                data = json_codec.load(f)
                 # Объединяем все сокращения из разных категорий
                 if 'abbreviations' in data:
                     for category in data['abbreviations'].values():
@@ -42,7 +43,7 @@ def load_existing_abbreviations(abbrev_file: str = None) -> Dict[str, str]:
             print(f"  Загружено из {file_path}: {added_count} сокращений (всего в файле: {len(file_abbrev)})")
         except FileNotFoundError:
             continue
-        except json.JSONDecodeError as e:
+        except json_codec.JSONDecodeError as e:
             print(f"Ошибка при чтении {file_path}: {e}")
             continue
     
@@ -51,14 +52,12 @@ def load_existing_abbreviations(abbrev_file: str = None) -> Dict[str, str]:
 def extract_disciplines_from_json(json_file: str) -> Set[str]:
     """Извлекает все уникальные названия дисциплин из JSON файла"""
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            disciplines = set()
-            for entry in data:
-                discipline = entry.get('discipline', '')
-                if discipline and discipline.strip():
-                    disciplines.add(discipline.strip())
-            return disciplines
+        disciplines = set()
+        for entry in iter_timetable(json_file):
+            discipline = entry.discipline
+            if discipline and discipline.strip():
+                disciplines.add(discipline.strip())
+        return disciplines
     except Exception as e:
         print(f"Ошибка при чтении {json_file}: {e}")
         return set()
@@ -320,8 +319,9 @@ def save_abbreviations(abbreviations: Dict[str, str], output_file: str, existing
         "metadata": metadata
     }
     
+    # Словарь правится вручную, поэтому всегда пишется с отступом
     with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        json_codec.dump(data, f, compact=False)
     
     print(f"Сокращения сохранены в {output_file}")
 
@@ -397,7 +397,7 @@ def main():
     if Path(abbrev_file).exists():
         try:
             with open(abbrev_file, 'r', encoding='utf-8') as f:
-                existing_structure = json.load(f)
+                existing_structure = json_codec.load(f)
         except:
             pass
     
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Общая запись и чтение JSON для всех скриптов и backend
+Использует orjson, если он установлен, иначе стандартный json. Результат
+у обоих одинаковый: UTF-8 без экранирования кириллицы, отступ 2 или компактный вид.
+- обычный режим   - отступ 2 (как json.dump(..., ensure_ascii=False, indent=2))
+- компактный режим - без отступов и пробелов, меньше файлы и быстрее запись
+
+Компактный режим включается configure(compact=True) (флаг --compact-json у скриптов парсинга)
+или переменной окружения TIMETABLE_JSON_COMPACT=1, которую наследуют дочерние процессы.
+TIMETABLE_JSON_BACKEND=json принудительно включает стандартный json (для сравнения).
+"""
+
+import json
+import os
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+except ImportError:  # Необязательная зависимость
+    orjson = None
+
+if os.environ.get('TIMETABLE_JSON_BACKEND') == 'json':
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+COMPACT_ENV = 'TIMETABLE_JSON_COMPACT'
+
+# Ошибка разбора у обоих вариантов (orjson.JSONDecodeError - подкласс json.JSONDecodeError)
+JSONDecodeError = json.JSONDecodeError
+
+_compact = os.environ.get(COMPACT_ENV) == '1'
+
+def configure(compact: bool):
+    """Включает или выключает компактный режим для этого процесса и его дочерних процессов"""
+    global _compact
+    _compact = compact
+    os.environ[COMPACT_ENV] = '1' if compact else '0'
+
+def is_compact() -> bool:
+    return _compact
+
+def dumps_bytes(obj: Any, compact: Optional[bool] = None) -> bytes:
+    """Сериализует объект в UTF-8 (для файлов в двоичном режиме и ответов HTTP)"""
+    if compact is None:
+        compact = _compact
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS
+        if not compact:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=options)
+    return dumps(obj, compact).encode('utf-8')
+
+def dumps(obj: Any, compact: Optional[bool] = None) -> str:
+    """Сериализует объект в строку: с отступом 2 или компактно (compact=None - режим процесса)"""
+    if compact is None:
+        compact = _compact
+    if orjson is not None:
+        return dumps_bytes(obj, compact).decode('utf-8')
+    if compact:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+def dumps_line(obj: Any) -> str:
+    """Однострочная компактная запись (строки NDJSON и занятия компактного формата)"""
+    return dumps(obj, compact=True)
+
+def dump(obj: Any, f, compact: Optional[bool] = None):
+    """Записывает объект в открытый текстовый файл"""
+    f.write(dumps(obj, compact))
+
+def _apply_hook(obj: Any, object_hook: Callable[[dict], Any]) -> Any:
+    """Применяет object_hook к словарям снизу вверх, как json.load (разобранный объект меняется на месте)"""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if isinstance(value, (dict, list)):
+                obj[key] = _apply_hook(value, object_hook)
+        return object_hook(obj)
+    if isinstance(obj, list):
+        for i, value in enumerate(obj):
+            if isinstance(value, (dict, list)):
+                obj[i] = _apply_hook(value, object_hook)
+    return obj
+
+def loads(data, object_hook: Optional[Callable[[dict], Any]] = None) -> Any:
+    """Разбирает JSON из строки или байтов"""
+    if orjson is not None:
+        obj = orjson.loads(data)
+        return _apply_hook(obj, object_hook) if object_hook else obj
+    return json.loads(data, object_hook=object_hook)
+
+def load(f, object_hook: Optional[Callable[[dict], Any]] = None) -> Any:
+    """Читает JSON из открытого файла"""
+    if orjson is not None:
+        return loads(f.read(), object_hook)
+    return json.load(f, object_hook=object_hook)
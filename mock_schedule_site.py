@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальная копия сайта СурГУ для проверки и замеров скачивания без сети
+Отдает страницу расписаний со ссылками на сотни синтетических PDF (synthetic_schedule.py)
+по тому же пути, что и настоящий сайт. Можно добавить задержку ответа, ограничение скорости,
+ETag/Last-Modified с ответами 304, докачку (Range) и сбои: ответы 503 и оборванные соединения.
+
+Использование:
+    python3 mock_schedule_site.py                          # http://127.0.0.1:8000, 300 файлов
+    python3 mock_schedule_site.py --files 500 --latency 0.05 --bandwidth 1000000
+    python3 mock_schedule_site.py --fail-rate 0.05 --drop-rate 0.02 --no-etags
+    python3 download_schedules.py --url http://127.0.0.1:8000/ucheba/raspisanie/ochnaya-forma-obucheniya --base-url http://127.0.0.1:8000
+
+В коде сайт запускается в фоновом потоке: with MockSite(SiteOptions(files=100)) as site: ... site.url
+"""
+
+import argparse
+import os
+import random
+import re
+import socket
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import formatdate
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from synthetic_schedule import ScheduleLayout, write_schedule_pdf
+
+SCHEDULE_PATH = '/ucheba/raspisanie/ochnaya-forma-obucheniya'
+
+# Разных синтетических документов; файлы сайта - их копии с уникальным комментарием в конце
+TEMPLATES = 8
+
+CHUNK_SIZE = 16 * 1024
+
+# Тексты ссылок: по ним download_schedules.py определяет институт
+INSTITUTES = [
+    'Медицинский институт', 'Политехнический институт', 'Институт экономики и управления',
+    'Гуманитарный институт', 'Институт государства и права', 'Институт естественных и технических наук',
+]
+SPECIALITIES = ['Лечебное дело', 'Педиатрия', 'Информатика', 'Юриспруденция', 'Менеджмент', 'Физика']
+
+@dataclass
+class SiteOptions:
+    """Параметры локального сайта"""
+    files: int = 300
+    pages: int = 4            # Страниц в каждом PDF
+    latency: float = 0.0      # Задержка перед каждым ответом, с
+    bandwidth: int = 0        # Скорость отдачи одного ответа, байт/с (0 - без ограничения)
+    etags: bool = True        # ETag и Last-Modified, условные запросы и Range
+    fail_rate: float = 0.0    # Доля ответов 503 на запросы файлов
+    drop_rate: float = 0.0    # Доля ответов, оборванных на середине файла
+    seed: int = 0
+
+class MockSite:
+    """
+    Сайт в фоновом потоке (ThreadingHTTPServer с keep-alive).
+    stats - счетчики запросов и отданных байт тела, update() выпускает новые версии файлов.
+    """
+
+    def __init__(self, options: SiteOptions, host: str = '127.0.0.1', port: int = 0):
+        self.options = options
+        self.rng = random.Random(options.seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'files': 0, 'not_modified': 0, 'partial': 0,
+                      'failed': 0, 'dropped': 0, 'bytes': 0}
+        self.versions: List[int] = [0] * options.files
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        self.templates = self._make_templates()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        return self.base_url + SCHEDULE_PATH
+
+    def _make_templates(self) -> List[bytes]:
+        templates = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for i in range(min(TEMPLATES, max(self.options.files, 1))):
+                path = os.path.join(tmp_dir, f"template_{i}.pdf")
+                write_schedule_pdf(path, ScheduleLayout(pages=self.options.pages, seed=self.options.seed + i))
+                with open(path, 'rb') as f:
+                    templates.append(f.read())
+        return templates
+
+    def file_path(self, index: int) -> str:
+        return f"/upload/raspisanie/{index // 50}/schedule_{index:04d}.pdf"
+
+    def file_content(self, index: int) -> bytes:
+        # Комментарий после %%EOF делает файлы разными, не ломая PDF
+        suffix = f"% mock schedule {index} version {self.versions[index]}\n".encode('ascii')
+        return self.templates[index % len(self.templates)] + suffix
+
+    def etag(self, index: int) -> str:
+        return f'"{index}-{self.versions[index]}"'
+
+    def listing(self) -> bytes:
+        """Страница расписаний: ссылки на все файлы в таблице, как на сайте"""
+        rows = []
+        for index in range(self.options.files):
+            institute = INSTITUTES[index % len(INSTITUTES)]
+            speciality = SPECIALITIES[(index // len(INSTITUTES)) % len(SPECIALITIES)]
+            text = f"{institute}, {speciality}, {index % 6 + 1} курс ({index})"
+            rows.append(f'<tr><td><a href="{self.file_path(index)}">{escape(text)}</a></td></tr>')
+        page = ('<html><head><meta charset="utf-8"><title>Расписание</title></head><body><table>\n'
+                + '\n'.join(rows) + '\n</table></body></html>\n')
+        return page.encode('utf-8')
+
+    def update(self, count: int) -> List[int]:
+        """Выпускает новые версии count случайных файлов, возвращает их номера"""
+        with self.lock:
+            changed = self.rng.sample(range(self.options.files), min(count, self.options.files))
+            for index in changed:
+                self.versions[index] += 1
+            self.last_modified = formatdate(time.time(), usegmt=True)
+        return changed
+
+    def reset_stats(self):
+        with self.lock:
+            for key in self.stats:
+                self.stats[key] = 0
+
+    def _count(self, key: str, value: int = 1):
+        with self.lock:
+            self.stats[key] += value
+
+    def _chance(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self.lock:
+            return self.rng.random() < rate
+
+    def _handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                site._count('requests')
+                if site.options.latency:
+                    time.sleep(site.options.latency)
+                path = self.path.split('?')[0]
+                if path == SCHEDULE_PATH:
+                    self.send_listing()
+                    return
+                match = re.fullmatch(r'/upload/raspisanie/\d+/schedule_(\d+)\.pdf', path)
+                if not match or int(match.group(1)) >= site.options.files:
+                    self.send_body(404, b'not found', 'text/plain')
+                    return
+                self.send_file(int(match.group(1)))
+
+            def send_listing(self):
+                headers = {}
+                if site.options.etags:
+                    headers = {'ETag': f'"listing-{sum(site.versions)}"', 'Last-Modified': site.last_modified}
+                    if self.headers.get('If-None-Match') == headers['ETag']:
+                        site._count('not_modified')
+                        self.send_body(304, b'', headers=headers)
+                        return
+                self.send_body(200, site.listing(), 'text/html; charset=utf-8', headers)
+
+            def send_file(self, index: int):
+                if site._chance(site.options.fail_rate):
+                    site._count('failed')
+                    self.send_body(503, b'service unavailable', 'text/plain', {'Retry-After': '1'})
+                    return
+                with site.lock:
+                    content = site.file_content(index)
+                    etag = site.etag(index)
+                headers = {}
+                start = 0
+                status = 200
+                if site.options.etags:
+                    headers = {'ETag': etag, 'Last-Modified': site.last_modified, 'Accept-Ranges': 'bytes'}
+                    if self.headers.get('If-None-Match') == etag:
+                        site._count('not_modified')
+                        self.send_body(304, b'', headers=headers)
+                        return
+                    byte_range = re.fullmatch(r'bytes=(\d+)-', self.headers.get('Range', ''))
+                    if byte_range and self.headers.get('If-Range', etag) == etag:
+                        start = int(byte_range.group(1))
+                        if start >= len(content):
+                            self.send_body(416, b'', headers={'Content-Range': f'bytes */{len(content)}'})
+                            return
+                        status = 206
+                        headers['Content-Range'] = f'bytes {start}-{len(content) - 1}/{len(content)}'
+                        site._count('partial')
+                site._count('files')
+                drop = site._chance(site.options.drop_rate)
+                self.send_body(status, content[start:], 'application/pdf', headers, drop)
+
+            def send_body(self, status: int, body: bytes, content_type: Optional[str] = None,
+                          headers: Optional[Dict[str, str]] = None, drop: bool = False):
+                self.send_response(status)
+                if content_type:
+                    self.send_header('Content-Type', content_type)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if status == 304:
+                    return
+                # Оборванный ответ: половина тела и закрытое соединение
+                limit = len(body) // 2 if drop else len(body)
+                sent = 0
+                while sent < limit:
+                    chunk = body[sent:min(sent + CHUNK_SIZE, limit)]
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+                    if site.options.bandwidth:
+                        time.sleep(len(chunk) / site.options.bandwidth)
+                site._count('bytes', sent)
+                if drop:
+                    site._count('dropped')
+                    self.wfile.flush()
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    self.close_connection = True
+
+        return Handler
+
+    def start(self) -> 'MockSite':
+        self.thread = threading.Thread(target=self.server.serve_forever, name='mock-site', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def __enter__(self) -> 'MockSite':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Локальный сайт с синтетическими расписаниями СурГУ')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--files', type=int, default=SiteOptions.files, help='ссылок на PDF на странице')
+    parser.add_argument('--pages', type=int, default=SiteOptions.pages, help='страниц в каждом PDF')
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка перед ответом, с')
+    parser.add_argument('--bandwidth', type=int, default=0, help='скорость отдачи ответа, байт/с')
+    parser.add_argument('--no-etags', action='store_true', help='без ETag/Last-Modified, 304 и Range')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='доля ответов 503 (0-1)')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='доля оборванных ответов (0-1)')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    options = SiteOptions(files=args.files, pages=args.pages, latency=args.latency, bandwidth=args.bandwidth,
+                          etags=not args.no_etags, fail_rate=args.fail_rate, drop_rate=args.drop_rate,
+                          seed=args.seed)
+    site = MockSite(options, args.host, args.port)
+    print(f"Страница расписаний: {site.url} (для download_schedules.py: --url {site.url} --base-url {site.base_url})")
+    print(f"Файлов: {options.files}, задержка: {options.latency} с, скорость: "
+          f"{options.bandwidth or 'без ограничения'}, сбоев: {options.fail_rate:.0%}, "
+          f"обрывов: {options.drop_rate:.0%}")
+    print("Остановка: Ctrl+C", flush=True)
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site.server.server_close()
+        print(f"\nЗапросов: {site.stats['requests']}, отдано байт: {site.stats['bytes']}")
+
+if __name__ == '__main__':
+    main()
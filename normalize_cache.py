@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Зависимости нормализованных расписаний
+Для каждого файла schedules_parsed/*_normalized.json хранит в normalize_cache.json, из чего он
+получен: SHA-256 входного JSON, хеш словаря сокращений и версию нормализатора.
+Если ничего из этого не изменилось и выходной файл на месте, файл не нормализуется повторно.
+
+Кроме того, хранятся названия дисциплин каждого файла, результат нормализации каждого
+названия и словарь, с которым он получен. После правки словаря заново нормализуются только
+названия, в которых измененные сокращения встречаются до или после замен прежнего словаря,
+и перезаписываются только файлы, где результат какого-то названия изменился.
+"""
+
+import bisect
+import hashlib
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import json_codec
+from parse_cache import file_sha256, source_fingerprint
+
+# Манифест лежит рядом с папкой schedules_parsed/
+CACHE_FILE = 'normalize_cache.json'
+
+# Модули, от которых зависит результат нормализации: их изменение делает устаревшими все файлы
+# (запись файлов, порядок полей записи и кодирование JSON - как и у парсера)
+NORMALIZER_FILES = ['normalize_disciplines.py', 'timetable_format.py', 'timetable_entry.py', 'json_codec.py']
+
+def normalizer_fingerprint() -> str:
+    """Версия нормализатора - хеш исходного кода модулей, влияющих на результат"""
+    return source_fingerprint(NORMALIZER_FILES)
+
+def abbreviations_fingerprint(abbreviations: Dict[str, str]) -> str:
+    """
+    Хеш словаря сокращений с учетом порядка (от него зависит приоритет).
+    Считается по загруженному словарю, а не по файлу: так учитываются и встроенные
+    сокращения, и словарь, переданный в normalize_disciplines.py аргументом.
+    """
+    digest = hashlib.sha256()
+    for pattern, replacement in abbreviations.items():
+        digest.update(pattern.encode('utf-8') + b'\0' + replacement.encode('utf-8') + b'\n')
+    return digest.hexdigest()[:16]
+
+def _kept_in_order(positions: List[int]) -> Set[int]:
+    """Номера элементов наибольшей возрастающей подпоследовательности positions"""
+    tails: List[int] = []       # Последнее значение подпоследовательности каждой длины
+    tail_items: List[int] = []  # Номер элемента, на котором она заканчивается
+    previous: List[Optional[int]] = []
+    for i, value in enumerate(positions):
+        length = bisect.bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_items.append(i)
+        else:
+            tails[length] = value
+            tail_items[length] = i
+        previous.append(tail_items[length - 1] if length else None)
+    kept = set()
+    item = tail_items[-1] if tail_items else None
+    while item is not None:
+        kept.add(item)
+        item = previous[item]
+    return kept
+
+def changed_patterns(old: Dict[str, str], new: Dict[str, str]) -> List[str]:
+    """
+    Шаблоны, от которых зависит разница между словарями: удаленные, добавленные,
+    с другой заменой и переставленные (порядок задает приоритет). Переставленными
+    считаются общие шаблоны вне наибольшей части, сохранившей взаимный порядок.
+    """
+    changed = [pattern for pattern in old if old[pattern] != new.get(pattern)]
+    changed += [pattern for pattern in new if pattern not in old]
+    position = {pattern: i for i, pattern in enumerate(new)}
+    common = [pattern for pattern in old if pattern in new]
+    kept = _kept_in_order([position[pattern] for pattern in common])
+    changed += [pattern for i, pattern in enumerate(common) if i not in kept]
+    return list(dict.fromkeys(changed))
+
+def names_matching(patterns: Iterable[str], names: Iterable[str], dictionary: Dict[str, str]) -> Set[str]:
+    """
+    Названия, в которых хотя бы один из шаблонов совпадает - в исходном виде или после какой-то
+    из замен словаря dictionary. Сокращения применяются по очереди, каждое к результату
+    предыдущих ("Анат.физиол." -> "Анатомияфизиол."), поэтому проверяются все промежуточные строки.
+    Если измененный шаблон не совпал ни в одной из них, правка не меняет результат: остальные
+    сокращения видят те же строки в том же порядке.
+    Промежуточные строки строит AbbreviationMatcher - re.sub вызывается только для сокращений,
+    которые встречаются в строке, а шаблоны проверяются одним сопоставителем.
+    """
+    # Импорт здесь: normalize_disciplines сам импортирует этот модуль
+    from normalize_disciplines import AbbreviationMatcher
+    changed = AbbreviationMatcher(dict.fromkeys(patterns, ''))
+    replay = AbbreviationMatcher(dictionary)
+    return {name for name in names if any(changed.matches(text) for text in replay.steps(name))}
+
+class NormalizeCache:
+    """
+    Манифест вида {normalizer, dictionary: [[шаблон, замена]], disciplines: {название: результат},
+    files: {input: {sha256, output, output_sha256, abbreviations, normalizer, records, compact_json, names}}}.
+    Файл пропускается, если совпадают хеш входного JSON, хеш словаря и версия нормализатора,
+    а выходной файл на месте, не был изменен и записан в том же режиме json_codec.
+    disciplines получены со словарем dictionary и текущей версией нормализатора.
+    """
+
+    def __init__(self, abbreviations: Dict[str, str], cache_file: str = CACHE_FILE, reuse: bool = True):
+        self.cache_file = cache_file
+        self.reuse = reuse
+        self.version = normalizer_fingerprint()
+        self.abbreviations = abbreviations_fingerprint(abbreviations)
+        self.files: Dict[str, Dict] = {}
+        self.dictionary: Optional[Dict[str, str]] = None
+        self.disciplines: Dict[str, str] = {}
+        self.skipped = 0
+        self.normalized = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json_codec.load(f)
+        except FileNotFoundError:
+            return
+        except json_codec.JSONDecodeError as e:
+            print(f"Предупреждение: манифест {self.cache_file} поврежден ({e}), нормализуем все файлы заново")
+            return
+        self.files = data.get('files', {})
+        # Нормализованные названия годятся только для той же версии нормализатора
+        if self.reuse and data.get('normalizer') == self.version and data.get('dictionary') is not None:
+            self.dictionary = dict(data['dictionary'])
+            self.disciplines = data.get('disciplines', {})
+
+    def _stale_reason(self, entry: Optional[Dict], sha256: str, output_path: str) -> Optional[str]:
+        """Почему файл нужно нормализовать заново (None - результат актуален)"""
+        if not entry or entry.get('output') != output_path:
+            return 'новый файл'
+        if entry.get('sha256') != sha256:
+            return 'изменился входной файл'
+        if entry.get('abbreviations') != self.abbreviations:
+            return 'изменился словарь сокращений'
+        if entry.get('normalizer') != self.version:
+            return 'изменился нормализатор'
+        if entry.get('compact_json', False) != json_codec.is_compact():
+            return 'другой режим записи JSON'
+        if not os.path.exists(output_path) or file_sha256(output_path) != entry.get('output_sha256'):
+            return 'выходной файл отсутствует или изменен'
+        return None
+
+    def lookup(self, input_path: str, output_path: str) -> Tuple[Optional[int], str, Optional[str]]:
+        """
+        Проверяет, актуален ли нормализованный файл.
+        Возвращает (количество записей или None, если нужно нормализовать, SHA-256 входного файла,
+        причина повторной нормализации).
+        """
+        sha256 = file_sha256(input_path)
+        reason = self._stale_reason(self.files.get(input_path), sha256, output_path) if self.reuse else '--force'
+        if reason is None:
+            self.skipped += 1
+            return self.files[input_path]['records'], sha256, None
+        self.normalized += 1
+        return None, sha256, reason
+
+    def _trackable(self) -> bool:
+        """Можно ли найти затронутые правкой названия по измененным шаблонам: прежний словарь известен"""
+        return self.dictionary is not None
+
+    def affected(self, abbreviations: Dict[str, str]) -> Tuple[List[str], Set[str], List[str]]:
+        """
+        Что затронет переход к словарю abbreviations: (измененные шаблоны, названия, в которых
+        они встречаются, файлы с этими названиями). Если правку нельзя отследить, затронуто все.
+        """
+        if not self._trackable():
+            return list(abbreviations), set(self.disciplines), list(self.files)
+        patterns = changed_patterns(self.dictionary, abbreviations)
+        names = names_matching(patterns, self.disciplines, self.dictionary) if patterns else set()
+        files = [input_path for input_path, entry in self.files.items()
+                 if 'names' not in entry or names.intersection(entry['names'])]
+        return patterns, names, files
+
+    def update_dictionary(self, abbreviations: Dict[str, str],
+                          normalize: Callable[[str], str]) -> Optional[Tuple[int, int, int]]:
+        """
+        Переводит сохраненные названия на словарь abbreviations: заново нормализует (normalize)
+        только названия с измененными сокращениями. Файлы, в которых ни одно название не изменилось,
+        считаются нормализованными с новым словарем, остальные будут перезаписаны.
+        Возвращает (измененных шаблонов, нормализовано названий, изменилось названий)
+        или None, если все названия будут нормализованы заново.
+        """
+        if not self.reuse or not self._trackable():
+            self.disciplines = {}
+            self.dictionary = dict(abbreviations)
+            return None
+
+        patterns, names, _ = self.affected(abbreviations)
+        previous = abbreviations_fingerprint(self.dictionary)
+        changed = set()
+        for name in names:
+            normalized = normalize(name)
+            if normalized != self.disciplines[name]:
+                self.disciplines[name] = normalized
+                changed.add(name)
+        for entry in self.files.values():
+            if (entry.get('abbreviations') == previous and 'names' in entry
+                    and not changed.intersection(entry['names'])):
+                entry['abbreviations'] = self.abbreviations
+        self.dictionary = dict(abbreviations)
+        return len(patterns), len(names), len(changed)
+
+    def store(self, input_path: str, sha256: str, output_path: str, records: int, names: Dict[str, str]):
+        """Запоминает зависимости нормализованного файла; names - его названия и их нормализованный вид"""
+        self.disciplines.update(names)
+        self.files[input_path] = {
+            'sha256': sha256,
+            'output': output_path,
+            'output_sha256': file_sha256(output_path),
+            'abbreviations': self.abbreviations,
+            'normalizer': self.version,
+            'records': records,
+            'compact_json': json_codec.is_compact(),
+            'names': sorted(names)
+        }
+
+    def save(self):
+        """Атомарно сохраняет манифест; названия, которых нет ни в одном файле, не сохраняются"""
+        used = set()
+        for entry in self.files.values():
+            used.update(entry.get('names', ()))
+        disciplines = {name: value for name, value in self.disciplines.items() if name in used}
+        dictionary = list(self.dictionary.items()) if self.dictionary is not None else None
+        tmp_path = self.cache_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json_codec.dump({'normalizer': self.version, 'dictionary': dictionary,
+                             'disciplines': disciplines, 'files': self.files}, f)
+        os.replace(tmp_path, self.cache_file)
+
+    def summary(self) -> str:
+        """Строка статистики для итогового вывода (её разбирает backend)"""
+        return f"Нормализация: пропущено {self.skipped}, обработано {self.normalized}"
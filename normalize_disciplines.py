@@ -5,10 +5,14 @@
 Приводит сокращения к полным формам для единообразия
 """
 
-import json
 import re
 import os
-from typing import Dict, List
+import sys
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+import json_codec
+from timetable_format import read_timetable, dump_entries
+from normalize_cache import NormalizeCache
 
 def load_abbreviations(abbrev_file: str = 'abbreviations.json') -> Dict[str, str]:
     """
@@ -17,7 +21,7 @@ def load_abbreviations(abbrev_file: str = 'abbreviations.json') -> Dict[str, str
     """
     try:
         with open(abbrev_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+            data = json_codec.load(f)
             # Объединяем все сокращения из разных категорий
             abbreviations = {}
             if 'abbreviations' in data:
@@ -27,7 +31,7 @@ def load_abbreviations(abbrev_file: str = 'abbreviations.json') -> Dict[str, str
     except FileNotFoundError:
         print(f"Предупреждение: файл {abbrev_file} не найден. Используются встроенные сокращения.")
         return get_default_abbreviations()
-    except json.JSONDecodeError as e:
+    except json_codec.JSONDecodeError as e:
         print(f"Ошибка при чтении {abbrev_file}: {e}. Используются встроенные сокращения.")
         return get_default_abbreviations()
 
@@ -73,9 +77,226 @@ def get_default_abbreviations() -> Dict[str, str]:
         r'\bгч': 'генетики человека',
     }
 
+# Символы, на которых заканчивается буквальное начало шаблона
+_REGEX_SPECIAL = set('.^$*+?{}[]|()\\')
+_QUANTIFIERS = set('*+?{')
+_BOUNDARY = r'\b'
+
+def _literal_prefix(pattern: str) -> Tuple[List[str], str]:
+    """
+    Делит шаблон сокращения на буквальное начало - символы и \\b, например \\bМедиц\\. -
+    и остаток-выражение. Шаблоны с | целиком считаются остатком.
+    """
+    if '|' in pattern:
+        return [], pattern
+    tokens = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\' and i + 1 < len(pattern) and (pattern[i + 1] == 'b' or not pattern[i + 1].isalnum()):
+            token = _BOUNDARY if pattern[i + 1] == 'b' else pattern[i + 1]
+            width = 2
+        elif char not in _REGEX_SPECIAL:
+            token = char
+            width = 1
+        else:
+            break
+        # Символ с квантификатором уже не буквальный
+        if i + width < len(pattern) and pattern[i + width] in _QUANTIFIERS:
+            break
+        tokens.append(token)
+        i += width
+    return tokens, pattern[i:]
+
+def _token_regex(token: str) -> str:
+    return token if token == _BOUNDARY else re.escape(token)
+
+def _alternation(items: List[Tuple[int, List[str], str]]) -> str:
+    """
+    Дерево альтернатив по буквальным началам шаблонов (items - номер, начало, остаток в порядке словаря).
+    Выражение совпадает в строке тогда и только тогда, когда совпадает хотя бы один из шаблонов:
+    альтернативы с общим началом группируются по первому символу (\\bанат\\. и \\bанат\\b).
+    """
+    branches = []
+    run: List[Tuple[int, List[str], str]] = []
+    
+    def flush():
+        by_token: Dict[str, List[Tuple[int, List[str], str]]] = {}
+        for index, tokens, rest in run:
+            by_token.setdefault(tokens[0], []).append((index, tokens[1:], rest))
+        for token, children in by_token.items():
+            branches.append(_token_regex(token) + '(?:' + _alternation(children) + ')')
+        run.clear()
+    
+    for item in items:
+        tokens = item[1]
+        if not tokens:
+            flush()
+            branches.append(f'(?:{item[2]})')
+            continue
+        # В одной группировке - только взаимоисключающие начала: разные символы или одинаковые токены
+        if run and (tokens[0] == _BOUNDARY) != (run[0][1][0] == _BOUNDARY):
+            flush()
+        run.append(item)
+    flush()
+    return '|'.join(branches)
+
+# Слово - как его понимает \\b: начало слова там, где перед символом \\w нет другого \\w
+_WORD = re.compile(r'\w+')
+
+# Виды буквальных сокращений: \\bслово\\., \\bСЛОВО\\b и \\bГЧ (начало слова)
+DOTTED = 'dotted'
+WHOLE = 'whole'
+PREFIX = 'prefix'
+
+def _literal_shape(pattern: str) -> Optional[Tuple[str, str]]:
+    """
+    (слово, вид), если шаблон - буквальное сокращение: \\b, слово из символов \\w
+    и \\. или \\b в конце (или ничего); иначе None - шаблон остается регулярным выражением
+    """
+    tokens, rest = _literal_prefix(pattern)
+    if rest or len(tokens) < 2 or tokens[0] != _BOUNDARY:
+        return None
+    body, kind = tokens[1:], PREFIX
+    if body[-1] == '.':
+        body, kind = body[:-1], DOTTED
+    elif body[-1] == _BOUNDARY:
+        body, kind = body[:-1], WHOLE
+    word = ''.join(body)
+    if not body or _BOUNDARY in body or not _WORD.fullmatch(word) or len(word) != len(body):
+        return None
+    return word, kind
+
+def _first_from(indices: List[int], start: int) -> Optional[int]:
+    """Первый номер не меньше start в возрастающем списке (списки почти всегда из одного номера)"""
+    for index in indices:
+        if index >= start:
+            return index
+    return None
+
+class AbbreviationMatcher:
+    """
+    Те же замены, что и прежние последовательные re.sub: сокращения применяются в порядке словаря,
+    каждое - к результату предыдущих (поэтому "Анат.физиол." дает "Анатомияфизиол.": после
+    подстановки у "физиол." уже нет начала слова). Но re.sub вызывается только для сокращений,
+    которые встречаются в текущей строке: следующее такое сокращение ищется сразу по всему словарю.
+    
+    Почти все сокращения - буквальные (\\bМедиц\\., \\bГЧ\\b, \\bГЧ): они разложены по словарям
+    слово -> номера, и для каждого слова строки проверяется несколько ключей, так что время
+    почти не зависит от размера словаря. Остальные шаблоны проверяются по одному, но сначала
+    строка проверяется одним выражением - деревом по буквальным началам (\\bанат\\. и \\bанат\\b
+    делят общее \\bанат): если оно не совпало, ни один из этих шаблонов в строке не встречается.
+    Шаблоны со своими группами (ссылки \\1 в общем выражении сместились бы) проверяются без него.
+    literals=False - все сокращения проверяются через выражение (для сравнения в бенчмарке).
+    """
+    
+    def __init__(self, abbreviations: Dict[str, str], literals: bool = True):
+        self.source = abbreviations
+        self.size = len(abbreviations)
+        self.compiled = [(re.compile(pattern), replacement) for pattern, replacement in abbreviations.items()]
+        self.literals: Dict[str, Dict[str, List[int]]] = {DOTTED: {}, WHOLE: {}, PREFIX: {}}
+        self.prefix_lengths: List[int] = []
+        # Номера остальных шаблонов по возрастанию и те из них, что проверяются общим выражением
+        self.rest: List[int] = []
+        self.filtered: set = set()
+        self.regex = None
+        
+        for index, (pattern, _) in enumerate(self.compiled):
+            shape = _literal_shape(pattern.pattern) if literals else None
+            if shape is None:
+                self.rest.append(index)
+            else:
+                word, kind = shape
+                self.literals[kind].setdefault(word, []).append(index)
+        self.prefix_lengths = sorted({len(word) for word in self.literals[PREFIX]})
+        self.uses_literals = any(self.literals.values())
+        
+        items = [(index, *_literal_prefix(self.compiled[index][0].pattern))
+                 for index in self.rest if not self.compiled[index][0].groups]
+        if items:
+            try:
+                self.regex = re.compile(_alternation(items))
+                self.filtered = {index for index, _, _ in items}
+            except re.error:
+                # Шаблоны, которые нельзя объединить (например, с флагами внутри), проверяются по одному
+                self.regex = None
+    
+    def _next(self, text: str, start: int) -> Optional[int]:
+        """Номер первого начиная со start сокращения словаря, которое встречается в text"""
+        best = None
+        if self.uses_literals:
+            whole = self.literals[WHOLE]
+            dotted = self.literals[DOTTED]
+            prefixes = self.literals[PREFIX]
+            length = len(text)
+            for word in _WORD.finditer(text):
+                value = word.group()
+                end = word.end()
+                candidates = [whole.get(value)]
+                if dotted and end < length and text[end] == '.':
+                    candidates.append(dotted.get(value))
+                for size in self.prefix_lengths:
+                    if size > len(value):
+                        break
+                    candidates.append(prefixes.get(value[:size]))
+                for indices in candidates:
+                    if indices is not None:
+                        index = _first_from(indices, start)
+                        if index is not None and (best is None or index < best):
+                            best = index
+        
+        prefiltered = None
+        for index in self.rest:
+            if best is not None and index >= best:
+                break
+            if index < start:
+                continue
+            if index in self.filtered:
+                if prefiltered is None:
+                    prefiltered = self.regex.search(text) is not None
+                if not prefiltered:
+                    continue
+            if self.compiled[index][0].search(text):
+                return index
+        return best
+    
+    def expand(self, text: str) -> str:
+        """Заменяет все сокращения в строке"""
+        index = self._next(text, 0)
+        while index is not None:
+            pattern, replacement = self.compiled[index]
+            text = pattern.sub(replacement, text)
+            index = self._next(text, index + 1)
+        return text
+    
+    def matches(self, text: str) -> bool:
+        """Встречается ли в строке хотя бы одно сокращение словаря"""
+        return self._next(text, 0) is not None
+    
+    def steps(self, text: str) -> Iterator[str]:
+        """Промежуточные строки expand: исходная и результат каждой замены, изменившей строку"""
+        yield text
+        index = self._next(text, 0)
+        while index is not None:
+            pattern, replacement = self.compiled[index]
+            replaced = pattern.sub(replacement, text)
+            if replaced != text:
+                text = replaced
+                yield text
+            index = self._next(text, index + 1)
+
 # Загружаем сокращения при импорте модуля
 ABBREVIATIONS = load_abbreviations()
 
+_matcher: Optional[AbbreviationMatcher] = None
+
+def get_abbreviation_matcher() -> AbbreviationMatcher:
+    """Выражение для текущего словаря ABBREVIATIONS; пересобирается, если словарь заменен или изменился размер"""
+    global _matcher
+    if _matcher is None or _matcher.source is not ABBREVIATIONS or _matcher.size != len(ABBREVIATIONS):
+        _matcher = AbbreviationMatcher(ABBREVIATIONS)
+    return _matcher
+
 # Дополнительные правила нормализации для полных названий
 NORMALIZATION_RULES = [
     # Убираем лишние пробелы
@@ -92,6 +313,11 @@ NORMALIZATION_RULES = [
     (r'п/г(\d+)', r'п/г \1'),
 ]
 
+# Скомпилированные один раз правила нормализации
+_COMPILED_RULES = [(re.compile(pattern), replacement) for pattern, replacement in NORMALIZATION_RULES]
+_MISSING_SPACE = re.compile(r'([а-яёА-ЯЁ])([А-ЯЁ][а-яё]+)')
+_SPACES = re.compile(r'\s+')
+
 def normalize_discipline_name(name: str) -> str:
     """
     Нормализует название дисциплины:
@@ -101,57 +327,128 @@ def normalize_discipline_name(name: str) -> str:
     if not name:
         return name
     
-    result = name
-    
-    # Применяем замену сокращений
-    for pattern, replacement in ABBREVIATIONS.items():
-        result = re.sub(pattern, replacement, result)
+    # Применяем замену сокращений (по порядку словаря, как отдельные re.sub)
+    result = get_abbreviation_matcher().expand(name)
     
     # Исправляем случаи, когда после замены сокращения нет пробела перед следующим словом
     # Например: "возрастнаяфизиология" -> "возрастная физиология"
-    result = re.sub(r'([а-яёА-ЯЁ])([А-ЯЁ][а-яё]+)', r'\1 \2', result)
+    result = _MISSING_SPACE.sub(r'\1 \2', result)
     
     # Применяем дополнительные правила нормализации
-    for pattern, replacement in NORMALIZATION_RULES:
-        result = re.sub(pattern, replacement, result)
+    for pattern, replacement in _COMPILED_RULES:
+        result = pattern.sub(replacement, result)
     
     # Убираем лишние пробелы в начале и конце
     result = result.strip()
     
     # Убираем множественные пробелы
-    result = re.sub(r'\s+', ' ', result)
+    result = _SPACES.sub(' ', result)
     
     return result
 
-def normalize_timetable(input_file: str, output_file: str = None):
+# Кэш нормализованных названий: одна дисциплина повторяется в записях каждой группы
+# и в файлах одного факультета. Размер ограничен, вытесняются давно не встречавшиеся.
+# Общий для всех файлов запуска, сбрасывается при смене словаря сокращений.
+NAME_CACHE_SIZE = 8192
+_name_cache = lru_cache(maxsize=NAME_CACHE_SIZE)(normalize_discipline_name)
+_name_cache_matcher: Optional[AbbreviationMatcher] = None
+
+def configure_name_cache(maxsize: int = NAME_CACHE_SIZE):
+    """Пересоздает кэш названий с заданным размером (0 - без кэширования)"""
+    global _name_cache
+    _name_cache = lru_cache(maxsize=maxsize)(normalize_discipline_name)
+
+def normalize_discipline_name_cached(name: str) -> str:
+    """normalize_discipline_name с кэшем по исходному названию"""
+    global _name_cache_matcher
+    matcher = get_abbreviation_matcher()
+    if matcher is not _name_cache_matcher:
+        # Словарь сокращений изменился - сохраненные результаты устарели
+        _name_cache.cache_clear()
+        _name_cache_matcher = matcher
+    return _name_cache(name)
+
+def name_cache_stats() -> Tuple[int, int]:
+    """Возвращает (попаданий, промахов) кэша названий с момента последней очистки"""
+    info = _name_cache.cache_info()
+    return info.hits, info.misses
+
+# Названия, взятые из уже нормализованных (known в normalize_timetable, манифест normalize_cache.json),
+# а не из кэша названий: за все время работы процесса
+_known_hits = 0
+
+def known_name_hits() -> int:
+    """Сколько названий взято из уже нормализованных (known) без обращения к кэшу названий"""
+    return _known_hits
+
+# Расширения файлов расписания (timetable_format.py): NDJSON остается NDJSON и после нормализации
+TIMETABLE_EXTENSIONS = ('.json', '.ndjson')
+
+def normalized_output_path(input_file: str, parsed_dir: str = 'schedules_parsed') -> str:
+    """Путь к нормализованному файлу: schedules_parsed/<имя>_normalized.json (.ndjson для NDJSON)"""
+    base_name = os.path.basename(input_file)
+    # Убираем расширение и добавляем _normalized
+    extension = '.json'
+    for candidate in TIMETABLE_EXTENSIONS:
+        if base_name.endswith(candidate):
+            base_name, extension = base_name[:-len(candidate)], candidate
+    return os.path.join(parsed_dir, base_name + '_normalized' + extension)
+
+def normalize_timetable(input_file: str, output_file: str = None, known: Optional[Dict[str, str]] = None):
     """
-    Нормализует названия дисциплин в JSON файле расписания
+    Нормализует названия дисциплин в JSON файле расписания.
+    known - уже нормализованные с текущим словарем названия (исходное -> результат),
+    дополняется названиями файла.
+    Возвращает (записи, измененные названия, все названия файла -> результат).
     """
     if output_file is None:
-        output_file = input_file.replace('.json', '_normalized.json')
+        output_file = normalized_output_path(input_file, os.path.dirname(input_file))
     
     print(f"Чтение файла {input_file}...")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # Формат файла (json, compact) сохраняется при записи результата
+    entries, output_format = read_timetable(input_file)
+    records = list(entries)
     
-    print(f"Найдено записей: {len(data)}")
+    print(f"Найдено записей: {len(records)}")
     
     # Собираем статистику изменений
     changes = {}
     normalized_count = 0
     
-    # Нормализуем каждую запись
-    for entry in data:
-        if 'discipline' in entry and entry['discipline']:
-            original = entry['discipline']
-            normalized = normalize_discipline_name(original)
+    # Одна дисциплина повторяется в записях каждой группы: нормализуем каждое уникальное
+    # название один раз (через общий для всех файлов кэш) и раздаем результат записям
+    unique_names = {entry.discipline: None for entry in records if entry.discipline}
+    if known is None:
+        known = {}
+    global _known_hits
+    _, misses_before = name_cache_stats()
+    mapping = {}
+    from_known = 0
+    for original in unique_names:
+        normalized = known.get(original)
+        if normalized is None:
+            normalized = known[original] = normalize_discipline_name_cached(original)
+        else:
+            from_known += 1
+        mapping[original] = sys.intern(normalized)
+    _, misses = name_cache_stats()
+    _known_hits += from_known
+    
+    for entry in records:
+        if entry.discipline:
+            original = entry.discipline
+            normalized = mapping[original]
             
             if original != normalized:
                 if original not in changes:
                     changes[original] = normalized
-                entry['discipline'] = normalized
+                entry.discipline = normalized
                 normalized_count += 1
     
+    print(f"\nЗаписей с дисциплиной: {sum(1 for entry in records if entry.discipline)}, "
+          f"уникальных названий: {len(unique_names)}")
+    print(f"Нормализовано названий: {misses - misses_before}, из кэша: {len(unique_names) - (misses - misses_before)} "
+          f"(уже нормализованных: {from_known})")
     print(f"\nНормализовано записей: {normalized_count}")
     print(f"Уникальных изменений: {len(changes)}")
     
@@ -165,23 +462,26 @@ def normalize_timetable(input_file: str, output_file: str = None):
     # Сохраняем результат
     print(f"\nСохранение в {output_file}...")
     with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+        dump_entries(records, f, output_format)
     
     print(f"Готово! Результат сохранен в {output_file}")
     
     # Выводим статистику по уникальным дисциплинам
-    unique_disciplines = set([entry.get('discipline', '') for entry in data if entry.get('discipline')])
+    unique_disciplines = set([entry.discipline for entry in records if entry.discipline])
     print(f"\nУникальных дисциплин после нормализации: {len(unique_disciplines)}")
     
-    return data, changes
+    return records, changes, mapping
 
 def main():
-    import sys
     from pathlib import Path
     
+    # --force - нормализовать все файлы, даже если входные данные не изменились
+    force = '--force' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--force']
+    
     # Можно указать файл с сокращениями как аргумент
-    if len(sys.argv) > 1 and not sys.argv[1].endswith('.json'):
-        abbrev_file = sys.argv[1]
+    if args and not args[0].endswith(TIMETABLE_EXTENSIONS):
+        abbrev_file = args[0]
     else:
         abbrev_file = 'abbreviations.json'
     
@@ -194,11 +494,12 @@ def main():
     jsons_dir = 'schedules_json'
     
     # Если указан конкретный файл
-    if len(sys.argv) > 1 and sys.argv[1].endswith('.json') and os.path.exists(sys.argv[1]):
-        input_files = [sys.argv[1]]
+    if args and args[0].endswith(TIMETABLE_EXTENSIONS) and os.path.exists(args[0]):
+        input_files = [args[0]]
     elif os.path.exists(jsons_dir):
-        # Ищем все JSON файлы в папке
-        input_files = list(Path(jsons_dir).glob('*.json'))
+        # Ищем все JSON и NDJSON файлы в папке
+        input_files = sorted(path for extension in TIMETABLE_EXTENSIONS
+                             for path in Path(jsons_dir).glob('*' + extension))
         if not input_files:
             # Пробуем текущую директорию
             input_files = list(Path('.').glob('timetable*.json'))
@@ -208,31 +509,54 @@ def main():
     
     if not input_files:
         print("Не найдено JSON файлов для нормализации")
-        print("Использование: python3 normalize_disciplines.py [файл.json]")
+        print("Использование: python3 normalize_disciplines.py [файл.json|файл.ndjson] [--force]")
         print("Или поместите JSON файлы в папку schedules_json/")
         return
     
     print(f"Найдено JSON файлов: {len(input_files)}")
     
+    # Файлы, у которых не изменились входной JSON, словарь и нормализатор, пропускаются
+    cache = NormalizeCache(ABBREVIATIONS, reuse=not force)
+    
+    # После правки словаря заново нормализуются только названия с измененными сокращениями,
+    # а файлы, где ни одно название не изменилось, не перезаписываются
+    update = cache.update_dictionary(ABBREVIATIONS, normalize_discipline_name_cached)
+    if update is None:
+        if cache.files and not force:
+            print("Прежний словарь сокращений неизвестен: названия нормализуются заново")
+    elif update[0]:
+        print(f"Изменено сокращений: {update[0]}, затронуто названий: {update[1]}, изменилось: {update[2]}")
+    
     # Нормализуем каждый файл
-    for input_file in input_files:
-        input_file = str(input_file)
-        print(f"\n{'='*60}")
-        print(f"Обработка: {input_file}")
-        print(f"{'='*60}")
-        
-        # Создаем имя выходного файла в папке schedules_parsed/
-        parsed_dir = 'schedules_parsed'
-        Path(parsed_dir).mkdir(exist_ok=True)
-        
-        # Берем только имя файла без пути
-        base_name = os.path.basename(input_file)
-        # Убираем расширение и добавляем _normalized
-        if base_name.endswith('.json'):
-            base_name = base_name[:-5]  # Убираем .json
-        output_file = os.path.join(parsed_dir, base_name + '_normalized.json')
-        
-        normalize_timetable(input_file, output_file)
+    try:
+        for input_file in input_files:
+            input_file = str(input_file)
+            
+            # Создаем имя выходного файла в папке schedules_parsed/
+            parsed_dir = 'schedules_parsed'
+            Path(parsed_dir).mkdir(exist_ok=True)
+            output_file = normalized_output_path(input_file, parsed_dir)
+            
+            records, sha256, reason = cache.lookup(input_file, output_file)
+            if records is not None:
+                print(f"\n⊘ Пропуск {input_file}: не изменился ({records} записей)")
+                continue
+            
+            print(f"\n{'='*60}")
+            print(f"Обработка: {input_file} ({reason})")
+            print(f"{'='*60}")
+            
+            records, _, names = normalize_timetable(input_file, output_file, cache.disciplines)
+            cache.store(input_file, sha256, output_file, len(records), names)
+    finally:
+        cache.save()
+    
+    hits, misses = name_cache_stats()
+    known_hits = known_name_hits()
+    print(f"\n{'='*60}")
+    print(f"Всего нормализовано названий: {misses}, взято из кэша: {hits + known_hits} "
+          f"(уже нормализованных: {known_hits}, файлов: {cache.normalized})")
+    print(cache.summary())
     
     # Опционально: можно заменить исходный файл
     # import shutil
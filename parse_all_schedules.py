@@ -3,14 +3,188 @@
 """
 Скрипт для массового парсинга всех PDF расписаний
 Парсит все файлы из папки schedules_pdf и сохраняет JSON в schedules_json
+
+Использование:
+    python3 parse_all_schedules.py              # последовательный парсинг
+    python3 parse_all_schedules.py --workers 8  # параллельный парсинг в 8 процессах
+    python3 parse_all_schedules.py --workers 0  # по числу ядер процессора
+    python3 parse_all_schedules.py --page-workers 4  # большие PDF: страницы в 4 процессах
+    python3 parse_all_schedules.py --single-pass  # одна раскладка страницы на текст и таблицы
+    python3 parse_all_schedules.py --table-template  # искать таблицы в области, выученной по первой странице
+    python3 parse_all_schedules.py --format ndjson  # NDJSON: запись на строку, пишется по ходу парсинга
+    python3 parse_all_schedules.py --format compact  # одно занятие со списком групп вместо записи на группу
+    python3 parse_all_schedules.py --force      # игнорировать кэш и распарсить все заново
+    python3 parse_all_schedules.py --share-cell-cache  # общий кэш разбора ячеек для всех файлов
+    python3 parse_all_schedules.py --low-memory  # экономия памяти: кэш страниц, лимит и перезапуск процессов
+    python3 parse_all_schedules.py --timings    # замеры времени по этапам в parse_metrics.json
+    python3 parse_all_schedules.py --compact-json  # JSON без отступов (меньше файлы, быстрее запись)
+
+Неизмененные PDF (тот же SHA-256 и та же версия парсера) не парсятся повторно,
+результат берется из кэша parse_cache.json. Одинаковые PDF под разными именами
+(один файл по нескольким ссылкам на сайте) парсятся один раз, результат копируется для каждого имени
 """
 
 import os
+import sys
+import argparse
+import json_codec
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from parse_timetable import parse_pdf
-import json
+from time import perf_counter
+from typing import Dict, Optional, Tuple
+from parse_timetable import (parse_pdf_iter, write_entries, extraction_variant, configure_cell_cache,
+                             clear_cell_cache, cell_cache_stats, cell_cache_summary, CELL_CACHE_SIZE)
+from parse_cache import ParseCache
+from pdf_store import group_by_content
+from parse_metrics import NULL_TIMER, METRICS_FILE, StageTimer, write_metrics, format_summary
+
+try:
+    import resource  # Нет в Windows: ограничение и замер памяти через /proc и getrusage недоступны
+except ImportError:
+    resource = None
+
+# Значения по умолчанию в режиме --low-memory
+LOW_MEMORY_TASKS_PER_CHILD = 10    # Процесс пула перезапускается после стольких файлов
+LOW_MEMORY_WORKER_LIMIT_MB = 2048  # Ограничение адресного пространства (не RSS) процесса пула
+
+def init_worker(cell_cache_size: int, max_memory_mb: int = 0):
+    """
+    Настройка процесса пула: размер кэша ячеек и ограничение памяти.
+    При превышении лимита парсинг файла завершается MemoryError в этом процессе,
+    а не приходом OOM killer ко всей задаче.
+    """
+    configure_cell_cache(cell_cache_size)
+    if max_memory_mb and resource is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = max_memory_mb * 1024 * 1024
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+def reset_peak_rss():
+    """Сбрасывает пик RSS процесса (Linux), чтобы следующий замер относился к одному файлу"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def peak_rss_mb() -> Optional[float]:
+    """Пик RSS процесса в МБ: на Linux - с последнего reset_peak_rss, иначе за все время процесса"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss в байтах на macOS и в килобайтах на Linux
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    return None
+
+def json_output_path(pdf_file: Path, jsons_dir: str, output_format: str = 'json') -> str:
+    """Путь к файлу результата для PDF: то же имя с расширением .json или .ndjson"""
+    extension = '.ndjson' if output_format == 'ndjson' else '.json'
+    return os.path.join(jsons_dir, pdf_file.stem + extension)
+
+def is_memory_error(error: BaseException) -> bool:
+    """Проверяет, вызвана ли ошибка нехваткой памяти (pdfplumber оборачивает MemoryError в свои исключения)"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, MemoryError):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+def parse_to_json(pdf_file: Path, jsons_dir: str, page_workers: int = 1,
+                  single_pass: bool = False, output_format: str = 'json', share_cell_cache: bool = False,
+                  table_template: bool = False, low_memory: bool = False,
+                  timings: bool = False) -> Tuple[str, int, Tuple[int, int], Optional[float], Optional[Dict]]:
+    """
+    Парсит один PDF файл и сохраняет результат в JSON (NDJSON, компактный JSON).
+    Записи пишутся в файл по мере парсинга, не накапливаясь в памяти.
+    Кэш разбора ячеек очищается перед файлом, если он не общий для всего запуска
+    (общий кэш живет в процессе, который парсит файл).
+    Возвращает путь к файлу результата, количество записей, (попаданий, промахов) кэша ячеек,
+    пик RSS процесса за время парсинга файла в МБ и замеры по этапам (при timings, иначе None).
+    Функция верхнего уровня, чтобы её можно было запускать в пуле процессов.
+    """
+    if not share_cell_cache:
+        clear_cell_cache()
+    hits_before, misses_before = cell_cache_stats()
+    reset_peak_rss()
+    timer = StageTimer() if timings else NULL_TIMER
+    started = perf_counter()
+    
+    output_path = json_output_path(pdf_file, jsons_dir, output_format)
+    memory_exceeded = False
+    try:
+        entries = parse_pdf_iter(str(pdf_file), page_workers=page_workers, single_pass=single_pass,
+                                 table_template=table_template, low_memory=low_memory, timer=timer)
+        records = write_entries(entries, output_path, output_format)
+    except Exception as e:
+        if not is_memory_error(e):
+            raise
+        memory_exceeded = True
+    
+    # Исключение поднимается вне блока except: traceback с объектами страниц уже освобожден,
+    # и процесс пула может передать ошибку и продолжить работу
+    if memory_exceeded:
+        raise MemoryError(f"не хватило памяти процесса для {pdf_file.name}")
+    
+    metrics = None
+    if timings:
+        metrics = {'seconds': round(perf_counter() - started, 6), 'records': records, **timer.to_dict()}
+    
+    hits, misses = cell_cache_stats()
+    return output_path, records, (hits - hits_before, misses - misses_before), peak_rss_mb(), metrics
+
+def parse_args():
+    """Разбирает аргументы командной строки"""
+    parser = argparse.ArgumentParser(description='Массовый парсинг PDF расписаний')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='количество процессов для парсинга (1 - последовательно, 0 - по числу ядер)')
+    parser.add_argument('--page-workers', type=int, default=1,
+                        help='количество процессов для извлечения страниц внутри одного PDF')
+    parser.add_argument('--single-pass', action='store_true',
+                        help='раскладывать страницу один раз: заголовок берется из текста вне таблиц')
+    parser.add_argument('--table-template', action='store_true',
+                        help='искать таблицы в области, выученной на предыдущих страницах документа')
+    parser.add_argument('--force', action='store_true',
+                        help='не использовать кэш, распарсить все файлы заново')
+    parser.add_argument('--format', choices=['json', 'ndjson', 'compact'], default='json',
+                        help='формат результата: JSON массив, NDJSON (запись на строку, пишется по ходу парсинга) '
+                             'или compact (одно занятие на все группы)')
+    parser.add_argument('--cell-cache-size', type=int, default=CELL_CACHE_SIZE,
+                        help=f'размер кэша разбора ячеек (по умолчанию {CELL_CACHE_SIZE}, 0 - без кэша)')
+    parser.add_argument('--share-cell-cache', action='store_true',
+                        help='не очищать кэш разбора ячеек между файлами')
+    parser.add_argument('--low-memory', action='store_true',
+                        help='экономия памяти: освобождать кэш pdfplumber после каждой страницы, парсить '
+                             'в отдельных процессах с лимитом памяти и перезапускать их после нескольких файлов')
+    parser.add_argument('--max-tasks-per-child', type=int, default=None,
+                        help=f'перезапускать процесс пула после N файлов '
+                             f'(по умолчанию {LOW_MEMORY_TASKS_PER_CHILD} с --low-memory, иначе не перезапускать)')
+    parser.add_argument('--max-worker-memory', type=int, default=None,
+                        help=f'лимит памяти процесса пула в МБ '
+                             f'(по умолчанию {LOW_MEMORY_WORKER_LIMIT_MB} с --low-memory, 0 - без лимита)')
+    parser.add_argument('--compact-json', action='store_true',
+                        help='писать JSON без отступов (меньше файлы, быстрее запись)')
+    parser.add_argument('--timings', action='store_true',
+                        help=f'замерять время и число вызовов по этапам парсинга, сохранить в {METRICS_FILE} '
+                             f'и вывести сводку')
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    if args.compact_json:
+        # Через переменную окружения режим получают и процессы пула
+        json_codec.configure(compact=True)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    
     pdfs_dir = 'schedules_pdf'
     jsons_dir = 'schedules_json'
     
@@ -30,44 +204,173 @@ def main():
         return
     
     print(f"Найдено PDF файлов: {len(pdf_files)}")
-    print(f"Начинаем парсинг...\n")
+    print(f"Начинаем парсинг...\n", flush=True)
     
     total_records = 0
     success_count = 0
     error_count = 0
+    done = 0
     
-    for i, pdf_file in enumerate(pdf_files, 1):
-        print(f"[{i}/{len(pdf_files)}] Парсинг: {pdf_file.name}")
+    cache = ParseCache(reuse=not args.force, variant=extraction_variant(args.single_pass, args.table_template))
+    configure_cell_cache(args.cell_cache_size)
+    cell_hits = 0
+    cell_misses = 0
+    
+    # Сначала отбираем файлы, которые изменились с прошлого запуска
+    to_parse = []
+    hashes = {}
+    for pdf_file in pdf_files:
+        output_path = json_output_path(pdf_file, jsons_dir, args.format)
+        records, sha256 = cache.lookup(str(pdf_file), output_path, args.format)
+        if records is None:
+            to_parse.append(pdf_file)
+            hashes[pdf_file] = sha256
+            continue
+        
+        done += 1
+        print(f"[{done}/{len(pdf_files)}] Парсинг: {pdf_file.name}")
         print("-" * 60)
+        print(f"⊘ Файл не изменился, результат из кэша: {output_path} ({records} записей)\n")
         
-        try:
-            results = parse_pdf(str(pdf_file))
-            
-            # Создаем имя JSON файла на основе имени PDF
-            json_name = pdf_file.stem + '.json'
-            output_path = os.path.join(jsons_dir, json_name)
-            
-            # Сохраняем в JSON
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
-            
-            print(f"✓ Найдено записей: {len(results)}")
-            print(f"✓ Сохранено в: {output_path}\n")
-            
-            total_records += len(results)
+        total_records += records
+        success_count += 1
+    
+    # Одинаковые PDF под разными именами парсятся один раз, остальные получают копию результата
+    groups = group_by_content(to_parse, hashes)
+    to_parse = [files[0] for files in groups.values()]
+    duplicates = len(pdf_files) - done - len(to_parse)
+    if duplicates:
+        print(f"Одинаковых PDF под другими именами: {duplicates} (будут распарсены один раз)\n")
+    
+    workers = min(workers, len(to_parse))
+    if workers > 1:
+        print(f"Процессов для парсинга: {workers}\n")
+    
+    parse_options = {
+        'page_workers': args.page_workers,
+        'single_pass': args.single_pass,
+        'output_format': args.format,
+        'share_cell_cache': args.share_cell_cache,
+        'table_template': args.table_template,
+        'low_memory': args.low_memory,
+        'timings': args.timings
+    }
+    
+    # Режим экономии памяти: лимит памяти и перезапуск процессов пула.
+    # Пул используется даже с одним процессом, чтобы пики памяти не оставались в основном процессе.
+    max_tasks_per_child = args.max_tasks_per_child
+    max_worker_memory = args.max_worker_memory
+    if args.low_memory:
+        if max_tasks_per_child is None:
+            max_tasks_per_child = LOW_MEMORY_TASKS_PER_CHILD
+        if max_worker_memory is None:
+            max_worker_memory = LOW_MEMORY_WORKER_LIMIT_MB
+    use_pool = workers > 1 or (bool(to_parse) and bool(args.low_memory or max_tasks_per_child or max_worker_memory))
+    
+    pool_options = {}
+    if max_tasks_per_child:
+        if sys.version_info >= (3, 11):
+            pool_options['max_tasks_per_child'] = max_tasks_per_child
+        else:
+            print("Предупреждение: перезапуск процессов пула требует Python 3.11+, параметр проигнорирован")
+    if max_worker_memory and resource is None:
+        print("Предупреждение: лимит памяти процессов недоступен на этой платформе")
+    
+    peak_rss = []
+    file_metrics = {}
+    
+    def report(pdf_file, result):
+        """Печатает результат файла и добавляет его в общую статистику"""
+        nonlocal total_records, success_count, done, cell_hits, cell_misses
+        output_path, records, (hits, misses), peak_mb, metrics = result
+        cache.store(str(pdf_file), hashes[pdf_file], output_path, records, args.format)
+        
+        print(f"✓ Найдено записей: {records}")
+        if peak_mb is not None:
+            print(f"✓ Пик памяти: {peak_mb:.0f} МБ")
+            peak_rss.append(peak_mb)
+        if metrics is not None:
+            print(f"✓ Время: {metrics['seconds']:.2f} с")
+            file_metrics[str(pdf_file)] = metrics
+        print(f"✓ Сохранено в: {output_path}\n", flush=True)
+        
+        total_records += records
+        success_count += 1
+        cell_hits += hits
+        cell_misses += misses
+        
+        for alias in groups[hashes[pdf_file]][1:]:
+            alias_output = json_output_path(alias, jsons_dir, args.format)
+            cache.store_copy(str(alias), hashes[alias], alias_output, str(pdf_file))
+            done += 1
+            print(f"[{done}/{len(pdf_files)}] {alias.name}: тот же PDF, что {pdf_file.name}")
+            print(f"✓ Сохранено в: {alias_output} ({records} записей)\n", flush=True)
+            total_records += records
             success_count += 1
-            
-        except Exception as e:
-            print(f"✗ Ошибка при парсинге {pdf_file.name}: {e}\n")
+    
+    def report_error(pdf_file, error):
+        """Печатает ошибку файла; одинаковые с ним PDF тоже считаются ошибками"""
+        nonlocal error_count, done
+        print(f"✗ Ошибка при парсинге {pdf_file.name}: {error or type(error).__name__}\n", flush=True)
+        error_count += 1
+        for alias in groups[hashes[pdf_file]][1:]:
+            done += 1
+            print(f"[{done}/{len(pdf_files)}] {alias.name}: тот же PDF, что {pdf_file.name}")
+            print(f"✗ Ошибка при парсинге {alias.name}\n", flush=True)
             error_count += 1
     
+    try:
+        if use_pool:
+            # Параллельный режим: каждый файл парсится и сохраняется в отдельном процессе,
+            # строки прогресса [i/N] печатаются по мере завершения файлов
+            with ProcessPoolExecutor(max_workers=max(workers, 1), initializer=init_worker,
+                                     initargs=(args.cell_cache_size, max_worker_memory or 0),
+                                     **pool_options) as executor:
+                futures = {
+                    executor.submit(parse_to_json, pdf_file, jsons_dir, **parse_options): pdf_file
+                    for pdf_file in to_parse
+                }
+                for future in as_completed(futures):
+                    pdf_file = futures[future]
+                    done += 1
+                    print(f"[{done}/{len(pdf_files)}] Парсинг: {pdf_file.name}")
+                    print("-" * 60)
+                    
+                    try:
+                        report(pdf_file, future.result())
+                    
+                    except Exception as e:
+                        report_error(pdf_file, e)
+        else:
+            for pdf_file in to_parse:
+                done += 1
+                print(f"[{done}/{len(pdf_files)}] Парсинг: {pdf_file.name}")
+                print("-" * 60)
+                
+                try:
+                    report(pdf_file, parse_to_json(pdf_file, jsons_dir, **parse_options))
+                
+                except Exception as e:
+                    report_error(pdf_file, e)
+    finally:
+        # Сохраняем кэш даже при прерывании, чтобы не терять уже сделанную работу
+        cache.save()
+        if args.timings:
+            write_metrics(file_metrics)
+    
     print("=" * 60)
     print(f"Парсинг завершен!")
     print(f"  Успешно обработано: {success_count}")
     print(f"  Ошибок: {error_count}")
     print(f"  Всего записей: {total_records}")
+    print(f"  {cache.summary()}")
+    print(f"  {cell_cache_summary(cell_hits, cell_misses)}")
+    if peak_rss:
+        print(f"  Пик памяти на файл: максимум {max(peak_rss):.0f} МБ")
+    if file_metrics:
+        print(f"\nВремя по этапам (замеры сохранены в {METRICS_FILE}):")
+        print(format_summary(file_metrics))
     print(f"\nJSON файлы сохранены в папку: {jsons_dir}/")
 
 if __name__ == '__main__':
     main()
-
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Кэш результатов парсинга PDF расписаний
+Хранит SHA-256 каждого PDF и версию парсера в манифесте parse_cache.json,
+чтобы не парсить повторно файлы, которые не изменились с прошлого запуска
+"""
+
+import hashlib
+import os
+import json_codec
+import shutil
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Манифест кэша лежит рядом с папкой schedules_json/
+CACHE_FILE = 'parse_cache.json'
+
+# Модули, от которых зависит результат парсинга: их изменение сбрасывает кэш.
+# Файлы JSON пишет timetable_format.py (json, ndjson, compact), порядок полей задает
+# TimetableEntry.to_dict (timetable_entry.py), кодирование - json_codec.py
+PARSER_FILES = ['parse_timetable.py', 'timetable_format.py', 'timetable_entry.py', 'json_codec.py']
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Считает SHA-256 файла, читая его по частям"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def source_fingerprint(files, variant: str = '') -> str:
+    """Хеш исходного кода модулей files (рядом с этим файлом) и строки variant"""
+    base_dir = Path(__file__).resolve().parent
+    digest = hashlib.sha256()
+    for name in files:
+        digest.update((base_dir / name).read_bytes())
+    digest.update(variant.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def parser_fingerprint(variant: str = '') -> str:
+    """
+    Версия парсера - хеш исходного кода модулей, влияющих на результат,
+    и режима извлечения (variant), если он может менять результат
+    """
+    return source_fingerprint(PARSER_FILES, variant)
+
+class ParseCache:
+    """
+    Манифест вида {pdf: {sha256, json, json_sha256, records, format, compact_json}}.
+    Файл считается неизменным, если совпадают хеш PDF и версия парсера,
+    а сохраненный JSON на месте, не был изменен и записан в том же режиме json_codec.
+    """
+    
+    def __init__(self, cache_file: str = CACHE_FILE, reuse: bool = True, variant: str = ''):
+        self.cache_file = cache_file
+        self.reuse = reuse
+        self.version = parser_fingerprint(variant)
+        self.files: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self._load()
+    
+    def _load(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json_codec.load(f)
+        except FileNotFoundError:
+            return
+        except json_codec.JSONDecodeError as e:
+            print(f"Предупреждение: кэш {self.cache_file} поврежден ({e}), парсим все файлы заново")
+            return
+        
+        # Другая версия парсера - все сохраненные результаты устарели
+        if data.get('parser_version') == self.version:
+            self.files = data.get('files', {})
+    
+    def _is_valid(self, entry: Dict) -> bool:
+        """Проверяет, что сохраненный JSON существует, не изменялся и записан в текущем режиме (с отступами или без)"""
+        if entry.get('compact_json', False) != json_codec.is_compact():
+            return False
+        json_path = entry.get('json')
+        if not json_path or not os.path.exists(json_path):
+            return False
+        return file_sha256(json_path) == entry.get('json_sha256')
+    
+    def lookup(self, pdf_path: str, output_path: str, output_format: str = 'json') -> Tuple[Optional[int], str]:
+        """
+        Ищет результат парсинга PDF в кэше.
+        Возвращает (количество записей или None при промахе, SHA-256 PDF).
+        Если тот же PDF уже был распарсен под другим именем, его JSON копируется в output_path.
+        """
+        sha256 = file_sha256(pdf_path)
+        
+        if self.reuse:
+            entry = self.files.get(pdf_path)
+            if (entry and entry.get('sha256') == sha256 and entry.get('json') == output_path
+                    and entry.get('format', 'json') == output_format and self._is_valid(entry)):
+                self.hits += 1
+                return entry['records'], sha256
+            
+            # Тот же файл под другим именем (результат в том же формате)
+            for other_path, other in self.files.items():
+                if (other_path != pdf_path and other.get('sha256') == sha256
+                        and other.get('format', 'json') == output_format and self._is_valid(other)):
+                    self.store_copy(pdf_path, sha256, output_path, other_path)
+                    self.hits += 1
+                    return other['records'], sha256
+        
+        self.misses += 1
+        return None, sha256
+    
+    def store(self, pdf_path: str, sha256: str, output_path: str, records: int, output_format: str = 'json'):
+        """Запоминает результат парсинга PDF"""
+        self.files[pdf_path] = {
+            'sha256': sha256,
+            'json': output_path,
+            'json_sha256': file_sha256(output_path),
+            'records': records,
+            'format': output_format,
+            'compact_json': json_codec.is_compact()
+        }
+    
+    def store_copy(self, pdf_path: str, sha256: str, output_path: str, source_pdf: str) -> int:
+        """
+        Результат для того же PDF под другим именем: JSON уже распарсенного source_pdf
+        копируется в output_path. Возвращает количество записей.
+        """
+        source = self.files[source_pdf]
+        if source['json'] != output_path:
+            shutil.copyfile(source['json'], output_path)
+        self.store(pdf_path, sha256, output_path, source['records'], source.get('format', 'json'))
+        return source['records']
+    
+    def save(self):
+        """Атомарно сохраняет манифест кэша"""
+        tmp_path = self.cache_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json_codec.dump({'parser_version': self.version, 'files': self.files}, f)
+        os.replace(tmp_path, self.cache_file)
+    
+    def summary(self) -> str:
+        """Строка статистики для итогового вывода (её разбирает backend)"""
+        return f"Кэш: попаданий {self.hits}, промахов {self.misses}"
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Замеры времени парсинга по этапам
+Этапы: open (pdfplumber.open), extract_text, find_tables, extract_tables,
+metadata (разбор заголовка страницы), rows (разбор строк таблиц и создание записей).
+Для каждого этапа считаются время и число вызовов - по файлу и по страницам.
+Выключенные замеры (NULL_TIMER) ничего не делают.
+"""
+
+import os
+import json_codec
+from datetime import datetime
+from time import perf_counter
+from typing import Dict, List, Optional
+
+# Файл с замерами лежит рядом с папкой schedules_json/
+METRICS_FILE = 'parse_metrics.json'
+
+# Порядок этапов в сводке
+STAGES = ['open', 'extract_text', 'find_tables', 'extract_tables', 'metadata', 'rows']
+
+class StageTimer:
+    """Время и число вызовов по этапам парсинга одного файла, всего и по страницам"""
+
+    def __init__(self):
+        self.stages: Dict[str, List] = {}          # этап -> [секунды, вызовы]
+        self.pages: Dict[int, Dict[str, float]] = {}  # номер страницы (с 0) -> {этап: секунды}
+
+    @staticmethod
+    def clock() -> float:
+        return perf_counter()
+
+    def add(self, stage: str, started: float, page: Optional[int] = None):
+        """Добавляет к этапу время с момента started (значение clock())"""
+        elapsed = perf_counter() - started
+        totals = self.stages.setdefault(stage, [0.0, 0])
+        totals[0] += elapsed
+        totals[1] += 1
+        if page is not None:
+            page_stages = self.pages.setdefault(page, {})
+            page_stages[stage] = page_stages.get(stage, 0.0) + elapsed
+
+    def merge(self, state: Dict):
+        """Добавляет замеры, сделанные в другом процессе (см. to_dict)"""
+        for stage, data in state['stages'].items():
+            totals = self.stages.setdefault(stage, [0.0, 0])
+            totals[0] += data['seconds']
+            totals[1] += data['calls']
+        for page, page_stages in state['pages'].items():
+            own = self.pages.setdefault(int(page), {})
+            for stage, seconds in page_stages.items():
+                own[stage] = own.get(stage, 0.0) + seconds
+
+    def to_dict(self) -> Dict:
+        """Замеры в виде для JSON и передачи между процессами"""
+        return {
+            'stages': {stage: {'seconds': round(seconds, 6), 'calls': calls}
+                       for stage, (seconds, calls) in self.stages.items()},
+            'pages': {str(page): {stage: round(seconds, 6) for stage, seconds in stages.items()}
+                      for page, stages in sorted(self.pages.items())}
+        }
+
+class NullTimer:
+    """Выключенные замеры: те же методы, ничего не считают"""
+
+    @staticmethod
+    def clock() -> float:
+        return 0.0
+
+    def add(self, stage: str, started: float, page: Optional[int] = None):
+        pass
+
+    def merge(self, state: Dict):
+        pass
+
+NULL_TIMER = NullTimer()
+
+def summarize(files: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Суммирует замеры файлов по этапам; other - время файлов вне этапов (запись результата и т.п.)"""
+    totals = {}
+    other = 0.0
+    for metrics in files.values():
+        in_stages = 0.0
+        for stage, data in metrics['stages'].items():
+            total = totals.setdefault(stage, {'seconds': 0.0, 'calls': 0})
+            total['seconds'] += data['seconds']
+            total['calls'] += data['calls']
+            in_stages += data['seconds']
+        other += max(metrics['seconds'] - in_stages, 0.0)
+    totals['other'] = {'seconds': other, 'calls': len(files)}
+    return totals
+
+def write_metrics(files: Dict[str, Dict], metrics_file: str = METRICS_FILE):
+    """Сохраняет замеры по файлам и итоги по этапам в JSON"""
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'files_count': len(files),
+        'total_seconds': round(sum(metrics['seconds'] for metrics in files.values()), 6),
+        'stages': {stage: {'seconds': round(data['seconds'], 6), 'calls': data['calls']}
+                   for stage, data in summarize(files).items()},
+        'files': files
+    }
+    tmp_path = metrics_file + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json_codec.dump(report, f)
+    os.replace(tmp_path, metrics_file)
+
+def format_summary(files: Dict[str, Dict]) -> str:
+    """Таблица итогов по этапам для вывода в конце парсинга"""
+    totals = summarize(files)
+    total_seconds = sum(data['seconds'] for data in totals.values()) or 1.0
+    order = [stage for stage in STAGES if stage in totals]
+    order += sorted(stage for stage in totals if stage not in STAGES and stage != 'other') + ['other']
+
+    lines = [f"  {'Этап':<16}{'Вызовов':>10}{'Время, с':>12}{'Доля':>8}{'мс/вызов':>12}"]
+    for stage in order:
+        data = totals[stage]
+        per_call = data['seconds'] / data['calls'] * 1000 if data['calls'] else 0.0
+        lines.append(f"  {stage:<16}{data['calls']:>10}{data['seconds']:>12.3f}"
+                     f"{data['seconds'] / total_seconds:>8.1%}{per_call:>12.2f}")
+    return '\n'.join(lines)
@@ -5,10 +5,16 @@
 Извлекает данные в формате JSON
 """
 
+import os
 import re
-import json
 import pdfplumber
-from typing import List, Dict, Optional, Tuple
+import json_codec
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from timetable_entry import TimetableEntry
+from timetable_format import dump_entries
+from parse_metrics import NULL_TIMER, StageTimer
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 
 # Словарь для преобразования дней недели
 DAYS_MAP = {
@@ -21,30 +27,53 @@ DAYS_MAP = {
     'ВС': 'sunday'
 }
 
+# Скомпилированные регулярные выражения для разбора ячеек таблицы
+# Аудитории: А436, У606, A2Б, A417, A24, ЭОиДОТ, С. Паттерны проверяются по порядку:
+# совпадение более раннего паттерна в любом месте текста важнее более позднего.
+# Отдельный паттерн [АУA]\d+ не нужен - его совпадения всегда находит первый.
+ROOM_PATTERNS = [
+    re.compile(r'([АУA]\d+[А-ЯA-Z]?)'),  # А436, У606, A2Б, A24, A22
+    re.compile(r'(ЭОиДОТ)'),              # ЭОиДОТ
+    re.compile(r'([СC](?=\s|,|$))'),      # С (отдельно стоящая)
+]
+# Информация о часах лекций: "лекция 10 ч", "(лек 8ч)"
+LECTURE_HOURS_PATTERNS = [
+    re.compile(r'\(?лекция?\s+\d+\s*ч\)?', re.IGNORECASE),
+    re.compile(r'\(?лек\s+\d+\s*ч\)?', re.IGNORECASE),
+]
+TRAILING_SEPARATORS_RE = re.compile(r'[,\s]+$')
+WHITESPACE_RE = re.compile(r'\s+')
+LEADING_COMMA_RE = re.compile(r'^,\s*')
+TRAILING_COMMA_RE = re.compile(r',\s*$')
+DOUBLE_COMMA_RE = re.compile(r',\s*,')
+SUBGROUP_RE = re.compile(r'п/г\s*(\d+)', re.IGNORECASE)
+
 def extract_room(text: str) -> Optional[str]:
     """Извлекает номер аудитории из текста"""
-    # Паттерны для аудиторий: А436, У606, A2Б, A417, A423, A24, A22, A532, A533, A515, A539, A304, A516, A517, A504, A603, A615, A636, С, ЭОиДОТ
-    # Ищем аудитории в формате: буква(А/У/A) + цифры + опциональная буква
-    # Или специальные: С, ЭОиДОТ
-    room_patterns = [
-        r'([АУA]\d+[А-ЯA-Z]?)',  # А436, У606, A2Б, A24, A22
-        r'([АУA]\d+)',            # A417, A423 (если нет буквы в конце)
-        r'(ЭОиДОТ)',              # ЭОиДОТ
-        r'([СC](?=\s|,|$))'       # С (отдельно стоящая)
-    ]
-    
-    for pattern in room_patterns:
-        match = re.search(pattern, text)
+    for pattern in ROOM_PATTERNS:
+        match = pattern.search(text)
         if match:
             room = match.group(1)
-            # Проверяем, что это не часть слова
-            if room and len(room) > 1:  # Игнорируем одиночные буквы, кроме С
+            # Одиночная буква возможна только у паттерна "С" (латинская C тоже приводится к С)
+            if len(room) > 1:
                 return room
-            elif room == 'С' or room == 'C':
-                return 'С'
+            return 'С'
     
     return None
 
+def _parse_subject_part(part: str) -> Tuple[str, Optional[str]]:
+    """Выделяет из части ячейки (одна неделя) аудиторию и очищенное название дисциплины"""
+    room = extract_room(part)
+    subject = part
+    if room:
+        subject = part.replace(room, '').strip()
+    # Убираем информацию о часах (например, "лекция 10 ч", "лек 8ч")
+    if 'лек' in subject.lower():
+        for pattern in LECTURE_HOURS_PATTERNS:
+            subject = pattern.sub('', subject)
+    subject = TRAILING_SEPARATORS_RE.sub('', subject)
+    return clean_subject_name(subject), room
+
 def parse_subject_and_room(text: str) -> List[Dict]:
     """
     Парсит текст дисциплины и извлекает записи для четных/нечетных недель.
@@ -54,73 +83,28 @@ def parse_subject_and_room(text: str) -> List[Dict]:
         return []
     
     text = text.strip()
-    results = []
-    
-    # Проверяем наличие разделителя //
-    has_separator = '//' in text
     
-    if has_separator:
+    # Разделитель //: до него четная неделя, после - нечетная; без него - каждую неделю
+    if '//' in text:
         parts = text.split('//')
-        even_part = parts[0].strip() if len(parts) > 0 else ''
-        odd_part = parts[1].strip() if len(parts) > 1 else ''
-        
-        # Обрабатываем четную неделю (до //)
-        if even_part:
-            even_room = extract_room(even_part)
-            even_subject = even_part
-            if even_room:
-                even_subject = even_part.replace(even_room, '').strip()
-            # Убираем информацию о часах (например, "лекция 10 ч", "лек 8ч")
-            even_subject = re.sub(r'\(?лекция?\s+\d+\s*ч\)?', '', even_subject, flags=re.IGNORECASE)
-            even_subject = re.sub(r'\(?лек\s+\d+\s*ч\)?', '', even_subject, flags=re.IGNORECASE)
-            even_subject = re.sub(r'[,\s]+$', '', even_subject)
-            even_subject = clean_subject_name(even_subject)
-            
-            if even_subject:
-                results.append({
-                    'subject': even_subject,
-                    'room': even_room,
-                    'even_week': True,
-                    'odd_week': False
-                })
-        
-        # Обрабатываем нечетную неделю (после //)
-        if odd_part:
-            odd_room = extract_room(odd_part)
-            odd_subject = odd_part
-            if odd_room:
-                odd_subject = odd_part.replace(odd_room, '').strip()
-            # Убираем информацию о часах
-            odd_subject = re.sub(r'\(?лекция?\s+\d+\s*ч\)?', '', odd_subject, flags=re.IGNORECASE)
-            odd_subject = re.sub(r'\(?лек\s+\d+\s*ч\)?', '', odd_subject, flags=re.IGNORECASE)
-            odd_subject = re.sub(r'[,\s]+$', '', odd_subject)
-            odd_subject = clean_subject_name(odd_subject)
-            
-            if odd_subject:
-                results.append({
-                    'subject': odd_subject,
-                    'room': odd_room,
-                    'even_week': False,
-                    'odd_week': True
-                })
+        weeks = [
+            (parts[0].strip(), True, False),
+            (parts[1].strip() if len(parts) > 1 else '', False, True)
+        ]
     else:
-        # Нет разделителя - каждую неделю
-        room = extract_room(text)
-        subject = text
-        if room:
-            subject = text.replace(room, '').strip()
-        # Убираем информацию о часах
-        subject = re.sub(r'\(?лекция?\s+\d+\s*ч\)?', '', subject, flags=re.IGNORECASE)
-        subject = re.sub(r'\(?лек\s+\d+\s*ч\)?', '', subject, flags=re.IGNORECASE)
-        subject = re.sub(r'[,\s]+$', '', subject)
-        subject = clean_subject_name(subject)
-        
+        weeks = [(text, True, True)]
+    
+    results = []
+    for part, even_week, odd_week in weeks:
+        if not part:
+            continue
+        subject, room = _parse_subject_part(part)
         if subject:
             results.append({
                 'subject': subject,
                 'room': room,
-                'even_week': True,
-                'odd_week': True
+                'even_week': even_week,
+                'odd_week': odd_week
             })
     
     return results
@@ -130,268 +114,604 @@ def extract_subgroup_number(text: str) -> Optional[int]:
     if not text:
         return None
     # Ищем паттерны: п/г1, п/г 1, п/г2, п/г 2 и т.д.
-    match = re.search(r'п/г\s*(\d+)', text, re.IGNORECASE)
+    match = SUBGROUP_RE.search(text)
     if match:
         return int(match.group(1))
     return None
 
+def detect_lesson_type(text: str) -> Optional[str]:
+    """Определяет тип занятия по тексту ячейки: lecture, practice или subgroup"""
+    text_lower = text.lower()
+    if '(лек' in text_lower or 'лекция' in text_lower:
+        return 'lecture'
+    if '(пр' in text_lower or 'практическое' in text_lower:
+        return 'practice'
+    if 'п/г' in text_lower:
+        return 'subgroup'
+    return None
+
+def parse_cell(text: str) -> Tuple[List[Dict], Optional[str], Optional[int]]:
+    """
+    Разбирает ячейку с дисциплиной: аудитория и название, тип занятия и номер подгруппы
+    ищутся отдельными поисками по тексту ячейки, как и раньше (название получается
+    удалением аудитории из текста, и часы лекций ищутся уже в остатке).
+    Возвращает (записи по неделям с дисциплиной и аудиторией, тип занятия, номер подгруппы из текста)
+    """
+    return parse_subject_and_room(text), detect_lesson_type(text), extract_subgroup_number(text)
+
+# Кэш разбора ячеек: одни и те же тексты ячеек повторяются в строках, на страницах
+# и в PDF одного факультета. Размер ограничен, вытесняются давно не встречавшиеся.
+CELL_CACHE_SIZE = 4096
+_cell_cache = lru_cache(maxsize=CELL_CACHE_SIZE)(parse_cell)
+
+def configure_cell_cache(maxsize: int = CELL_CACHE_SIZE):
+    """Пересоздает кэш ячеек с заданным размером (0 - без кэширования)"""
+    global _cell_cache
+    _cell_cache = lru_cache(maxsize=maxsize)(parse_cell)
+
+def parse_cell_cached(text: str) -> Tuple[List[Dict], Optional[str], Optional[int]]:
+    """parse_cell с кэшем по тексту ячейки. Результат общий для всех вызовов - не изменять."""
+    return _cell_cache(text)
+
+def clear_cell_cache():
+    """Очищает кэш ячеек и его статистику"""
+    _cell_cache.cache_clear()
+
+def cell_cache_stats() -> Tuple[int, int]:
+    """Возвращает (попаданий, промахов) кэша ячеек с момента последней очистки"""
+    info = _cell_cache.cache_info()
+    return info.hits, info.misses
+
+def cell_cache_summary(hits: int, misses: int) -> str:
+    """Строка статистики кэша ячеек для итогового вывода"""
+    total = hits + misses
+    rate = hits / total * 100 if total else 0.0
+    return f"Кэш ячеек: попаданий {hits}, промахов {misses} ({rate:.1f}%)"
+
 def clean_subject_name(subject: str) -> str:
     """Очищает название дисциплины от лишних символов"""
     if not subject:
         return ""
     # Убираем лишние пробелы
-    subject = re.sub(r'\s+', ' ', subject)
+    subject = WHITESPACE_RE.sub(' ', subject)
     subject = subject.strip()
     # Убираем запятые в начале и конце
-    subject = re.sub(r'^,\s*', '', subject)
-    subject = re.sub(r',\s*$', '', subject)
+    subject = LEADING_COMMA_RE.sub('', subject)
+    subject = TRAILING_COMMA_RE.sub('', subject)
     # Убираем лишние запятые между словами
-    subject = re.sub(r',\s*,', ',', subject)
+    subject = DOUBLE_COMMA_RE.sub(',', subject)
     return subject
 
-def parse_pdf(pdf_path: str) -> List[Dict]:
-    """Парсит PDF файл и извлекает расписание"""
-    results = []
+def _outside_bboxes(bboxes: List[Tuple[float, float, float, float]]):
+    """Фильтр объектов страницы: оставляет все, кроме символов внутри заданных областей"""
+    def test(obj: Dict) -> bool:
+        if obj.get('object_type') != 'char':
+            return True
+        for x0, top, x1, bottom in bboxes:
+            if x0 <= obj['x0'] and obj['x1'] <= x1 and top <= obj['top'] and obj['bottom'] <= bottom:
+                return False
+        return True
+    return test
+
+# Шаблон таблиц: область таблиц, выученная на одной странице документа, переиспользуется на следующих
+TEMPLATE_MARGIN = 2.0     # Отступ вокруг области таблиц при обрезке страницы, пт
+TEMPLATE_TOLERANCE = 1.0  # Допустимое отклонение границ таблиц и колонок от шаблона, пт
+
+def _table_columns(table) -> List[float]:
+    """x-координаты линий, проходящих через все строки таблицы (каркас колонок)"""
+    columns = None
+    for row in table.rows:
+        xs = set()
+        for cell in row.cells:
+            if cell:
+                xs.add(round(cell[0], 1))
+                xs.add(round(cell[2], 1))
+        columns = xs if columns is None else columns & xs
+    return sorted(columns or [])
+
+def _close(a: Iterable[float], b: Iterable[float]) -> bool:
+    a = list(a)
+    b = list(b)
+    return len(a) == len(b) and all(abs(x - y) <= TEMPLATE_TOLERANCE for x, y in zip(a, b))
+
+class TableTemplate:
+    """
+    Шаблон расположения таблиц в документе: границы таблиц и x-координаты колонок,
+    найденные полным поиском на странице. Следующие страницы обрезаются по области
+    таблиц (page.crop), и таблицы ищутся только в ней - без заголовка и полей.
+    Результат принимается, только если таблицы совпали с шаблоном (число, границы, колонки)
+    и ни одна линия не упирается в край обрезки (иначе таблица выходит за область).
+    Иначе страница разбирается полным поиском, и шаблон выучивается по ней заново.
+    Таблицы за пределами области не ищутся, поэтому режим включается явно.
+    """
+    
+    def __init__(self):
+        self.page_bbox = None
+        self.bboxes = []
+        self.columns = []
+        self.crop_box = None
+        self.hits = 0
+        self.misses = 0
+    
+    def learn(self, page, tables):
+        """Запоминает расположение таблиц страницы (без таблиц шаблон сбрасывается)"""
+        if not tables:
+            self.crop_box = None
+            return
+        self.page_bbox = page.bbox
+        self.bboxes = [table.bbox for table in tables]
+        self.columns = [_table_columns(table) for table in tables]
+        px0, ptop, px1, pbottom = page.bbox
+        self.crop_box = (
+            max(px0, min(b[0] for b in self.bboxes) - TEMPLATE_MARGIN),
+            max(ptop, min(b[1] for b in self.bboxes) - TEMPLATE_MARGIN),
+            min(px1, max(b[2] for b in self.bboxes) + TEMPLATE_MARGIN),
+            min(pbottom, max(b[3] for b in self.bboxes) + TEMPLATE_MARGIN)
+        )
+    
+    def fits(self, cropped, tables) -> bool:
+        """Проверяет, что таблицы обрезанной страницы совпадают с шаблоном"""
+        if len(tables) != len(self.bboxes):
+            return False
+        for table, bbox, columns in zip(tables, self.bboxes, self.columns):
+            if not _close(table.bbox, bbox) or not _close(_table_columns(table), columns):
+                return False
+        # Линия, обрезанная краем области, значит, что таблица продолжается за ней
+        x0, top, x1, bottom = self.crop_box
+        for edge in cropped.edges:
+            if edge['orientation'] == 'v' and (edge['top'] <= top + 0.01 or edge['bottom'] >= bottom - 0.01):
+                return False
+            if edge['orientation'] == 'h' and (edge['x0'] <= x0 + 0.01 or edge['x1'] >= x1 - 0.01):
+                return False
+        return True
+    
+    def find_tables(self, page) -> List:
+        """Находит таблицы страницы: по шаблону, если он подходит, иначе полным поиском"""
+        if self.crop_box is not None and page.bbox == self.page_bbox:
+            cropped = page.crop(self.crop_box)
+            tables = cropped.find_tables()
+            if self.fits(cropped, tables):
+                self.hits += 1
+                return tables
+            self.misses += 1
+        tables = page.find_tables()
+        self.learn(page, tables)
+        return tables
+
+def extract_page(page, single_pass: bool = False, template: Optional[TableTemplate] = None,
+                 timer=NULL_TIMER) -> Tuple[Optional[str], List[List[List[Optional[str]]]]]:
+    """
+    Извлекает из страницы PDF текст и таблицы.
+    Это самая дорогая часть парсинга; результат - простые строки и списки,
+    поэтому его можно получать в отдельном процессе и передавать обратно.
+    Страницы без текста пропускаются (текст None), таблицы для них не извлекаются.
+    
+    В режиме single_pass символы страницы раскладываются один раз: сначала ищутся
+    таблицы, а текст заголовка собирается только из символов вне таблиц, без
+    раскладки текста всей страницы. Метаданные из самой таблицы берутся из ее
+    первой строки (table[0][2]), как и в обычном режиме.
+    
+    С шаблоном (template) таблицы ищутся в области, выученной на предыдущих страницах
+    документа (см. TableTemplate).
+    
+    Время этапов extract_text, find_tables и extract_tables записывается в timer
+    (page.extract_tables() - это те же find_tables и extract каждой таблицы).
+    """
+    index = page.page_number - 1
+    if single_pass:
+        if not page.chars:
+            return None, []
+        started = timer.clock()
+        tables = template.find_tables(page) if template else page.find_tables()
+        timer.add('find_tables', started, index)
+        started = timer.clock()
+        header_text = page.filter(_outside_bboxes([table.bbox for table in tables])).extract_text()
+        timer.add('extract_text', started, index)
+    else:
+        started = timer.clock()
+        header_text = page.extract_text()
+        timer.add('extract_text', started, index)
+        if not header_text:
+            return None, []
+        started = timer.clock()
+        tables = template.find_tables(page) if template else page.find_tables()
+        timer.add('find_tables', started, index)
+    
+    started = timer.clock()
+    extracted = [table.extract() for table in tables]
+    timer.add('extract_tables', started, index)
+    return header_text, extracted
+
+def iter_extracted_pages(pages: Iterable, single_pass: bool = False, template: Optional[TableTemplate] = None,
+                         release_pages: bool = False, timer=NULL_TIMER) -> Iterator[Tuple[Optional[str], List]]:
+    """
+    Извлекает страницы по очереди (см. extract_page).
+    pdfplumber хранит раскладку и объекты каждой прочитанной страницы, пока открыт документ.
+    При release_pages кэш страницы освобождается сразу после извлечения (page.close()),
+    и память не растет с числом страниц.
+    """
+    for page in pages:
+        extracted = extract_page(page, single_pass, template, timer)
+        if release_pages:
+            page.close()
+        yield extracted
+
+def open_pdf(pdf_path: str, timer=NULL_TIMER):
+    """Открывает PDF, записывая время открытия в timer (этап open)"""
+    started = timer.clock()
+    pdf = pdfplumber.open(pdf_path)
+    timer.add('open', started)
+    return pdf
+
+def extract_page_range(pdf_path: str, start: int, stop: int, single_pass: bool = False,
+                       table_template: bool = False, low_memory: bool = False,
+                       timer=NULL_TIMER) -> List[Tuple[Optional[str], List]]:
+    """Извлекает текст и таблицы страниц [start, stop) - задача для одного процесса"""
+    template = TableTemplate() if table_template else None
+    with open_pdf(pdf_path, timer) as pdf:
+        pages = (pdf.pages[i] for i in range(start, stop))
+        return list(iter_extracted_pages(pages, single_pass, template, low_memory, timer))
+
+def extract_page_range_timed(pdf_path: str, start: int, stop: int, single_pass: bool = False,
+                             table_template: bool = False,
+                             low_memory: bool = False) -> Tuple[List[Tuple[Optional[str], List]], Dict]:
+    """extract_page_range с замерами по этапам: возвращает страницы и замеры процесса (StageTimer.to_dict)"""
+    timer = StageTimer()
+    pages = extract_page_range(pdf_path, start, stop, single_pass, table_template, low_memory, timer)
+    return pages, timer.to_dict()
+
+def extract_pages_parallel(pdf_path: str, workers: int, single_pass: bool = False, table_template: bool = False,
+                           low_memory: bool = False, timer=NULL_TIMER) -> Iterator[Tuple[Optional[str], List]]:
+    """
+    Извлекает страницы PDF в пуле процессов.
+    Документ делится на непрерывные диапазоны страниц, каждый процесс открывает
+    файл сам. Страницы отдаются в исходном порядке, как только готов их диапазон.
+    Шаблон таблиц каждый процесс выучивает по своему диапазону.
+    Замеры процессов (если timer включен) добавляются в timer: время этапов суммируется
+    по процессам и может быть больше общего времени файла.
+    """
+    with open_pdf(pdf_path, timer) as pdf:
+        page_count = len(pdf.pages)
+    
+    if page_count == 0:
+        return
+    
+    workers = min(workers, page_count)
+    chunk_size = -(-page_count // workers)  # Округление вверх
+    ranges = [(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+    
+    timed = timer is not NULL_TIMER
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(extract_page_range_timed if timed else extract_page_range, [pdf_path] * len(ranges),
+                              [r[0] for r in ranges], [r[1] for r in ranges],
+                              [single_pass] * len(ranges), [table_template] * len(ranges),
+                              [low_memory] * len(ranges))
+        for chunk in chunks:
+            if timed:
+                chunk, state = chunk
+                timer.merge(state)
+            yield from chunk
+
+def iter_entries(pages: Iterable[Tuple[Optional[str], List]], timer=NULL_TIMER) -> Iterator[TimetableEntry]:
+    """
+    Отдает записи расписания из извлеченных страниц (текст, таблицы) по мере разбора строк.
+    Метаданные (институт, курс, специальность, группы, период) переносятся
+    со страницы на страницу, поэтому страницы обрабатываются строго по порядку.
+    В timer записывается время разбора заголовков (metadata) и строк таблиц (rows);
+    записи строки отдаются после замера, чтобы время их записи в файл не попадало в rows.
+    """
+    current_institute = None
+    current_course = None
+    current_specialty = None
+    current_groups = None
+    current_period = None
     
-    with pdfplumber.open(pdf_path) as pdf:
-        current_institute = None
-        current_course = None
-        current_specialty = None
-        current_groups = None
-        current_period = None
+    for index, (text, tables) in enumerate(pages):
+        if text is None:
+            continue
+        
+        started = timer.clock()
+        lines = text.split('\n')
+        
+        # Парсим заголовок для получения метаданных
+        for i, line in enumerate(lines):
+            # Ищем институт (например: "Институт медицинский")
+            if 'Институт' in line and not current_institute:
+                match = re.search(r'Институт\s+(\w+)', line)
+                if match:
+                    current_institute = match.group(1)
+            
+            # Ищем курс (например: "1 Курс" или "Курс 1")
+            if 'Курс' in line and not current_course:
+                match = re.search(r'(\d+)\s+Курс|Курс\s+(\d+)', line)
+                if match:
+                    current_course = match.group(1) or match.group(2)
+            
+            # Ищем специальность и группу в одной строке
+            # Пример: "Специальность31.05.01 Лечебное дело 501-51 Группа"
+            if 'Специальность' in line or re.search(r'\d+\.\d+\.\d+', line):
+                # Пытаемся извлечь специальность и группу
+                match = re.search(r'Специальность\s*(\d+\.\d+\.\d+)\s+(.+?)(?:\s+(\d+(?:-\d+)*(?:,\d+(?:-\d+)*)*))?\s*Группа', line)
+                if match:
+                    if not current_specialty:
+                        current_specialty = match.group(1) + ' ' + match.group(2).strip()
+                    if match.group(3) and not current_groups:
+                        groups_str = match.group(3)
+                        groups = re.split(r',', groups_str)
+                        current_groups = [g.strip() for g in groups if g.strip()]
+                else:
+                    # Пытаемся извлечь только специальность
+                    match = re.search(r'Специальность\s*(\d+\.\d+\.\d+)\s+(.+?)(?:\s+Группа)', line)
+                    if match and not current_specialty:
+                        current_specialty = match.group(1) + ' ' + match.group(2).strip()
+            
+            # Ищем группы отдельно
+            if 'Группа' in line and not current_groups:
+                # Ищем группы перед словом "Группа"
+                match = re.search(r'(\d+(?:-\d+)*(?:,\d+(?:-\d+)*)*)\s+Группа', line)
+                if match:
+                    groups_str = match.group(1).strip()
+                    groups = re.split(r',', groups_str)
+                    current_groups = [g.strip() for g in groups if g.strip()]
+            
+            # Ищем период
+            if 'ТО' in line and not current_period:
+                match = re.search(r'ТО\s+(\d{2}\.\d{2}\.\d{4})-(\d{2}\.\d{2}\.\d{4})', line)
+                if match:
+                    current_period = f"{match.group(1)}-{match.group(2)}"
+        timer.add('metadata', started, index)
         
-        for page_num, page in enumerate(pdf.pages):
-            text = page.extract_text()
-            if not text:
+        # Парсим таблицы
+        for table in tables:
+            if not table:
                 continue
             
-            lines = text.split('\n')
+            started = timer.clock()
+            # Парсим метаданные из первой строки таблицы (если они там есть)
+            if len(table) > 0 and len(table[0]) > 2:
+                first_row_text = table[0][2] if table[0][2] else ''
+                if first_row_text:
+                    # Парсим метаданные из текста первой строки
+                    # Формат: "2025-2026 весенний\nмедицинский 1\n31.05.01 Лечебное дело 501-51\n02.02.2026-06.06.2026"
+                    lines_meta = first_row_text.split('\n')
+                    for meta_line in lines_meta:
+                        meta_line = meta_line.strip()
+                        # Парсим институт и курс (например: "медицинский 1")
+                        if 'медицинский' in meta_line.lower():
+                            match = re.search(r'медицинский\s+(\d+)', meta_line, re.IGNORECASE)
+                            if match:
+                                if not current_institute:
+                                    current_institute = 'медицинский'
+                                if not current_course:
+                                    current_course = match.group(1)
+                        # Парсим специальность и группу (например: "31.05.01 Лечебное дело 501-51")
+                        if re.search(r'\d+\.\d+\.\d+', meta_line):
+                            # Извлекаем специальность и группу
+                            match = re.search(r'(\d+\.\d+\.\d+)\s+(.+?)(?:\s+(\d+(?:-\d+)*(?:,\d+(?:-\d+)*)*))?', meta_line)
+                            if match:
+                                if not current_specialty:
+                                    current_specialty = match.group(1) + ' ' + match.group(2).strip()
+                                if match.group(3) and not current_groups:
+                                    # Разбиваем группы
+                                    groups_str = match.group(3)
+                                    groups = re.split(r',', groups_str)
+                                    current_groups = [g.strip() for g in groups if g.strip()]
+                        # Парсим период
+                        if re.search(r'\d{2}\.\d{2}\.\d{4}', meta_line):
+                            if not current_period:
+                                match = re.search(r'(\d{2}\.\d{2}\.\d{4})-(\d{2}\.\d{2}\.\d{4})', meta_line)
+                                if match:
+                                    current_period = f"{match.group(1)}-{match.group(2)}"
+            timer.add('metadata', started, index)
+            
+            current_day = None
+            current_period_num = None
             
-            # Парсим заголовок для получения метаданных
-            for i, line in enumerate(lines):
-                # Ищем институт (например: "Институт медицинский")
-                if 'Институт' in line and not current_institute:
-                    match = re.search(r'Институт\s+(\w+)', line)
-                    if match:
-                        current_institute = match.group(1)
+            for row in table:
+                if not row or len(row) < 3:
+                    continue
                 
-                # Ищем курс (например: "1 Курс" или "Курс 1")
-                if 'Курс' in line and not current_course:
-                    match = re.search(r'(\d+)\s+Курс|Курс\s+(\d+)', line)
-                    if match:
-                        current_course = match.group(1) or match.group(2)
+                started = timer.clock()
+                row_entries = []
                 
-                # Ищем специальность и группу в одной строке
-                # Пример: "Специальность31.05.01 Лечебное дело 501-51 Группа"
-                if 'Специальность' in line or re.search(r'\d+\.\d+\.\d+', line):
-                    # Пытаемся извлечь специальность и группу
-                    match = re.search(r'Специальность\s*(\d+\.\d+\.\d+)\s+(.+?)(?:\s+(\d+(?:-\d+)*(?:,\d+(?:-\d+)*)*))?\s*Группа', line)
-                    if match:
-                        if not current_specialty:
-                            current_specialty = match.group(1) + ' ' + match.group(2).strip()
-                        if match.group(3) and not current_groups:
-                            groups_str = match.group(3)
-                            groups = re.split(r',', groups_str)
-                            current_groups = [g.strip() for g in groups if g.strip()]
-                    else:
-                        # Пытаемся извлечь только специальность
-                        match = re.search(r'Специальность\s*(\d+\.\d+\.\d+)\s+(.+?)(?:\s+Группа)', line)
-                        if match and not current_specialty:
-                            current_specialty = match.group(1) + ' ' + match.group(2).strip()
+                # Структура таблицы:
+                # Колонка 0: день недели (ПН) или пусто
+                # Колонка 1: номер пары (1, 2, 3...)
+                # Колонка 2: дисциплина (может содержать несколько подгрупп через пробелы или разделители)
+                # Колонка 3: обычно None или дополнительная информация
                 
-                # Ищем группы отдельно
-                if 'Группа' in line and not current_groups:
-                    # Ищем группы перед словом "Группа"
-                    match = re.search(r'(\d+(?:-\d+)*(?:,\d+(?:-\d+)*)*)\s+Группа', line)
-                    if match:
-                        groups_str = match.group(1).strip()
-                        groups = re.split(r',', groups_str)
-                        current_groups = [g.strip() for g in groups if g.strip()]
+                day_col = row[0] if row[0] else ''
+                day_col = day_col.strip() if day_col else ''
                 
-                # Ищем период
-                if 'ТО' in line and not current_period:
-                    match = re.search(r'ТО\s+(\d{2}\.\d{2}\.\d{4})-(\d{2}\.\d{2}\.\d{4})', line)
-                    if match:
-                        current_period = f"{match.group(1)}-{match.group(2)}"
-            
-            # Парсим таблицу
-            tables = page.extract_tables()
-            for table in tables:
-                if not table:
-                    continue
+                period_col = row[1] if row[1] else ''
+                period_col = period_col.strip() if period_col else ''
                 
-                # Парсим метаданные из первой строки таблицы (если они там есть)
-                if len(table) > 0 and len(table[0]) > 2:
-                    first_row_text = table[0][2] if table[0][2] else ''
-                    if first_row_text:
-                        # Парсим метаданные из текста первой строки
-                        # Формат: "2025-2026 весенний\nмедицинский 1\n31.05.01 Лечебное дело 501-51\n02.02.2026-06.06.2026"
-                        lines_meta = first_row_text.split('\n')
-                        for meta_line in lines_meta:
-                            meta_line = meta_line.strip()
-                            # Парсим институт и курс (например: "медицинский 1")
-                            if 'медицинский' in meta_line.lower():
-                                match = re.search(r'медицинский\s+(\d+)', meta_line, re.IGNORECASE)
-                                if match:
-                                    if not current_institute:
-                                        current_institute = 'медицинский'
-                                    if not current_course:
-                                        current_course = match.group(1)
-                            # Парсим специальность и группу (например: "31.05.01 Лечебное дело 501-51")
-                            if re.search(r'\d+\.\d+\.\d+', meta_line):
-                                # Извлекаем специальность и группу
-                                match = re.search(r'(\d+\.\d+\.\d+)\s+(.+?)(?:\s+(\d+(?:-\d+)*(?:,\d+(?:-\d+)*)*))?', meta_line)
-                                if match:
-                                    if not current_specialty:
-                                        current_specialty = match.group(1) + ' ' + match.group(2).strip()
-                                    if match.group(3) and not current_groups:
-                                        # Разбиваем группы
-                                        groups_str = match.group(3)
-                                        groups = re.split(r',', groups_str)
-                                        current_groups = [g.strip() for g in groups if g.strip()]
-                            # Парсим период
-                            if re.search(r'\d{2}\.\d{2}\.\d{4}', meta_line):
-                                if not current_period:
-                                    match = re.search(r'(\d{2}\.\d{2}\.\d{4})-(\d{2}\.\d{2}\.\d{4})', meta_line)
-                                    if match:
-                                        current_period = f"{match.group(1)}-{match.group(2)}"
+                discipline_col = row[2] if row[2] else ''
+                discipline_col = discipline_col.strip() if discipline_col else ''
                 
-                current_day = None
-                current_period_num = None
+                # Проверяем, является ли первая колонка днем недели
+                if day_col in DAYS_MAP:
+                    current_day = DAYS_MAP[day_col]
+                    # Если во второй колонке есть номер пары, сохраняем его
+                    if period_col.isdigit():
+                        current_period_num = int(period_col)
+                    timer.add('rows', started, index)
+                    continue
                 
-                for row in table:
-                    if not row or len(row) < 3:
-                        continue
-                    
-                    # Структура таблицы:
-                    # Колонка 0: день недели (ПН) или пусто
-                    # Колонка 1: номер пары (1, 2, 3...)
-                    # Колонка 2: дисциплина (может содержать несколько подгрупп через пробелы или разделители)
-                    # Колонка 3: обычно None или дополнительная информация
-                    
-                    day_col = row[0] if row[0] else ''
-                    day_col = day_col.strip() if day_col else ''
-                    
-                    period_col = row[1] if row[1] else ''
-                    period_col = period_col.strip() if period_col else ''
-                    
-                    discipline_col = row[2] if row[2] else ''
-                    discipline_col = discipline_col.strip() if discipline_col else ''
+                # Если первая колонка пустая, но есть день недели из предыдущей строки
+                # Проверяем вторую колонку на номер пары
+                if period_col.isdigit():
+                    current_period_num = int(period_col)
+                
+                # Если есть дисциплина и известны день и пара
+                if discipline_col and current_day and current_period_num:
+                    # Дисциплина может содержать несколько подгрупп, разделенных пробелами
+                    # Или может быть в разных колонках (колонка 2 и колонка 3)
+                    subgroups = []
                     
-                    # Проверяем, является ли первая колонка днем недели
-                    if day_col in DAYS_MAP:
-                        current_day = DAYS_MAP[day_col]
-                        # Если во второй колонке есть номер пары, сохраняем его
-                        if period_col.isdigit():
-                            current_period_num = int(period_col)
-                        continue
+                    # Проверяем, есть ли подгруппы в колонке 3
+                    if len(row) > 3 and row[3]:
+                        # Есть две колонки с дисциплинами - это две подгруппы
+                        subgroups.append(discipline_col)
+                        subgroups.append(row[3].strip() if row[3] else '')
+                    else:
+                        # Пытаемся разделить по пробелам (если есть несколько подгрупп в одной ячейке)
+                        # Но обычно подгруппы разделены явно или находятся в разных колонках
+                        # Для начала просто используем всю строку как одну подгруппу
+                        subgroups.append(discipline_col)
                     
-                    # Если первая колонка пустая, но есть день недели из предыдущей строки
-                    # Проверяем вторую колонку на номер пары
-                    if period_col.isdigit():
-                        current_period_num = int(period_col)
+                    # Обрабатываем подгруппы
+                    num_subgroups = len([s for s in subgroups if s and s.strip()])
                     
-                    # Если есть дисциплина и известны день и пара
-                    if discipline_col and current_day and current_period_num:
-                        # Дисциплина может содержать несколько подгрупп, разделенных пробелами
-                        # Или может быть в разных колонках (колонка 2 и колонка 3)
-                        subgroups = []
+                    for subgroup_idx, subgroup_text in enumerate(subgroups):
+                        # Если ячейка пустая, пропускаем (подгруппа не ходит в это время)
+                        if not subgroup_text or subgroup_text.strip() == '':
+                            continue
                         
-                        # Проверяем, есть ли подгруппы в колонке 3
-                        if len(row) > 3 and row[3]:
-                            # Есть две колонки с дисциплинами - это две подгруппы
-                            subgroups.append(discipline_col)
-                            subgroups.append(row[3].strip() if row[3] else '')
-                        else:
-                            # Пытаемся разделить по пробелам (если есть несколько подгрупп в одной ячейке)
-                            # Но обычно подгруппы разделены явно или находятся в разных колонках
-                            # Для начала просто используем всю строку как одну подгруппу
-                            subgroups.append(discipline_col)
+                        # Разбираем ячейку: записи по неделям (четная/нечетная), тип занятия (лек, пр, п/г)
+                        # и номер подгруппы из текста (п/г1, п/г2 и т.д.)
+                        parsed_items, lesson_type, subgroup_number = parse_cell_cached(subgroup_text)
                         
-                        # Обрабатываем подгруппы
-                        num_subgroups = len([s for s in subgroups if s and s.strip()])
+                        # Если не нашли в тексте, используем индекс колонки (если несколько колонок)
+                        if subgroup_number is None:
+                            if num_subgroups > 1:
+                                subgroup_number = subgroup_idx + 1
+                            else:
+                                subgroup_number = None
                         
-                        for subgroup_idx, subgroup_text in enumerate(subgroups):
-                            # Если ячейка пустая, пропускаем (подгруппа не ходит в это время)
-                            if not subgroup_text or subgroup_text.strip() == '':
-                                continue
-                            
-                            # Парсим дисциплину и аудиторию (может вернуть несколько записей для четных/нечетных)
-                            parsed_items = parse_subject_and_room(subgroup_text)
-                            
-                            # Определяем тип занятия (лек, пр, п/г)
-                            lesson_type = None
-                            if '(лек' in subgroup_text.lower() or 'лекция' in subgroup_text.lower():
-                                lesson_type = 'lecture'
-                            elif '(пр' in subgroup_text.lower() or 'практическое' in subgroup_text.lower():
-                                lesson_type = 'practice'
-                            elif 'п/г' in subgroup_text.lower() or 'п/г' in subgroup_text:
-                                lesson_type = 'subgroup'
-                            # Если тип не определен, пытаемся определить по контексту
-                            if not lesson_type:
-                                # Проверяем наличие сокращений
-                                if re.search(r'\(лек', subgroup_text, re.IGNORECASE):
-                                    lesson_type = 'lecture'
-                                elif re.search(r'\(пр', subgroup_text, re.IGNORECASE):
-                                    lesson_type = 'practice'
-                            
-                            # Определяем номер подгруппы
-                            # Сначала пытаемся извлечь из текста (п/г1, п/г2 и т.д.)
-                            subgroup_number = extract_subgroup_number(subgroup_text)
-                            
-                            # Если не нашли в тексте, используем индекс колонки (если несколько колонок)
-                            if subgroup_number is None:
-                                if num_subgroups > 1:
-                                    subgroup_number = subgroup_idx + 1
-                                else:
-                                    subgroup_number = None
-                            
-                            # Создаем записи для каждой распарсенной части (четная/нечетная неделя)
-                            for parsed_item in parsed_items:
-                                # Создаем запись для каждой группы
-                                if current_groups:
-                                    for group in current_groups:
-                                        entry = {
-                                            'discipline': parsed_item['subject'],
-                                            'group': group,
-                                            'day_of_week': current_day,
-                                            'room': parsed_item['room'],
-                                            'period': current_period_num,
-                                            'institute': current_institute,
-                                            'specialty': current_specialty,
-                                            'course': current_course,
-                                            'even_week': parsed_item['even_week'],
-                                            'odd_week': parsed_item['odd_week'],
-                                            'subgroup': subgroup_number,
-                                            'lesson_type': lesson_type,
-                                            'period_dates': current_period
-                                        }
-                                        results.append(entry)
-                                else:
-                                    # Если группы не найдены, создаем запись без группы
-                                    entry = {
-                                        'discipline': parsed_item['subject'],
-                                        'group': None,
-                                        'day_of_week': current_day,
-                                        'room': parsed_item['room'],
-                                        'period': current_period_num,
-                                        'institute': current_institute,
-                                        'specialty': current_specialty,
-                                        'course': current_course,
-                                        'even_week': parsed_item['even_week'],
-                                        'odd_week': parsed_item['odd_week'],
-                                        'subgroup': subgroup_number,
-                                        'lesson_type': lesson_type,
-                                        'period_dates': current_period
-                                    }
-                                    results.append(entry)
+                        # Создаем записи для каждой распарсенной части (четная/нечетная неделя)
+                        for parsed_item in parsed_items:
+                            # Создаем запись для каждой группы
+                            if current_groups:
+                                for group in current_groups:
+                                    entry = TimetableEntry(
+                                        discipline=parsed_item['subject'],
+                                        group=group,
+                                        day_of_week=current_day,
+                                        room=parsed_item['room'],
+                                        period=current_period_num,
+                                        institute=current_institute,
+                                        specialty=current_specialty,
+                                        course=current_course,
+                                        even_week=parsed_item['even_week'],
+                                        odd_week=parsed_item['odd_week'],
+                                        subgroup=subgroup_number,
+                                        lesson_type=lesson_type,
+                                        period_dates=current_period
+                                    )
+                                    row_entries.append(entry)
+                            else:
+                                # Если группы не найдены, создаем запись без группы
+                                entry = TimetableEntry(
+                                    discipline=parsed_item['subject'],
+                                    group=None,
+                                    day_of_week=current_day,
+                                    room=parsed_item['room'],
+                                    period=current_period_num,
+                                    institute=current_institute,
+                                    specialty=current_specialty,
+                                    course=current_course,
+                                    even_week=parsed_item['even_week'],
+                                    odd_week=parsed_item['odd_week'],
+                                    subgroup=subgroup_number,
+                                    lesson_type=lesson_type,
+                                    period_dates=current_period
+                                )
+                                row_entries.append(entry)
+                
+                timer.add('rows', started, index)
+                yield from row_entries
+
+def build_entries(pages: Iterable[Tuple[Optional[str], List]]) -> List[TimetableEntry]:
+    """Собирает все записи расписания из извлеченных страниц в список"""
+    return list(iter_entries(pages))
+
+def parse_pdf_iter(pdf_path: str, page_workers: int = 1, single_pass: bool = False,
+                   table_template: bool = False, low_memory: bool = False,
+                   timer=NULL_TIMER) -> Iterator[TimetableEntry]:
+    """
+    Парсит PDF файл и отдает записи расписания по одной, по мере разбора строк таблиц.
+    При page_workers > 1 страницы извлекаются параллельно в нескольких процессах,
+    а затем последовательно собираются в записи - результат совпадает с обычным режимом.
+    При single_pass текст страницы не раскладывается целиком (см. extract_page).
+    При table_template таблицы ищутся по шаблону, выученному на первых страницах (см. TableTemplate).
+    При low_memory кэш каждой страницы освобождается сразу после её извлечения.
+    В timer (parse_metrics.StageTimer) записываются время и число вызовов по этапам;
+    по умолчанию замеры выключены (NULL_TIMER).
+    """
+    if page_workers > 1:
+        yield from iter_entries(extract_pages_parallel(pdf_path, page_workers, single_pass,
+                                                       table_template, low_memory, timer), timer)
+        return
     
-    return results
+    template = TableTemplate() if table_template else None
+    with open_pdf(pdf_path, timer) as pdf:
+        yield from iter_entries(iter_extracted_pages(pdf.pages, single_pass, template, low_memory, timer), timer)
+
+def parse_pdf(pdf_path: str, page_workers: int = 1, single_pass: bool = False,
+              table_template: bool = False, low_memory: bool = False) -> List[TimetableEntry]:
+    """Парсит PDF файл и извлекает расписание (все записи списком, см. parse_pdf_iter)"""
+    return list(parse_pdf_iter(pdf_path, page_workers, single_pass, table_template, low_memory))
+
+def extraction_variant(single_pass: bool = False, table_template: bool = False) -> str:
+    """Режим извлечения для версии кэша: режимы, которые могут менять результат"""
+    modes = []
+    if single_pass:
+        modes.append('single-pass')
+    if table_template:
+        modes.append('table-template')
+    return '+'.join(modes)
+
+def write_entries(entries: Iterable[TimetableEntry], output_path: str, output_format: str = 'json') -> int:
+    """
+    Записывает записи расписания в файл по мере их поступления (см. timetable_format.dump_entries).
+    ndjson пишется сразу в итоговый файл, так что его можно читать до окончания парсинга.
+    json и compact пишутся во временный файл и переименовываются в конце,
+    чтобы при ошибке не оставить обрезанный JSON.
+    Возвращает количество записанных (плоских) записей.
+    """
+    target_path = output_path if output_format == 'ndjson' else output_path + '.tmp'
+    try:
+        with open(target_path, 'w', encoding='utf-8') as f:
+            count = dump_entries(entries, f, output_format)
+    except BaseException:
+        if os.path.exists(target_path):
+            os.remove(target_path)
+        raise
+    
+    if target_path != output_path:
+        os.replace(target_path, output_path)
+    return count
 
 def main():
-    import sys
-    import os
+    import argparse
     from pathlib import Path
+    from parse_cache import ParseCache
+    
+    parser = argparse.ArgumentParser(description='Парсер расписания занятий из PDF')
+    parser.add_argument('pdf_path', nargs='?', help='путь к PDF файлу')
+    parser.add_argument('--page-workers', type=int, default=1,
+                        help='количество процессов для параллельного извлечения страниц одного PDF')
+    parser.add_argument('--single-pass', action='store_true',
+                        help='раскладывать страницу один раз: заголовок берется из текста вне таблиц')
+    parser.add_argument('--table-template', action='store_true',
+                        help='искать таблицы в области, выученной на предыдущих страницах документа')
+    parser.add_argument('--low-memory', action='store_true',
+                        help='освобождать кэш pdfplumber после каждой страницы')
+    parser.add_argument('--force', action='store_true',
+                        help='не использовать кэш, распарсить файлы заново')
+    parser.add_argument('--format', choices=['json', 'ndjson', 'compact'], default='json',
+                        help='формат результата: JSON массив, NDJSON (запись на строку, пишется по ходу парсинга) '
+                             'или compact (одно занятие на все группы)')
+    parser.add_argument('--compact-json', action='store_true',
+                        help='писать JSON без отступов (меньше файлы, быстрее запись)')
+    args = parser.parse_args()
+    if args.compact_json:
+        json_codec.configure(compact=True)
+    extension = '.ndjson' if args.format == 'ndjson' else '.json'
+    
+    # Кэш результатов: неизмененные PDF не парсятся повторно
+    cache = ParseCache(reuse=not args.force, variant=extraction_variant(args.single_pass, args.table_template))
     
     # Определяем пути к папкам
     pdfs_dir = 'schedules_pdf'
@@ -401,8 +721,8 @@ def main():
     Path(jsons_dir).mkdir(exist_ok=True)
     
     # Если указан файл как аргумент
-    if len(sys.argv) > 1:
-        pdf_path = sys.argv[1]
+    if args.pdf_path:
+        pdf_path = args.pdf_path
         if not os.path.exists(pdf_path):
             print(f"Ошибка: файл {pdf_path} не найден")
             return
@@ -417,19 +737,28 @@ def main():
                     print(f"\n{'='*60}")
                     print(f"Парсинг файла: {pdf_file.name}")
                     print(f"{'='*60}")
-                    results = parse_pdf(str(pdf_file))
                     
                     # Создаем имя JSON файла на основе имени PDF
-                    json_name = pdf_file.stem + '.json'
+                    json_name = pdf_file.stem + extension
                     output_path = os.path.join(jsons_dir, json_name)
                     
-                    print(f"Найдено записей: {len(results)}")
+                    records, sha256 = cache.lookup(str(pdf_file), output_path, args.format)
+                    if records is not None:
+                        print(f"Файл не изменился, результат из кэша: {output_path} ({records} записей)")
+                        continue
+                    
+                    # Записи сохраняются по мере парсинга, не накапливаясь в памяти
+                    entries = parse_pdf_iter(str(pdf_file), page_workers=args.page_workers, single_pass=args.single_pass,
+                                             table_template=args.table_template, low_memory=args.low_memory)
+                    records = write_entries(entries, output_path, args.format)
                     
-                    # Сохраняем в JSON
-                    with open(output_path, 'w', encoding='utf-8') as f:
-                        json.dump(results, f, ensure_ascii=False, indent=2)
+                    print(f"Найдено записей: {records}")
+                    cache.store(str(pdf_file), sha256, output_path, records, args.format)
                     
                     print(f"Результаты сохранены в {output_path}")
+                cache.save()
+                print(f"\n{cache.summary()}")
+                print(cell_cache_summary(*cell_cache_stats()))
                 return
             else:
                 print(f"В папке {pdfs_dir} не найдено PDF файлов")
@@ -442,17 +771,26 @@ def main():
                 print(f"\n{'='*60}")
                 print(f"Парсинг файла: {pdf_file.name}")
                 print(f"{'='*60}")
-                results = parse_pdf(str(pdf_file))
                 
-                json_name = pdf_file.stem + '.json'
+                json_name = pdf_file.stem + extension
                 output_path = os.path.join(jsons_dir, json_name)
                 
-                print(f"Найдено записей: {len(results)}")
+                records, sha256 = cache.lookup(str(pdf_file), output_path, args.format)
+                if records is not None:
+                    print(f"Файл не изменился, результат из кэша: {output_path} ({records} записей)")
+                    continue
+                
+                entries = parse_pdf_iter(str(pdf_file), page_workers=args.page_workers, single_pass=args.single_pass,
+                                         table_template=args.table_template, low_memory=args.low_memory)
+                records = write_entries(entries, output_path, args.format)
                 
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(results, f, ensure_ascii=False, indent=2)
+                print(f"Найдено записей: {records}")
+                cache.store(str(pdf_file), sha256, output_path, records, args.format)
                 
                 print(f"Результаты сохранены в {output_path}")
+            cache.save()
+            print(f"\n{cache.summary()}")
+            print(cell_cache_summary(*cell_cache_stats()))
             return
         
         # Если ничего не найдено, используем файл по умолчанию
@@ -464,25 +802,40 @@ def main():
             return
     
     # Парсим один файл
-    output_name = Path(pdf_path).stem + '.json'
+    output_name = Path(pdf_path).stem + extension
     output_path = os.path.join(jsons_dir, output_name)
     
+    records, sha256 = cache.lookup(pdf_path, output_path, args.format)
+    if records is not None:
+        print(f"Файл {pdf_path} не изменился, результат из кэша: {output_path} ({records} записей)")
+        return
+    
     print(f"Парсинг файла {pdf_path}...")
-    results = parse_pdf(pdf_path)
     
-    print(f"Найдено записей: {len(results)}")
+    # Сохраняем записи по мере парсинга, запоминая первые для примеров
+    samples = []
+    def keep_samples(entries):
+        for entry in entries:
+            if len(samples) < 3:
+                samples.append(entry)
+            yield entry
+    
+    entries = parse_pdf_iter(pdf_path, page_workers=args.page_workers, single_pass=args.single_pass,
+                             table_template=args.table_template, low_memory=args.low_memory)
+    records = write_entries(keep_samples(entries), output_path, args.format)
     
-    # Сохраняем в JSON
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Найдено записей: {records}")
+    cache.store(pdf_path, sha256, output_path, records, args.format)
+    cache.save()
     
     print(f"Результаты сохранены в {output_path}")
+    print(cell_cache_summary(*cell_cache_stats()))
     
     # Выводим примеры
-    if results:
+    if samples:
         print("\nПримеры записей:")
-        for i, entry in enumerate(results[:3]):
-            print(f"\n{i+1}. {json.dumps(entry, ensure_ascii=False, indent=2)}")
+        for i, entry in enumerate(samples):
+            print(f"\n{i+1}. {json_codec.dumps(entry.to_dict(), compact=False)}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Хранилище PDF расписаний по содержимому
+Каждый уникальный PDF хранится один раз в schedules_pdf/.store/<sha256>.pdf,
+а файлы с понятными именами в schedules_pdf/ - жесткие ссылки на него
+(или копии, если файловая система не поддерживает жесткие ссылки).
+Один и тот же PDF, опубликованный на сайте под разными ссылками, занимает место один раз,
+а парсинг находит такие файлы по SHA-256 и обрабатывает их однократно.
+"""
+
+import os
+import shutil
+from typing import Dict, List
+
+# Папка с точкой: glob('*.pdf') в schedules_pdf/ её не видит
+STORE_DIR = os.path.join('schedules_pdf', '.store')
+
+class PdfStore:
+    """
+    Файлы хранилища не изменяются: новая версия расписания - новый файл,
+    а ссылка с прежним именем атомарно переключается на него
+    """
+
+    def __init__(self, store_dir: str = STORE_DIR):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.store_dir, sha256 + '.pdf')
+
+    def add(self, src_path: str, sha256: str) -> str:
+        """Перемещает файл в хранилище; если такое содержимое там уже есть, файл удаляется"""
+        blob = self.path(sha256)
+        if os.path.exists(blob):
+            os.remove(src_path)
+        else:
+            os.replace(src_path, blob)
+        return blob
+
+    def adopt(self, alias_path: str, sha256: str):
+        """Добавляет в хранилище уже лежащий на месте файл (скачанный до появления хранилища)"""
+        blob = self.path(sha256)
+        if not os.path.exists(blob):
+            self._link_or_copy(alias_path, blob)
+        self.link(sha256, alias_path)
+
+    def link(self, sha256: str, alias_path: str):
+        """Атомарно делает alias_path ссылкой на файл хранилища с этим содержимым"""
+        blob = self.path(sha256)
+        if os.path.exists(alias_path) and os.path.samefile(blob, alias_path):
+            return
+        tmp_path = alias_path + '.link'
+        self._link_or_copy(blob, tmp_path)
+        os.replace(tmp_path, alias_path)
+
+    def put(self, src_path: str, sha256: str, alias_path: str) -> str:
+        """Перемещает скачанный файл в хранилище и ставит на него ссылку alias_path"""
+        blob = self.add(src_path, sha256)
+        self.link(sha256, alias_path)
+        return blob
+
+    def prune(self) -> int:
+        """
+        Удаляет файлы хранилища, на которые не осталось ссылок (старые версии расписаний).
+        При копиях вместо ссылок удаляются все файлы хранилища - копии при этом остаются.
+        """
+        removed = 0
+        for name in os.listdir(self.store_dir):
+            path = os.path.join(self.store_dir, name)
+            if name.endswith('.pdf') and os.stat(path).st_nlink == 1:
+                os.remove(path)
+                removed += 1
+        return removed
+
+    @staticmethod
+    def _link_or_copy(src: str, dst: str):
+        if os.path.exists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copyfile(src, dst)
+
+def group_by_content(paths: List, hashes: Dict) -> Dict[str, List]:
+    """
+    Группирует файлы по SHA-256 (hashes: путь -> хеш) в порядке первого появления:
+    первый файл группы парсится, остальные получают копию результата
+    """
+    groups: Dict[str, List] = {}
+    for path in paths:
+        groups.setdefault(hashes[path], []).append(path)
+    return groups
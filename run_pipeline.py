@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Конвейер скачивание -> парсинг -> нормализация
+Этапы работают одновременно и связаны ограниченными очередями: PDF уходит в парсинг,
+как только скачан, а JSON - в нормализацию, как только записан. Если следующий этап
+не успевает, очередь заполняется и предыдущий этап ждет (память не растет).
+Скачивание идет в потоках (см. download_schedules.py), парсинг и нормализация -
+в пулах процессов. В конце выводятся время до первого нормализованного файла и общее время.
+
+Использование:
+    python3 run_pipeline.py
+    python3 run_pipeline.py --download-workers 8 --parse-workers 4 --normalize-workers 2
+    python3 run_pipeline.py --url http://127.0.0.1:8000/index.html --base-url http://127.0.0.1:8000  # локальная копия сайта
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from download_schedules import (PDFS_DIR, JSONS_DIR, PARSED_DIR, BASE_URL, SCHEDULE_URL, DOWNLOAD_WORKERS,
+                                REQUESTS_PER_SECOND, HostRateLimiter, create_directories, fetch_pdf,
+                                make_session, parse_schedule_page)
+from download_manifest import DownloadManifest
+from normalize_cache import NormalizeCache
+from normalize_disciplines import (ABBREVIATIONS, normalize_discipline_name_cached, normalize_timetable,
+                                   normalized_output_path)
+from parse_all_schedules import init_worker, json_output_path, parse_to_json
+from parse_cache import ParseCache
+from pdf_store import PdfStore
+from parse_timetable import CELL_CACHE_SIZE
+
+QUEUE_SIZE = 4
+
+# Конец потока элементов: последний завершившийся поток этапа передает его дальше
+DONE = object()
+
+_print_lock = threading.Lock()
+
+def log(message: str):
+    """Печать из потоков этапов: строки не перемешиваются"""
+    with _print_lock:
+        print(message, flush=True)
+
+class Stage:
+    """
+    Этап конвейера: workers потоков берут элементы из входной очереди, обрабатывают
+    функцией func и кладут результат в выходную очередь (ограниченную - при заполнении
+    поток ждет). Ошибка обработки печатается, элемент дальше не передается.
+    """
+
+    def __init__(self, name: str, func: Callable, workers: int, inbox: queue.Queue,
+                 outbox: Optional[queue.Queue] = None):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.done = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.first_done_at: Optional[float] = None
+        self._running = workers
+        self._lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+                        for i in range(workers)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+    def _work(self):
+        while True:
+            item = self.inbox.get()
+            if item is DONE:
+                # Возвращаем маркер остальным потокам этапа; последний передает его дальше
+                self.inbox.put(DONE)
+                with self._lock:
+                    self._running -= 1
+                    last = self._running == 0
+                if last and self.outbox is not None:
+                    self.outbox.put(DONE)
+                return
+
+            started = time.perf_counter()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                log(f"[{self.name}] ✗ {e or type(e).__name__}")
+                continue
+            finished = time.perf_counter()
+            with self._lock:
+                self.done += 1
+                self.busy_seconds += finished - started
+                if self.first_done_at is None:
+                    self.first_done_at = finished
+            if result is not None and self.outbox is not None:
+                self.outbox.put(result)
+
+def normalize_file(json_path: str, output_path: str) -> Tuple[int, Dict[str, str]]:
+    """
+    Нормализует один файл (в процессе пула), подробный вывод normalize_timetable не печатается.
+    Возвращает количество записей и названия файла с результатом нормализации.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        records, _, names = normalize_timetable(json_path, output_path)
+    return len(records), names
+
+def parse_args():
+    """Разбирает аргументы командной строки"""
+    parser = argparse.ArgumentParser(description='Конвейер скачивание -> парсинг -> нормализация')
+    parser.add_argument('--url', default=SCHEDULE_URL, help='страница со ссылками на расписания')
+    parser.add_argument('--base-url', default=BASE_URL,
+                        help=f'адрес, от которого отсчитываются ссылки на PDF (по умолчанию {BASE_URL})')
+    parser.add_argument('--download-workers', type=int, default=DOWNLOAD_WORKERS,
+                        help=f'потоков скачивания (по умолчанию {DOWNLOAD_WORKERS})')
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND,
+                        help=f'не более N запросов в секунду к одному хосту (по умолчанию {REQUESTS_PER_SECOND:g})')
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='процессов парсинга (по умолчанию - по числу ядер)')
+    parser.add_argument('--normalize-workers', type=int, default=1, help='процессов нормализации')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE,
+                        help=f'размер очередей между этапами (по умолчанию {QUEUE_SIZE})')
+    parser.add_argument('--force', action='store_true',
+                        help='не использовать манифест скачивания, кэш парсинга и манифест нормализации')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    download_workers = max(args.download_workers, 1)
+    parse_workers = args.parse_workers if args.parse_workers > 0 else (os.cpu_count() or 1)
+    normalize_workers = max(args.normalize_workers, 1)
+    queue_size = max(args.queue_size, 1)
+
+    print("=" * 60)
+    print("Конвейер: скачивание -> парсинг -> нормализация")
+    print("=" * 60)
+    create_directories()
+    started = time.perf_counter()
+
+    session = make_session(download_workers)
+    limiter = HostRateLimiter(args.rate)
+    manifest = DownloadManifest(reuse=not args.force)
+    cache = ParseCache(reuse=not args.force)
+    normalize_cache = NormalizeCache(ABBREVIATIONS, reuse=not args.force)
+    # После правки словаря перезаписываются только файлы с изменившимися названиями
+    normalize_cache.update_dictionary(ABBREVIATIONS, normalize_discipline_name_cached)
+    store = PdfStore()
+    # Манифесты и кэш парсинга меняются из потоков разных этапов
+    state_lock = threading.Lock()
+
+    pdf_links = parse_schedule_page(session, args.url, manifest, args.base_url)
+    if not pdf_links:
+        print("Не найдено ссылок на PDF файлы")
+        manifest.save()
+        return
+    print(f"\nНайдено ссылок на PDF: {len(pdf_links)}")
+    print(f"Потоков скачивания: {download_workers}, процессов парсинга: {parse_workers}, "
+          f"нормализации: {normalize_workers}, размер очередей: {queue_size}\n", flush=True)
+
+    links_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    pdf_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    json_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+
+    # Процессы пулов создаются при первой задаче, когда потоки этапов уже работают:
+    # fork многопоточного процесса может унаследовать захваченную блокировку, поэтому spawn
+    spawn = multiprocessing.get_context('spawn')
+    parse_pool = ProcessPoolExecutor(max_workers=parse_workers, mp_context=spawn, initializer=init_worker,
+                                     initargs=(CELL_CACHE_SIZE,))
+    normalize_pool = ProcessPoolExecutor(max_workers=normalize_workers, mp_context=spawn)
+    records_total = 0
+    # Одинаковый PDF под разными именами парсится один раз: sha256 -> (первый PDF, результат)
+    parsing: Dict[str, tuple] = {}
+
+    def download(link: Dict) -> str:
+        with state_lock:
+            cached = manifest.lookup(link['url'], os.path.join(PDFS_DIR, link['filename']))
+        result = fetch_pdf(session, link['url'], link['filename'], limiter, cached, store)
+        with state_lock:
+            manifest.store(link['url'], result['path'], result['size'], result['sha256'], result['validators'])
+        log(f"[download] ✓ {link['filename']} ({result['status']})")
+        return result['path']
+
+    def parse(pdf_path: str) -> str:
+        nonlocal records_total
+        pdf_file = Path(pdf_path)
+        output_path = json_output_path(pdf_file, JSONS_DIR)
+        with state_lock:
+            records, sha256 = cache.lookup(pdf_path, output_path)
+            first = records is None and sha256 not in parsing
+            if first:
+                parsing[sha256] = (pdf_path, Future())
+            source_pdf, parsed = parsing.get(sha256, (None, None))
+        if first:
+            try:
+                output_path, records, _, _, _ = parse_pool.submit(parse_to_json, pdf_file, JSONS_DIR).result()
+                with state_lock:
+                    cache.store(pdf_path, sha256, output_path, records)
+            except BaseException as e:
+                parsed.set_exception(e)
+                raise
+            parsed.set_result(records)
+            log(f"[parse] ✓ {pdf_file.name}: {records} записей")
+        elif records is None:
+            # Ждем парсинга того же PDF под другим именем и копируем результат
+            parsed.result()
+            with state_lock:
+                records = cache.store_copy(pdf_path, sha256, output_path, source_pdf)
+            log(f"[parse] ⊘ {pdf_file.name}: тот же PDF, что {Path(source_pdf).name} ({records} записей)")
+        else:
+            log(f"[parse] ⊘ {pdf_file.name}: из кэша ({records} записей)")
+        with state_lock:
+            records_total += records
+        return output_path
+
+    def normalize(json_path: str) -> str:
+        output_path = normalized_output_path(json_path, PARSED_DIR)
+        with state_lock:
+            records, sha256, _ = normalize_cache.lookup(json_path, output_path)
+        if records is not None:
+            log(f"[normalize] ⊘ {output_path}: не изменился")
+            return output_path
+        records, names = normalize_pool.submit(normalize_file, json_path, output_path).result()
+        with state_lock:
+            normalize_cache.store(json_path, sha256, output_path, records, names)
+        log(f"[normalize] ✓ {output_path}")
+        return output_path
+
+    stages: List[Stage] = [
+        Stage('download', download, download_workers, links_queue, pdf_queue),
+        Stage('parse', parse, parse_workers, pdf_queue, json_queue),
+        Stage('normalize', normalize, normalize_workers, json_queue),
+    ]
+
+    try:
+        for stage in stages:
+            stage.start()
+        for link in pdf_links:
+            links_queue.put(link)
+        links_queue.put(DONE)
+        for stage in stages:
+            stage.join()
+    finally:
+        parse_pool.shutdown()
+        normalize_pool.shutdown()
+        # Сохраняем манифест и кэш даже при прерывании
+        manifest.save()
+        cache.save()
+        normalize_cache.save()
+
+    store.prune()
+    elapsed = time.perf_counter() - started
+    first_normalized = stages[-1].first_done_at
+
+    print("\n" + "=" * 60)
+    print("Конвейер завершен!")
+    for stage in stages:
+        print(f"  {stage.name:<10} готово: {stage.done:>4}, ошибок: {stage.errors:>3}, "
+              f"время работы потоков: {stage.busy_seconds:.1f} с")
+    print(f"  Всего записей: {records_total}")
+    print(f"  {cache.summary()}")
+    print(f"  {normalize_cache.summary()}")
+    if first_normalized is not None:
+        print(f"  Первый нормализованный файл через: {first_normalized - started:.1f} с")
+    print(f"  Общее время: {elapsed:.1f} с")
+    print(f"\nНормализованные файлы сохранены в папку: {PARSED_DIR}/")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Генератор синтетических PDF расписаний в формате таблиц СурГУ
+Страница: заголовок (институт, курс, специальность с группами, период обучения)
+и таблица с линиями: день недели, номер пары и колонки подгрупп с дисциплинами.
+Часть ячеек - пары "четная // нечетная неделя".
+PDF пишется напрямую, без сторонних библиотек: стандартный шрифт Helvetica
+с кодировкой кириллицы через /Differences (pdfplumber читает её по именам uniXXXX).
+
+Использование:
+    python3 synthetic_schedule.py out.pdf
+    python3 synthetic_schedule.py out.pdf --pages 100 --groups 3 --subgroups 2 --even-odd 0.3
+"""
+
+import argparse
+import random
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+# Размер страницы A4 и разметка, пт
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 30
+FONT_SIZE = 7
+CHAR_WIDTH = 556   # Ширина всех символов шрифта, 1/1000 кегля
+ROW_HEIGHT = 14
+DAY_COLUMN_WIDTH = 30
+PERIOD_COLUMN_WIDTH = 22
+
+DAYS = ['ПН', 'ВТ', 'СР', 'ЧТ', 'ПТ', 'СБ']
+
+DISCIPLINES = [
+    'Анатомия человека', 'Биология', 'Гистология, эмбриология, цитология', 'Химия',
+    'Латинский язык', 'Физика, математика', 'Иностранный язык', 'Философия',
+    'Физическая культура и спорт', 'Биоэтика', 'Психология и педагогика', 'Нормальная физиология',
+    'Микробиология, вирусология', 'Биохимия', 'Правоведение', 'Основы медицинских знаний',
+]
+ROOMS = ['А436', 'У606', 'А2Б', 'А417', 'А24', 'У512', 'А301', 'ЭОиДОТ', 'С']
+LESSON_TYPES = ['(лек)', '(пр)', '(лек 8ч)', '(пр)']
+
+# Кодировка: ASCII как есть, кириллица - в коды 128 и выше
+CYRILLIC = [chr(code) for code in range(0x0410, 0x0450)] + ['Ё', 'ё']
+ENCODING: Dict[str, int] = {char: 128 + i for i, char in enumerate(CYRILLIC)}
+
+@dataclass
+class ScheduleLayout:
+    """Параметры синтетического расписания"""
+    pages: int = 20
+    groups: int = 2
+    subgroups: int = 1        # Колонок дисциплин: 1 или 2 (две подгруппы)
+    even_odd: float = 0.25    # Доля ячеек "четная // нечетная неделя"
+    periods_per_day: int = 6
+    seed: int = 0
+
+def encode(text: str) -> bytes:
+    """Кодирует текст в однобайтовую кодировку шрифта и экранирует его для строки PDF"""
+    data = bytearray()
+    for char in text:
+        code = ENCODING.get(char, ord(char))
+        if code > 255:
+            raise ValueError(f"символ {char!r} не поддерживается генератором")
+        if char in '\\()':
+            data.append(ord('\\'))
+        data.append(code)
+    return bytes(data)
+
+def text_width(text: str) -> float:
+    return len(text) * CHAR_WIDTH * FONT_SIZE / 1000
+
+def fits(text: str, width: float) -> bool:
+    return text_width(text) <= width - 4
+
+def group_names(count: int) -> List[str]:
+    return [f"501-{51 + i}" for i in range(count)]
+
+def header_lines(layout: ScheduleLayout) -> List[str]:
+    """Заголовок страницы: его разбирает iter_entries (институт, курс, специальность, группы, период)"""
+    return [
+        'Институт медицинский',
+        '1 Курс',
+        f"Специальность31.05.01 Лечебное дело {','.join(group_names(layout.groups))} Группа",
+        'ТО 02.02.2026-06.06.2026',
+    ]
+
+def make_cell(rng: random.Random, layout: ScheduleLayout, width: float) -> Tuple[str, int]:
+    """Текст ячейки дисциплины и число записей, которое из нее получится (1 или 2 недели)"""
+    def lesson(width: float) -> str:
+        # Ячейки однострочные: выбираем дисциплину, которая помещается в колонку
+        for _ in range(20):
+            text = f"{rng.choice(DISCIPLINES)} {rng.choice(LESSON_TYPES)} {rng.choice(ROOMS)}"
+            if fits(text, width):
+                return text
+        return f"{min(DISCIPLINES, key=len)} {rng.choice(ROOMS)}"
+    if rng.random() < layout.even_odd:
+        half = (width - text_width(' // ')) / 2
+        return f"{lesson(half)} // {lesson(half)}", 2
+    return lesson(width), 1
+
+def page_rows(rng: random.Random, layout: ScheduleLayout, width: float) -> Tuple[List[List[str]], int]:
+    """Строки таблицы страницы и число записей расписания на одну группу"""
+    rows = []
+    entries = 0
+    for day in DAYS:
+        rows.append([day, ''] + [''] * layout.subgroups)
+        for period in range(1, layout.periods_per_day + 1):
+            cells = []
+            for _ in range(layout.subgroups):
+                text, count = make_cell(rng, layout, width)
+                cells.append(text)
+                entries += count
+            rows.append(['', str(period)] + cells)
+    return rows, entries
+
+def page_content(layout: ScheduleLayout, rows: List[List[str]]) -> bytes:
+    """Поток содержимого страницы: заголовок, линии таблицы и текст ячеек"""
+    out = [b'BT', b'/F1 10 Tf']
+    y = PAGE_HEIGHT - MARGIN - 10
+    for line in header_lines(layout):
+        out.append(b'1 0 0 1 %d %d Tm (%s) Tj' % (MARGIN, y, encode(line)))
+        y -= 14
+    out.append(b'ET')
+
+    subject_width = (PAGE_WIDTH - 2 * MARGIN - DAY_COLUMN_WIDTH - PERIOD_COLUMN_WIDTH) / layout.subgroups
+    xs = [MARGIN, MARGIN + DAY_COLUMN_WIDTH, MARGIN + DAY_COLUMN_WIDTH + PERIOD_COLUMN_WIDTH]
+    xs += [xs[-1] + subject_width * (i + 1) for i in range(layout.subgroups)]
+    top = y - 6
+    bottom = top - ROW_HEIGHT * len(rows)
+
+    # Линии таблицы: по ним pdfplumber находит ячейки
+    out.append(b'0.5 w')
+    for i in range(len(rows) + 1):
+        out.append(b'%.2f %.2f m %.2f %.2f l S' % (xs[0], top - i * ROW_HEIGHT, xs[-1], top - i * ROW_HEIGHT))
+    for x in xs:
+        out.append(b'%.2f %.2f m %.2f %.2f l S' % (x, top, x, bottom))
+
+    out.append(b'BT')
+    out.append(b'/F1 %d Tf' % FONT_SIZE)
+    for i, row in enumerate(rows):
+        baseline = top - (i + 1) * ROW_HEIGHT + 4
+        for x, text in zip(xs, row):
+            if text:
+                out.append(b'1 0 0 1 %.2f %.2f Tm (%s) Tj' % (x + 2, baseline, encode(text)))
+    out.append(b'ET')
+    return b'\n'.join(out)
+
+class PdfWriter:
+    """Минимальная запись PDF: объекты пишутся сразу в файл, смещения собираются для xref"""
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.offsets: Dict[int, int] = {}
+        self.f.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def write_object(self, number: int, body: bytes, stream: Optional[bytes] = None):
+        self.offsets[number] = self.f.tell()
+        self.f.write(b'%d 0 obj\n' % number)
+        if stream is None:
+            self.f.write(body)
+        else:
+            self.f.write(body[:-2] + b' /Length %d >>\nstream\n' % len(stream))
+            self.f.write(stream)
+            self.f.write(b'\nendstream')
+        self.f.write(b'\nendobj\n')
+
+    def close(self, root: int):
+        xref = self.f.tell()
+        size = max(self.offsets) + 1
+        self.f.write(b'xref\n0 %d\n0000000000 65535 f \n' % size)
+        for number in range(1, size):
+            self.f.write(b'%010d 00000 n \n' % self.offsets.get(number, 0))
+        self.f.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, root, xref))
+
+def font_object() -> bytes:
+    """Helvetica с кириллицей в кодах 128+ (/Differences) и одинаковой шириной символов"""
+    names = b' '.join(b'/uni%04X' % ord(char) for char in CYRILLIC)
+    widths = b' '.join([b'%d' % CHAR_WIDTH] * (256 - 32))
+    return (b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica'
+            b' /Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding /Differences [128 ' + names + b'] >>'
+            b' /FirstChar 32 /LastChar 255 /Widths [' + widths + b'] >>')
+
+def write_schedule_pdf(path: str, layout: ScheduleLayout) -> int:
+    """
+    Записывает синтетическое расписание в PDF.
+    Возвращает число записей, которое должен получить парсер (по всем группам).
+    """
+    if layout.subgroups not in (1, 2):
+        raise ValueError("поддерживаются 1 или 2 колонки подгрупп")
+
+    rng = random.Random(layout.seed)
+    subject_width = (PAGE_WIDTH - 2 * MARGIN - DAY_COLUMN_WIDTH - PERIOD_COLUMN_WIDTH) / layout.subgroups
+    expected = 0
+
+    # Объекты: 1 - каталог, 2 - дерево страниц, 3 - шрифт, далее пары (страница, содержимое)
+    with open(path, 'wb') as f:
+        writer = PdfWriter(f)
+        writer.write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        writer.write_object(3, font_object())
+        kids = []
+        for i in range(layout.pages):
+            page_number, content_number = 4 + 2 * i, 5 + 2 * i
+            rows, entries = page_rows(rng, layout, subject_width)
+            expected += entries * max(layout.groups, 1)
+            writer.write_object(content_number, b'<< >>', page_content(layout, rows))
+            writer.write_object(page_number, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+                                b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>'
+                                % (PAGE_WIDTH, PAGE_HEIGHT, content_number))
+            kids.append(b'%d 0 R' % page_number)
+        writer.write_object(2, b'<< /Type /Pages /Kids [' + b' '.join(kids) + b'] /Count %d >>' % layout.pages)
+        writer.close(root=1)
+    return expected
+
+def main():
+    parser = argparse.ArgumentParser(description='Генератор синтетических PDF расписаний')
+    parser.add_argument('output', help='путь к PDF файлу')
+    parser.add_argument('--pages', type=int, default=20, help='количество страниц')
+    parser.add_argument('--groups', type=int, default=2, help='количество групп в заголовке')
+    parser.add_argument('--subgroups', type=int, choices=[1, 2], default=1, help='колонок подгрупп в таблице')
+    parser.add_argument('--even-odd', type=float, default=0.25,
+                        help='доля ячеек "четная // нечетная неделя" (0-1)')
+    parser.add_argument('--seed', type=int, default=0, help='seed генератора случайных чисел')
+    args = parser.parse_args()
+
+    layout = ScheduleLayout(pages=args.pages, groups=args.groups, subgroups=args.subgroups,
+                            even_odd=args.even_odd, seed=args.seed)
+    expected = write_schedule_pdf(args.output, layout)
+    print(f"Сохранено в {args.output}: {layout.pages} страниц, ожидается записей: {expected}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Запись расписания в памяти
+Все скрипты работают с TimetableEntry вместо словарей: объект на __slots__
+хранит поля без словаря, а повторяющиеся строки (институт, специальность,
+даты периода, дни недели, типы занятий, группы, дисциплины) интернируются,
+так что на весь корпус хранится по одной копии каждой строки.
+В словари записи превращаются только на границе с JSON (from_dict / to_dict).
+"""
+
+import sys
+from typing import Dict, Optional
+
+# Поля записи в порядке, в котором они пишутся в JSON
+ENTRY_FIELDS = (
+    'discipline', 'group', 'day_of_week', 'room', 'period', 'institute', 'specialty',
+    'course', 'even_week', 'odd_week', 'subgroup', 'lesson_type', 'period_dates'
+)
+
+def intern_str(value):
+    """Интернирует строку, остальные значения возвращает как есть"""
+    return sys.intern(value) if type(value) is str else value
+
+class TimetableEntry:
+    """Одно занятие одной группы"""
+    
+    __slots__ = ENTRY_FIELDS
+    
+    def __init__(self, discipline: Optional[str] = None, group: Optional[str] = None,
+                 day_of_week: Optional[str] = None, room: Optional[str] = None,
+                 period: Optional[int] = None, institute: Optional[str] = None,
+                 specialty: Optional[str] = None, course: Optional[str] = None,
+                 even_week: bool = True, odd_week: bool = True, subgroup: Optional[int] = None,
+                 lesson_type: Optional[str] = None, period_dates: Optional[str] = None):
+        self.discipline = intern_str(discipline)
+        self.group = intern_str(group)
+        self.day_of_week = intern_str(day_of_week)
+        self.room = intern_str(room)
+        self.period = period
+        self.institute = intern_str(institute)
+        self.specialty = intern_str(specialty)
+        self.course = intern_str(course)
+        self.even_week = even_week
+        self.odd_week = odd_week
+        self.subgroup = subgroup
+        self.lesson_type = intern_str(lesson_type)
+        self.period_dates = intern_str(period_dates)
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TimetableEntry':
+        """Создает запись из словаря, прочитанного из JSON (лишние ключи игнорируются)"""
+        return cls(**{field: data[field] for field in ENTRY_FIELDS if field in data})
+    
+    def to_dict(self) -> Dict:
+        """Словарь для записи в JSON, ключи в прежнем порядке"""
+        return {field: getattr(self, field) for field in ENTRY_FIELDS}
+    
+    def astuple(self) -> tuple:
+        return tuple(getattr(self, field) for field in ENTRY_FIELDS)
+    
+    def __eq__(self, other):
+        if not isinstance(other, TimetableEntry):
+            return NotImplemented
+        return self.astuple() == other.astuple()
+    
+    def __repr__(self):
+        fields = ', '.join(f'{field}={getattr(self, field)!r}' for field in ENTRY_FIELDS)
+        return f'TimetableEntry({fields})'
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Форматы файлов расписания и их чтение
+- json    - массив записей, одна запись на группу (исходный формат)
+- ndjson  - те же записи, одна запись на строку
+- compact - одно занятие на все группы: {"format": "timetable-compact", "lessons": [...]},
+            у занятия вместо поля group список groups
+Модуль не зависит от pdfplumber, его использует и backend веб-интерфейса.
+Читающие функции отдают записи TimetableEntry, пишущие принимают их же.
+JSON пишется и читается через json_codec: в компактном режиме json и compact
+пишутся без отступов, по записи (занятию) на строку.
+
+Использование (конвертация существующих файлов):
+    python3 timetable_format.py --compact schedules_json/file.json
+    python3 timetable_format.py --expand schedules_json/file.json
+"""
+
+import os
+import json_codec
+from typing import Dict, Iterable, Iterator, List, Tuple
+from timetable_entry import TimetableEntry
+
+COMPACT_FORMAT = 'timetable-compact'
+COMPACT_VERSION = 1
+
+def compact_entries(entries: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    Сворачивает записи в занятия: подряд идущие записи, отличающиеся только группой,
+    становятся одним занятием со списком groups. Парсер выдает записи одного занятия
+    подряд, поэтому свертка без потерь: expand_lessons восстанавливает исходный порядок.
+    """
+    lesson = None
+    lesson_key = None
+    for entry in entries:
+        key = tuple((field, value) for field, value in entry.items() if field != 'group')
+        if lesson is not None and key == lesson_key:
+            lesson['groups'].append(entry.get('group'))
+            continue
+        if lesson is not None:
+            yield lesson
+        lesson = {}
+        for field, value in entry.items():
+            if field == 'group':
+                lesson['groups'] = [value]
+            else:
+                lesson[field] = value
+        lesson.setdefault('groups', [None])
+        lesson_key = key
+    if lesson is not None:
+        yield lesson
+
+def expand_lessons(lessons: Iterable[Dict]) -> Iterator[Dict]:
+    """Лениво разворачивает занятия компактного формата в плоские записи (по записи на группу)"""
+    for lesson in lessons:
+        for group in lesson.get('groups') or [None]:
+            entry = {}
+            for field, value in lesson.items():
+                if field == 'groups':
+                    entry['group'] = group
+                else:
+                    entry[field] = value
+            yield entry
+
+def is_compact(data) -> bool:
+    """Проверяет, что загруженные данные в компактном формате"""
+    return isinstance(data, dict) and data.get('format') == COMPACT_FORMAT
+
+def _entry_hook(obj: Dict):
+    """
+    object_hook для json: плоские записи сразу превращаются в TimetableEntry,
+    и словари не копятся в памяти до конца разбора файла.
+    Занятия компактного формата (с groups) и заголовок остаются словарями.
+    """
+    if 'discipline' in obj and 'groups' not in obj:
+        return TimetableEntry.from_dict(obj)
+    return obj
+
+def read_timetable(path: str) -> Tuple[Iterator[TimetableEntry], str]:
+    """
+    Открывает файл расписания в любом формате (json, ndjson, compact).
+    Возвращает итератор записей (по одной на группу) и формат файла.
+    """
+    if path.endswith('.ndjson'):
+        return _iter_ndjson(path), 'ndjson'
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json_codec.load(f, object_hook=_entry_hook)
+    if is_compact(data):
+        entries = (TimetableEntry.from_dict(entry) for entry in expand_lessons(data['lessons']))
+        return entries, 'compact'
+    return iter(data), 'json'
+
+def _iter_ndjson(path: str) -> Iterator[TimetableEntry]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield TimetableEntry.from_dict(json_codec.loads(line))
+
+def iter_timetable(path: str) -> Iterator[TimetableEntry]:
+    """Читает файл расписания в любом формате и отдает записи - по одной на группу"""
+    entries, _ = read_timetable(path)
+    return entries
+
+def load_timetable(path: str) -> List[TimetableEntry]:
+    """Загружает файл расписания в любом формате как список записей"""
+    return list(iter_timetable(path))
+
+def write_compact(entries: Iterable[Dict], f) -> int:
+    """
+    Пишет записи в компактном формате в открытый файл, сворачивая их по мере поступления.
+    Каждое занятие занимает одну строку (в компактном режиме json_codec - без отступов).
+    Возвращает количество исходных (плоских) записей.
+    """
+    count = 0
+    lessons = 0
+    if json_codec.is_compact():
+        f.write('{"format":"%s","version":%d,"lessons":[' % (COMPACT_FORMAT, COMPACT_VERSION))
+        separator, first, end, empty_end = ',\n', '\n', '\n]}', ']}'
+    else:
+        f.write('{\n  "format": "%s",\n  "version": %d,\n  "lessons": [' % (COMPACT_FORMAT, COMPACT_VERSION))
+        separator, first, end, empty_end = ',\n    ', '\n    ', '\n  ]\n}', ']\n}'
+    for lesson in compact_entries(entries):
+        f.write(separator if lessons else first)
+        f.write(json_codec.dumps_line(lesson))
+        lessons += 1
+        count += len(lesson['groups'])
+    f.write(end if lessons else empty_end)
+    return count
+
+def dump_entries(entries: Iterable[TimetableEntry], f, output_format: str = 'json') -> int:
+    """
+    Пишет записи в открытый файл по мере их поступления, не держа их все в памяти.
+    json    - массив с отступом 2, байт в байт как json.dump(..., indent=2);
+              в компактном режиме json_codec - без отступов, по записи на строку
+    ndjson  - одна запись на строку
+    compact - занятия со списком групп
+    Возвращает количество записанных (плоских) записей.
+    """
+    dicts = (entry.to_dict() for entry in entries)
+    if output_format == 'compact':
+        return write_compact(dicts, f)
+    
+    count = 0
+    if output_format == 'ndjson':
+        for entry in dicts:
+            f.write(json_codec.dumps_line(entry))
+            f.write('\n')
+            count += 1
+        return count
+    
+    if json_codec.is_compact():
+        for entry in dicts:
+            f.write(',\n' if count else '[\n')
+            f.write(json_codec.dumps_line(entry))
+            count += 1
+        f.write('\n]' if count else '[]')
+        return count
+    
+    for entry in dicts:
+        f.write(',\n  ' if count else '[\n  ')
+        f.write(json_codec.dumps(entry, compact=False).replace('\n', '\n  '))
+        count += 1
+    f.write('\n]' if count else '[]')
+    return count
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Конвертация файлов расписания между форматами')
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--compact', action='store_true', help='свернуть записи по группам')
+    mode.add_argument('--expand', action='store_true', help='развернуть в запись на каждую группу')
+    parser.add_argument('--compact-json', action='store_true', help='писать JSON без отступов')
+    parser.add_argument('files', nargs='+', help='JSON файлы расписания (перезаписываются)')
+    args = parser.parse_args()
+    if args.compact_json:
+        json_codec.configure(compact=True)
+    
+    for path in args.files:
+        size_before = os.path.getsize(path)
+        entries = load_timetable(path)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            dump_entries(entries, f, 'compact' if args.compact else 'json')
+        os.replace(tmp_path, path)
+        size_after = os.path.getsize(path)
+        print(f"{path}: {len(entries)} записей, {size_before} -> {size_after} байт")
+
+if __name__ == '__main__':
+    main()
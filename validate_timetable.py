@@ -5,11 +5,13 @@
 Сравнивает timetable.json с данными из CSV файла занятости преподавателей
 """
 
-import json
 import csv
+import json_codec
 import re
 from typing import Dict, List, Set, Tuple
 from collections import defaultdict
+from timetable_entry import TimetableEntry
+from timetable_format import load_timetable
 
 # Маппинг дней недели
 DAYS_MAP = {
@@ -99,12 +101,11 @@ def load_csv_data(csv_file: str) -> Dict:
     
     return dict(csv_data)
 
-def load_json_data(json_file: str) -> List[Dict]:
-    """Загружает данные из JSON файла расписания"""
-    with open(json_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+def load_json_data(json_file: str) -> List[TimetableEntry]:
+    """Загружает данные из JSON файла расписания (любой формат, записи по одной на группу)"""
+    return load_timetable(json_file)
 
-def validate_data(json_data: List[Dict], csv_data: Dict) -> List[Dict]:
+def validate_data(json_data: List[TimetableEntry], csv_data: Dict) -> List[Dict]:
     """
     Проверяет достоверность данных JSON по сравнению с CSV
     Возвращает список несоответствий
@@ -112,11 +113,11 @@ def validate_data(json_data: List[Dict], csv_data: Dict) -> List[Dict]:
     errors = []
     
     for entry in json_data:
-        group = entry.get('group')
-        day_of_week = entry.get('day_of_week')
-        period = entry.get('period')
-        room = entry.get('room')
-        discipline = entry.get('discipline', '')
+        group = entry.group
+        day_of_week = entry.day_of_week
+        period = entry.period
+        room = entry.room
+        discipline = entry.discipline or ''
         
         # Пропускаем записи без группы или с пустой дисциплиной
         if not group or not discipline or discipline.strip() == '':
@@ -131,7 +132,7 @@ def validate_data(json_data: List[Dict], csv_data: Dict) -> List[Dict]:
         if not day_ru:
             errors.append({
                 'type': 'unknown_day',
-                'entry': entry,
+                'entry': entry.to_dict(),
                 'message': f'Неизвестный день недели: {day_of_week}'
             })
             continue
@@ -140,7 +141,7 @@ def validate_data(json_data: List[Dict], csv_data: Dict) -> List[Dict]:
         if group not in csv_data:
             errors.append({
                 'type': 'group_not_found',
-                'entry': entry,
+                'entry': entry.to_dict(),
                 'message': f'Группа {group} не найдена в CSV файле'
             })
             continue
@@ -149,7 +150,7 @@ def validate_data(json_data: List[Dict], csv_data: Dict) -> List[Dict]:
         if day_ru not in csv_data[group]:
             errors.append({
                 'type': 'day_not_found',
-                'entry': entry,
+                'entry': entry.to_dict(),
                 'message': f'Для группы {group} нет занятий в {day_ru}'
             })
             continue
@@ -158,7 +159,7 @@ def validate_data(json_data: List[Dict], csv_data: Dict) -> List[Dict]:
         if period not in csv_data[group][day_ru]:
             errors.append({
                 'type': 'period_not_found',
-                'entry': entry,
+                'entry': entry.to_dict(),
                 'message': f'Для группы {group} в {day_ru} нет пары {period}'
             })
             continue
@@ -172,20 +173,20 @@ def validate_data(json_data: List[Dict], csv_data: Dict) -> List[Dict]:
             if rooms_in_csv:
                 errors.append({
                     'type': 'room_mismatch',
-                    'entry': entry,
+                    'entry': entry.to_dict(),
                     'message': f'Аудитория {room} не совпадает с CSV. Ожидаемые: {", ".join(rooms_in_csv)}',
                     'expected_rooms': list(rooms_in_csv)
                 })
             else:
                 errors.append({
                     'type': 'no_room_in_csv',
-                    'entry': entry,
+                    'entry': entry.to_dict(),
                     'message': f'В CSV для группы {group} в {day_ru} пара {period} нет аудитории'
                 })
         elif not normalized_room and rooms_in_csv:
             errors.append({
                 'type': 'missing_room',
-                'entry': entry,
+                'entry': entry.to_dict(),
                 'message': f'В JSON нет аудитории, но в CSV есть: {", ".join(rooms_in_csv)}',
                 'expected_rooms': list(rooms_in_csv)
             })
@@ -206,7 +207,7 @@ def save_errors(errors: List[Dict], output_file: str):
     }
     
     with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(report, f, ensure_ascii=False, indent=2)
+        json_codec.dump(report, f)
     
     print(f"\nОтчет сохранен в {output_file}")
     print(f"\nСтатистика ошибок:")
@@ -4,9 +4,8 @@
 Backend API для веб-интерфейса управления расписаниями
 """
 
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_file
 from flask_cors import CORS
-import json
 import os
 import re
 import subprocess
@@ -14,6 +13,7 @@ import sys
 import threading
 import logging
 import shutil
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, List, Optional
 from werkzeug.serving import WSGIRequestHandler
@@ -177,10 +177,36 @@ except NameError:
     # Fallback если __file__ не определен
     BASE_DIR = Path.cwd().parent.parent if 'web-interface' in str(Path.cwd()) else Path.cwd().parent
 
+# Модули проекта без тяжелых зависимостей (форматы файлов расписания)
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+from timetable_format import load_timetable
+from normalize_cache import NormalizeCache
+import json_codec
+
 PDFS_DIR = BASE_DIR / 'schedules_pdf'
 JSONS_DIR = BASE_DIR / 'schedules_json'
 PARSED_DIR = BASE_DIR / 'schedules_parsed'
 ABBREV_FILE = BASE_DIR / 'abbreviations.json'
+NORMALIZE_CACHE_FILE = BASE_DIR / 'normalize_cache.json'
+
+# Парсинг в режиме экономии памяти (--low-memory) включается явно: TIMETABLE_PARSE_LOW_MEMORY=1.
+# Лимит в нем ограничивает адресное пространство процесса, а не занятую память, поэтому
+# на некоторых системах дает MemoryError и при достаточном объеме памяти
+PARSE_LOW_MEMORY_ENV = 'TIMETABLE_PARSE_LOW_MEMORY'
+
+# Процессов парсинга (--workers): по умолчанию один - пик памяти растет с числом процессов.
+# Больше - через TIMETABLE_PARSE_WORKERS=N (0 - по числу ядер)
+PARSE_WORKERS_ENV = 'TIMETABLE_PARSE_WORKERS'
+
+def parse_workers() -> int:
+    """Число процессов парсинга из окружения backend"""
+    try:
+        workers = int(os.environ.get(PARSE_WORKERS_ENV, '1'))
+    except ValueError:
+        print(f"[WARNING] {PARSE_WORKERS_ENV} должно быть числом, используется 1 процесс")
+        return 1
+    return workers if workers > 0 else (os.cpu_count() or 1)
 
 # Создаем папки если их нет
 PDFS_DIR.mkdir(exist_ok=True)
@@ -190,10 +216,49 @@ PARSED_DIR.mkdir(exist_ok=True)
 # Статус выполнения задач
 task_status = {
     'download': {'running': False, 'progress': 0, 'message': '', 'process': None, 'total_files': None},
-    'parse': {'running': False, 'progress': 0, 'message': '', 'process': None},
-    'normalize': {'running': False, 'progress': 0, 'message': '', 'process': None}
+    'parse': {'running': False, 'progress': 0, 'message': '', 'process': None, 'cache_hits': None, 'cache_misses': None},
+    'normalize': {'running': False, 'progress': 0, 'message': '', 'process': None, 'skipped': None, 'normalized': None}
 }
 
+# Загруженные расписания: {путь: (mtime, размер, [TimetableEntry])}, последние просмотренные в конце.
+# Записи хранятся компактно (__slots__, общие строки), файл перечитывается только после изменения.
+# Хранятся только TIMETABLE_CACHE_SIZE последних файлов, записи удаленных файлов вытесняются
+TIMETABLE_CACHE_SIZE = 8
+timetable_cache = OrderedDict()
+timetable_cache_lock = threading.Lock()
+
+# Файлы расписания: JSON (в т.ч. компактный) и NDJSON
+TIMETABLE_EXTENSIONS = ('.json', '.ndjson')
+
+def timetable_files(dir_path: Path, extensions=TIMETABLE_EXTENSIONS) -> List[Path]:
+    """Файлы папки с заданными расширениями, по имени"""
+    if not dir_path.exists():
+        return []
+    return sorted(path for extension in extensions for path in dir_path.glob(f'*{extension}'))
+
+def json_response(data) -> Response:
+    """Ответ JSON через json_codec (orjson, если установлен): большие расписания сериализуются быстрее jsonify"""
+    return Response(json_codec.dumps_bytes(data, compact=True), mimetype='application/json')
+
+def get_timetable(file_path: Path):
+    """Возвращает записи файла расписания, загружая его заново только если файл изменился"""
+    stat = file_path.stat()
+    key = str(file_path)
+    with timetable_cache_lock:
+        cached = timetable_cache.get(key)
+        if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+            timetable_cache.move_to_end(key)
+            return cached[2]
+    entries = load_timetable(key)
+    with timetable_cache_lock:
+        timetable_cache[key] = (stat.st_mtime, stat.st_size, entries)
+        timetable_cache.move_to_end(key)
+        for path in [path for path in timetable_cache if not os.path.exists(path)]:
+            del timetable_cache[path]
+        while len(timetable_cache) > TIMETABLE_CACHE_SIZE:
+            timetable_cache.popitem(last=False)
+    return entries
+
 @app.route('/')
 def index():
     """Корневой маршрут - информация о API"""
@@ -205,6 +270,7 @@ def index():
             'files': '/api/files?type=json|parsed|pdf',
             'file': '/api/file/<filename>?type=json|parsed|pdf',
             'abbreviations': '/api/abbreviations',
+            'abbreviations_affected': '/api/abbreviations/affected',
             'tasks': {
                 'download': '/api/tasks/download',
                 'parse': '/api/tasks/parse',
@@ -225,16 +291,17 @@ def status():
             'progress': task_data['progress'],
             'message': task_data['message']
         }
-        # Добавляем total_files если есть
-        if 'total_files' in task_data and task_data['total_files'] is not None:
-            task_dict['total_files'] = task_data['total_files']
+        # Добавляем total_files и статистику кэша если есть
+        for key in ('total_files', 'cache_hits', 'cache_misses', 'skipped', 'normalized'):
+            if task_data.get(key) is not None:
+                task_dict[key] = task_data[key]
         tasks_serializable[task_name] = task_dict
     
     return jsonify({
         'status': 'ok',
         'pdfs_count': len(list(PDFS_DIR.glob('*.pdf'))) if PDFS_DIR.exists() else 0,
-        'jsons_count': len(list(JSONS_DIR.glob('*.json'))) if JSONS_DIR.exists() else 0,
-        'parsed_count': len(list(PARSED_DIR.glob('*.json'))) if PARSED_DIR.exists() else 0,
+        'jsons_count': len(timetable_files(JSONS_DIR)),
+        'parsed_count': len(timetable_files(PARSED_DIR)),
         'tasks': tasks_serializable
     })
 
@@ -245,19 +312,19 @@ def list_files():
     
     if file_type == 'pdf':
         dir_path = PDFS_DIR
-        ext = '.pdf'
+        extensions = ('.pdf',)
     elif file_type == 'parsed':
         dir_path = PARSED_DIR
-        ext = '.json'
+        extensions = TIMETABLE_EXTENSIONS
     else:
         dir_path = JSONS_DIR
-        ext = '.json'
+        extensions = TIMETABLE_EXTENSIONS
     
     if not dir_path.exists():
         return jsonify([])
     
     files = []
-    for file_path in sorted(dir_path.glob(f'*{ext}')):
+    for file_path in timetable_files(dir_path, extensions):
         stat = file_path.stat()
         files.append({
             'name': file_path.name,
@@ -280,12 +347,14 @@ def get_file(filename):
         file_path = JSONS_DIR / filename
     
     if not file_path.exists():
+        with timetable_cache_lock:
+            timetable_cache.pop(str(file_path), None)
         return jsonify({'error': 'File not found'}), 404
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return jsonify(data)
+        # Любой формат (в т.ч. компактный) отдаем в привычном виде - запись на каждую группу
+        entries = get_timetable(file_path)
+        return json_response([entry.to_dict() for entry in entries])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -297,21 +366,67 @@ def get_abbreviations():
     
     try:
         with open(ABBREV_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return jsonify(data)
+            data = json_codec.load(f)
+        return json_response(data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Что затронет последняя правка словаря: считается в фоне после сохранения,
+# результат - в GET /api/abbreviations/affected
+abbreviations_affected = {'running': False, 'affected': None, 'warning': None}
+abbreviations_generation = 0
+abbreviations_lock = threading.Lock()
+
+def compute_affected(abbreviations: Dict[str, str], generation: int):
+    """Считает названия и файлы, которые пересчитает следующая нормализация; устаревший результат отбрасывается"""
+    affected, warning = None, None
+    try:
+        cache = NormalizeCache(abbreviations, str(NORMALIZE_CACHE_FILE))
+        patterns, names, files = cache.affected(abbreviations)
+        affected = {'patterns': len(patterns), 'disciplines': len(names),
+                    'files': len(files), 'total_files': len(cache.files)}
+    except re.error as e:
+        warning = f'Ошибка в шаблоне: {e}'
+    except Exception as e:
+        # Словарь уже сохранен: ошибка подсчета не делает сохранение неудачным
+        warning = f'Не удалось определить затронутые названия: {e}'
+    with abbreviations_lock:
+        if generation == abbreviations_generation:
+            abbreviations_affected.update(running=False, affected=affected, warning=warning)
+
 @app.route('/api/abbreviations', methods=['POST'])
 def save_abbreviations():
     """Сохранить словарь сокращений"""
+    global abbreviations_generation
     try:
         data = request.json
         with open(ABBREV_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return jsonify({'status': 'ok'})
+            json_codec.dump(data, f, compact=False)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    # Что пересчитает следующая нормализация: названия, где совпадают измененные сокращения,
+    # и файлы с этими названиями (категории объединяются так же, как в load_abbreviations).
+    # Словарь уже сохранен, поэтому ошибка здесь - только предупреждение
+    try:
+        abbreviations = {}
+        for category in data.get('abbreviations', {}).values():
+            abbreviations.update(category)
+        with abbreviations_lock:
+            abbreviations_generation += 1
+            abbreviations_affected.update(running=True, affected=None, warning=None)
+            generation = abbreviations_generation
+        thread = threading.Thread(target=compute_affected, args=(abbreviations, generation), daemon=True)
+        thread.start()
+    except Exception as e:
+        return jsonify({'status': 'ok', 'warning': f'Не удалось определить затронутые названия: {e}'})
+    return jsonify({'status': 'ok'})
+
+@app.route('/api/abbreviations/affected')
+def get_abbreviations_affected():
+    """Что затронет последняя сохраненная правка словаря (running - еще считается)"""
+    with abbreviations_lock:
+        return jsonify(dict(abbreviations_affected))
 
 @app.route('/api/tasks/download', methods=['POST'])
 def start_download():
@@ -481,13 +596,15 @@ def start_parse():
         task_status['parse']['running'] = True
         task_status['parse']['progress'] = 0
         task_status['parse']['message'] = 'Запуск парсинга...'
+        task_status['parse']['cache_hits'] = None
+        task_status['parse']['cache_misses'] = None
         
         try:
             script_path = BASE_DIR / 'parse_all_schedules.py'
             if not script_path.exists():
                 raise FileNotFoundError(f"Script not found: {script_path}")
             
-            initial_count = len(list(JSONS_DIR.glob('*.json'))) if JSONS_DIR.exists() else 0
+            initial_count = len(timetable_files(JSONS_DIR))
             total_pdfs = len(list(PDFS_DIR.glob('*.pdf'))) if PDFS_DIR.exists() else 0
             
             # Настраиваем окружение
@@ -502,9 +619,14 @@ def start_parse():
             # (там установлены все зависимости: requests, beautifulsoup4 и т.д.)
             python_executable = get_system_python()
             
+            # Число процессов задается TIMETABLE_PARSE_WORKERS (по умолчанию один)
+            command = [python_executable, str(script_path), '--workers', str(parse_workers())]
+            if os.environ.get(PARSE_LOW_MEMORY_ENV) == '1':
+                command.append('--low-memory')
+            
             # Запускаем процесс с чтением вывода в реальном времени
             process = subprocess.Popen(
-                [python_executable, str(script_path)],
+                command,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 text=True,
@@ -532,8 +654,14 @@ def start_parse():
                         if total > 0:
                             task_status['parse']['progress'] = int((current / total) * 100)
                 
+                # Статистика кэша из итогового вывода: "Кэш: попаданий X, промахов Y"
+                cache_match = re.search(r'Кэш: попаданий (\d+), промахов (\d+)', line)
+                if cache_match:
+                    task_status['parse']['cache_hits'] = int(cache_match.group(1))
+                    task_status['parse']['cache_misses'] = int(cache_match.group(2))
+                
                 # Альтернативный способ - по количеству файлов
-                current_count = len(list(JSONS_DIR.glob('*.json'))) if JSONS_DIR.exists() else 0
+                current_count = len(timetable_files(JSONS_DIR))
                 if total_pdfs > 0 and current_count > initial_count:
                     processed = current_count - initial_count
                     task_status['parse']['progress'] = int((processed / total_pdfs) * 90)
@@ -562,14 +690,15 @@ def start_normalize():
         task_status['normalize']['running'] = True
         task_status['normalize']['progress'] = 0
         task_status['normalize']['message'] = 'Запуск нормализации...'
+        task_status['normalize']['skipped'] = None
+        task_status['normalize']['normalized'] = None
         
         try:
             script_path = BASE_DIR / 'normalize_disciplines.py'
             if not script_path.exists():
                 raise FileNotFoundError(f"Script not found: {script_path}")
             
-            initial_count = len(list(PARSED_DIR.glob('*.json'))) if PARSED_DIR.exists() else 0
-            total_jsons = len(list(JSONS_DIR.glob('*.json'))) if JSONS_DIR.exists() else 0
+            total_jsons = len(timetable_files(JSONS_DIR))
             
             # Настраиваем окружение
             env = os.environ.copy()
@@ -599,22 +728,22 @@ def start_normalize():
             task_status['parse']['process'] = process
             
             output_lines = []
+            processed = 0
             for line in process.stdout:
                 output_lines.append(line)
                 task_status['normalize']['message'] = ''.join(output_lines[-10:])  # Последние 10 строк
                 
-                # Пытаемся определить прогресс из вывода
-                if 'Обработка:' in line or 'Найдено JSON файлов:' in line:
-                    match = re.search(r'(\d+)', line)
-                    if match and total_jsons > 0:
-                        # Примерная оценка
-                        pass
+                # Прогресс по выводу: каждый файл либо обрабатывается, либо пропускается без изменений
+                if 'Обработка:' in line or 'Пропуск' in line:
+                    processed += 1
+                    if total_jsons > 0:
+                        task_status['normalize']['progress'] = min(int((processed / total_jsons) * 90), 90)
                 
-                # Альтернативный способ - по количеству файлов
-                current_count = len(list(PARSED_DIR.glob('*.json'))) if PARSED_DIR.exists() else 0
-                if total_jsons > 0 and current_count > initial_count:
-                    processed = current_count - initial_count
-                    task_status['normalize']['progress'] = int((processed / total_jsons) * 90)
+                # Итог из вывода: "Нормализация: пропущено X, обработано Y"
+                summary_match = re.search(r'Нормализация: пропущено (\d+), обработано (\d+)', line)
+                if summary_match:
+                    task_status['normalize']['skipped'] = int(summary_match.group(1))
+                    task_status['normalize']['normalized'] = int(summary_match.group(2))
             
             process.wait()
             task_status['normalize']['message'] = ''.join(output_lines)